@@ -0,0 +1,64 @@
+"""Memory used by a parsed GHDL hierarchy, measured with tracemalloc
+
+Uses the synthetic --disp-tree output of parse_hierarchy.py. Reports the
+total size of the hierarchy and the bytes per unit.
+
+    python benchmarks/hierarchy_memory.py --lines 1000000
+"""
+
+from argparse                       import (ArgumentParser)
+from tracemalloc                    import (start, stop, take_snapshot)
+from gc                             import (collect)
+
+from parse_hierarchy                import (disp_tree_lines, units, LINES_PER_INSTANCE)
+from hdlcomposer.sim.ghdl.parse     import (parse_run_lines)
+from hdlcomposer.vhdl.units         import (Top, Entity, Instance, Port)
+
+
+
+def traced_size(build):
+    """Bytes allocated by build() that are still in use when it returns
+    """
+
+    collect()
+    start()
+    before = take_snapshot()
+    result = build()
+    collect()
+    after = take_snapshot()
+    stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return result, size
+
+
+
+def instance_with_entity(parent):
+    """An instance with its entity and one port
+    """
+
+    instance = Instance(name='u_core', parent=parent, indentation=4)
+    entity = Entity(name='core', parent=instance, indentation=6, arch='rtl')
+    Port(name='clk', parent=entity, indentation=8, direction='in')
+    return instance
+
+
+
+def main():
+    parser = ArgumentParser(description='Memory of a GHDL hierarchy')
+    parser.add_argument('--lines', type=int, default=1000000, help='Approximate tree size')
+    args = parser.parse_args()
+
+    top, size = traced_size(lambda: parse_run_lines(disp_tree_lines(args.lines // LINES_PER_INSTANCE)))
+    count = units(top)
+    print('%d units: %.1f MB, %.0f bytes per unit' % (count, size / 1e6, size / count))
+
+    top = Top(name='top')
+    testbench = Entity(name='tb', parent=top, indentation=2)
+    count = 1000
+    _, size = traced_size(lambda: [instance_with_entity(testbench) for _ in range(count)])
+    print('Instance with its entity and one port: %.0f bytes' % (size / count))
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Import time of hdlcomposer entry points, measured with python -X importtime
+
+Each statement runs in a fresh interpreter. The cumulative time of the
+hdlcomposer modules is reported, and the script fails if a statement is
+slower than --limit milliseconds, to catch eager imports creeping back.
+
+    python benchmarks/import_time.py --limit 50
+"""
+
+from sys                        import (executable, exit)
+from subprocess                 import (run, PIPE)
+from argparse                   import (ArgumentParser)
+from os.path                    import (dirname, abspath)
+
+
+
+STATEMENTS = [
+    'import hdlcomposer',
+    'import hdlcomposer.utils',
+    'import hdlcomposer.sim.ghdl.client',
+    'from hdlcomposer.sim.ghdl import GHDL',
+]
+REPO_PATH = dirname(dirname(abspath(__file__)))
+
+
+
+def import_time(statement, repeat=5):
+    """Best cumulative import time (ms) of the hdlcomposer modules of a statement
+    """
+
+    best = None
+    for _ in range(repeat):
+        result = run([executable, '-X', 'importtime', '-c', statement], stderr=PIPE,
+                     universal_newlines=True, cwd=REPO_PATH, check=True)
+        total = 0
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            # Nested imports are indented, their time is already in the cumulative one
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].startswith(' hdlcomposer'):
+                total += int(fields[1])
+        best = total if best is None else min(best, total)
+    return best / 1000
+
+
+
+def main():
+    parser = ArgumentParser(description='Import time of hdlcomposer')
+    parser.add_argument('--limit', type=float, help='Fail if a statement takes longer (ms)')
+    args = parser.parse_args()
+
+    failed = False
+    for statement in STATEMENTS:
+        milliseconds = import_time(statement)
+        slow = args.limit is not None and milliseconds > args.limit
+        failed = failed or slow
+        print('%8.1f ms  %s%s' % (milliseconds, statement, '  (over the limit)' if slow else ''))
+    exit(1 if failed else 0)
+
+
+
+if __name__ == '__main__':
+    main()
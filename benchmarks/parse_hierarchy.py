@@ -0,0 +1,84 @@
+"""Parse time of a synthetic GHDL --disp-tree hierarchy
+
+The tree has a testbench with many instances of an entity with ports,
+signals and a process, about a million lines by default. The lines are
+generated on the fly and fed to parse_run_lines(), as GHDL.parse_entity
+does with the GHDL pipe.
+
+    python benchmarks/parse_hierarchy.py --lines 1000000
+"""
+
+from argparse                       import (ArgumentParser)
+from time                           import (perf_counter)
+from os.path                        import (dirname, abspath)
+from sys                            import (path)
+
+path.insert(0, dirname(dirname(abspath(__file__))))
+
+from hdlcomposer.sim.ghdl.parse     import (parse_run_lines)
+
+
+
+PORTS = 4
+SIGNALS = 4
+# Instance, entity, arch, ports, signals and process
+LINES_PER_INSTANCE = 4 + PORTS + SIGNALS
+
+
+
+def disp_tree_lines(instances):
+    """Lines of the --disp-tree output of a testbench with instances of one entity
+    """
+
+    yield 'tb [entity]'
+    yield '  behav [arch]'
+    yield '    clk [signal]'
+    for i in range(instances):
+        yield '    u_core_' + str(i) + ' [instance]'
+        yield '      core [entity]'
+        yield '        rtl [arch]'
+        for port in range(PORTS):
+            yield '          p' + str(port) + ' [port ' + ('in' if port % 2 else 'out') + ']'
+        for signal in range(SIGNALS):
+            yield '          s' + str(signal) + ' [signal]'
+        yield '          p_main [process]'
+    # Trailing lines that are not part of the tree
+    yield ''
+    yield ''
+
+
+
+def units(top):
+    """Number of units in the hierarchy
+    """
+
+    count = 0
+    pending = [top]
+    while pending:
+        unit = pending.pop()
+        count += 1
+        pending.extend(unit.iter_children())
+    return count
+
+
+
+def main():
+    parser = ArgumentParser(description='Parse time of a GHDL hierarchy')
+    parser.add_argument('--lines', type=int, default=1000000, help='Approximate tree size')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs, the best one is reported')
+    args = parser.parse_args()
+
+    instances = args.lines // LINES_PER_INSTANCE
+    best = None
+    for _ in range(args.repeat):
+        start = perf_counter()
+        top = parse_run_lines(disp_tree_lines(instances))
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    lines = instances * LINES_PER_INSTANCE + 3
+    print('%d lines, %d units: %.2f s, %.0f lines/s' % (lines, units(top), best, lines / best))
+
+
+
+if __name__ == '__main__':
+    main()
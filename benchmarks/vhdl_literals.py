@@ -0,0 +1,73 @@
+"""Speed of vhdl_literals() against formatting the values one by one
+
+For each column type, the same 64k values (one write chunk) are formatted
+with vhdl_literals() and with the per-element vhdl_literal_formatter()
+that it falls back to. Float times are the time column of a NumPy array
+converted with tolist().
+
+    python benchmarks/vhdl_literals.py
+"""
+
+from argparse                       import (ArgumentParser)
+from timeit                         import (repeat as timeit_repeat)
+from random                         import (seed, randrange)
+from os.path                        import (dirname, abspath)
+from sys                            import (path)
+
+path.insert(0, dirname(dirname(abspath(__file__))))
+
+from hdlcomposer.vhdl.utils         import (vhdl_literals, vhdl_literal_formatter,
+                                            WRITE_CHUNK_ELEMENTS)
+
+
+
+SEPARATOR = ',\n    '
+
+
+
+def columns(length):
+    """(name, data, type, width) of the benchmarked columns
+    """
+
+    seed(0)
+    return [
+        ('integer', [randrange(-1 << 31, 1 << 31) for _ in range(length)], 'integer', None),
+        ('float times', [float(i * 10) for i in range(length)], 'integer', None),
+        ('std_logic', [randrange(2) for _ in range(length)], 'std_logic', None),
+        ('unsigned(14)', [randrange(1 << 14) for _ in range(length)], 'unsigned', 14),
+        ('signed(32)', [randrange(-1 << 31, 1 << 31) for _ in range(length)], 'signed', 32),
+    ]
+
+
+
+def one_by_one(data, data_type, data_w):
+    to_literal = vhdl_literal_formatter(data_type, data_w)
+    if data_type == 'integer':
+        # The formatter is str, it would write 10.0 for float times
+        return SEPARATOR.join([to_literal(int(data_i)) for data_i in data])
+    return SEPARATOR.join(map(to_literal, data))
+
+
+
+def best_time(function, repeat):
+    return min(timeit_repeat(function, number=1, repeat=repeat))
+
+
+
+def main():
+    parser = ArgumentParser(description='Speed of vhdl_literals()')
+    parser.add_argument('--length', type=int, default=WRITE_CHUNK_ELEMENTS, help='Values per column')
+    parser.add_argument('--repeat', type=int, default=10, help='Runs, the best one is reported')
+    args = parser.parse_args()
+
+    print('%-14s %12s %12s %8s' % ('column', 'one by one', 'bulk', 'speedup'))
+    for name, data, data_type, data_w in columns(args.length):
+        assert vhdl_literals(data, data_type, data_w, SEPARATOR) == one_by_one(data, data_type, data_w)
+        single = best_time(lambda: one_by_one(data, data_type, data_w), args.repeat)
+        bulk = best_time(lambda: vhdl_literals(data, data_type, data_w, SEPARATOR), args.repeat)
+        print('%-14s %10.1f ms %10.1f ms %7.1fx' % (name, single * 1e3, bulk * 1e3, single / bulk))
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Throughput of the VHDL package writer
+
+Writes a package with arrays of random std_logic_vector values (10 arrays
+of 200k 14-bit values by default, about 44 MB) with generate_package() and
+reports the MB/s of the best run. The content hash of the package is part
+of the measured time.
+
+    python benchmarks/write_package.py --arrays 10 --length 200000
+"""
+
+from argparse                       import (ArgumentParser)
+from time                           import (perf_counter)
+from random                         import (seed, randrange)
+from tempfile                       import (TemporaryDirectory)
+from os.path                        import (dirname, abspath, join, getsize)
+from sys                            import (path)
+
+path.insert(0, dirname(dirname(abspath(__file__))))
+
+from hdlcomposer.vhdl.utils         import (generate_package)
+
+
+
+def package_config(arrays, length, width):
+    """pkg_cfg with random std_logic_vector arrays
+    """
+
+    seed(0)
+    return {
+        'data_' + str(i): {
+            'data': [randrange(1 << width) for _ in range(length)],
+            'type': 'std_logic_vector',
+            'width': width,
+        } for i in range(arrays)
+    }
+
+
+
+def main():
+    parser = ArgumentParser(description='Throughput of the VHDL package writer')
+    parser.add_argument('--arrays', type=int, default=10, help='Number of constants')
+    parser.add_argument('--length', type=int, default=200000, help='Elements per constant')
+    parser.add_argument('--width', type=int, default=14, help='Bits per element')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs, the best one is reported')
+    args = parser.parse_args()
+
+    pkg_cfg = package_config(args.arrays, args.length, args.width)
+    with TemporaryDirectory() as output_directory:
+        best = None
+        for _ in range(args.repeat):
+            start = perf_counter()
+            generate_package(pkg_cfg, 'benchmark_pkg', output_directory, force=True)
+            elapsed = perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        size = getsize(join(output_directory, 'benchmark_pkg.vhd'))
+    print('%.1f MB: %.2f s, %.1f MB/s' % (size / 1e6, best, size / 1e6 / best))
+
+
+
+if __name__ == '__main__':
+    main()
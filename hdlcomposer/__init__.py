@@ -1,6 +1,20 @@
-from hdlcomposer import utils
-from hdlcomposer import sim
-from hdlcomposer import signals
-from hdlcomposer import vhdl
-from hdlcomposer import systemverilog
-from hdlcomposer import vcd
+from importlib import (import_module)
+
+
+
+# The subpackages are imported the first time they are used (PEP 562), so
+# that importing hdlcomposer only loads what is needed
+SUBPACKAGES = ('utils', 'sim', 'signals', 'vhdl', 'systemverilog', 'vcd')
+__all__ = list(SUBPACKAGES)
+
+
+
+def __getattr__(name):
+    if name in SUBPACKAGES:
+        return import_module('hdlcomposer.' + name)
+    raise AttributeError("module 'hdlcomposer' has no attribute '" + name + "'")
+
+
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBPACKAGES))
@@ -1 +1,3 @@
 from hdlcomposer.signals.signals import *
+from hdlcomposer.signals.fourstate import *
+from hdlcomposer.signals.pyramid import *
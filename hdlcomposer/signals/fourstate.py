@@ -0,0 +1,258 @@
+from itertools import (repeat)
+
+
+
+__all__ = ['FourState', 'four_state_columns', 'FOUR_STATE_VAR_TYPES']
+
+
+
+# VCD variable types whose values are bits; real, string and event are not
+FOUR_STATE_VAR_TYPES = frozenset(('wire', 'reg', 'logic', 'bit', 'integer', 'parameter',
+                                  'tri', 'tri0', 'tri1', 'triand', 'trior', 'trireg',
+                                  'wand', 'wor', 'supply0', 'supply1'))
+VALUE_BITS = str.maketrans('01xXzZuUwW-lLhH', '010011000000001')
+MASK_BITS = str.maketrans('01xXzZuUwW-lLhH', '001111111110000')
+UNKNOWN_CHARS = frozenset('xXzZ')
+
+
+
+class FourState():
+    """Four-state (0, 1, X, Z) value of any width, packed in two integers
+
+    Each bit is encoded in a value and a mask bit plane: 0 is (0, 0), 1 is
+    (1, 0), X is (0, 1) and Z is (1, 1). Wide buses take two Python ints
+    instead of one character per bit, and comparisons and bitwise
+    operations work on all the bits at once.
+
+    Equality (==) is exact, as the === operator of Verilog: X only equals X.
+    Use matches() to ignore the unknown bits.
+
+    Args:
+        value (int): Value bit plane.
+        mask (int): Unknown bits (X or Z).
+        width (int): Number of bits.
+    """
+
+    __slots__ = ('value', 'mask', 'width')
+
+    def __init__(self, value=0, mask=0, width=1):
+        full = (1 << width) - 1
+        self.value = value & full
+        self.mask = mask & full
+        self.width = width
+
+
+
+    @classmethod
+    def from_str(cls, bits, width=None):
+        """Value from a VCD or VHDL string like '10xz'
+
+        U, W and - are X, L is 0 and H is 1. If width is larger than the
+        string, it is extended as in VCD files: with X or Z if that is the
+        leftmost bit, with 0 otherwise.
+        """
+
+        if not bits:
+            raise ValueError('Error a four-state value needs at least one bit')
+        value = int(bits.translate(VALUE_BITS), 2)
+        mask = int(bits.translate(MASK_BITS), 2)
+        length = len(bits)
+        if width is None or width <= length:
+            return cls(value, mask, width or length)
+        if bits[0] in UNKNOWN_CHARS:
+            extension = ((1 << width) - 1) ^ ((1 << length) - 1)
+            mask |= extension
+            if bits[0] in 'zZ':
+                value |= extension
+        return cls(value, mask, width)
+
+
+
+    def __repr__(self):
+        return 'FourState - ' + str(self)
+
+
+
+    def __str__(self):
+        if not self.mask:
+            return format(self.value, '0' + str(self.width) + 'b')
+        return ''.join('xz'[v == '1'] if m == '1' else v
+                       for v, m in zip(format(self.value, '0' + str(self.width) + 'b'),
+                                       format(self.mask, '0' + str(self.width) + 'b')))
+
+
+
+    def __eq__(self, other):
+        if isinstance(other, FourState):
+            return self.value == other.value and self.mask == other.mask and \
+                   self.width == other.width
+        if isinstance(other, int):
+            return not self.mask and self.value == other
+        return NotImplemented
+
+
+
+    def __hash__(self):
+        return hash(self.value) if not self.mask else hash((self.value, self.mask, self.width))
+
+
+
+    @property
+    def full(self):
+        return (1 << self.width) - 1
+
+
+
+    @property
+    def is_known(self):
+        """All the bits are 0 or 1
+        """
+
+        return not self.mask
+
+
+
+    @property
+    def has_x(self):
+        return bool(self.mask & ~self.value)
+
+
+
+    @property
+    def has_z(self):
+        return bool(self.mask & self.value)
+
+
+
+    def to_int(self):
+        """Unsigned integer value, None if any bit is X or Z
+        """
+
+        return None if self.mask else self.value
+
+
+
+    def bit(self, index):
+        """'0', '1', 'x' or 'z'
+        """
+
+        return ('xz' if (self.mask >> index) & 1 else '01')[(self.value >> index) & 1]
+
+
+
+    def matches(self, other, care=None):
+        """The known bits of both values are equal
+
+        Bits that are X or Z in any of them, or not set in the care mask,
+        are not compared.
+        """
+
+        if not isinstance(other, FourState):
+            other = FourState(other, 0, self.width)
+        compared = ~(self.mask | other.mask) & (self.full if care is None else care)
+        return not ((self.value ^ other.value) & compared)
+
+
+
+    def equals(self, other):
+        """Logical equality (==) of VHDL and Verilog: None if it depends on unknown bits
+        """
+
+        if not isinstance(other, FourState):
+            other = FourState(other, 0, self.width)
+        known = ~(self.mask | other.mask) & self.full
+        if (self.value ^ other.value) & known:
+            return False
+        return None if self.mask or other.mask else True
+
+
+
+    def known_bits(self):
+        """Bit planes of the bits that are 0 and the bits that are 1
+        """
+
+        return ~(self.value | self.mask) & self.full, self.value & ~self.mask
+
+
+
+    def operand(self, other):
+        """other as a FourState, ints take the width of this value as in __eq__
+        """
+
+        if isinstance(other, FourState):
+            return other
+        if isinstance(other, int):
+            return FourState(other, 0, self.width)
+        return None
+
+
+
+    def __and__(self, other):
+        other = self.operand(other)
+        if other is None:
+            return NotImplemented
+        zeros, ones = self.known_bits()
+        other_zeros, other_ones = other.known_bits()
+        width = max(self.width, other.width)
+        ones &= other_ones
+        return FourState(ones, ~(zeros | other_zeros | ones), width)
+
+
+
+    def __or__(self, other):
+        other = self.operand(other)
+        if other is None:
+            return NotImplemented
+        zeros, ones = self.known_bits()
+        other_zeros, other_ones = other.known_bits()
+        width = max(self.width, other.width)
+        zeros &= other_zeros
+        return FourState(ones | other_ones, ~(zeros | ones | other_ones), width)
+
+
+
+    def __xor__(self, other):
+        other = self.operand(other)
+        if other is None:
+            return NotImplemented
+        unknown = self.mask | other.mask
+        return FourState((self.value ^ other.value) & ~unknown, unknown,
+                         max(self.width, other.width))
+
+
+
+    __rand__ = __and__
+    __ror__ = __or__
+    __rxor__ = __xor__
+
+
+
+    def __invert__(self):
+        return FourState(~self.value & ~self.mask, self.mask, self.width)
+
+
+
+def four_state_columns(waveform, width):
+    """Convert a [[time, '10xz'], ...] waveform into three columns
+
+    The strings are translated and parsed with map(), so no Python code runs
+    per bit, and only values shorter than width need a second pass.
+
+    Only for bit and vector variables (FOUR_STATE_VAR_TYPES), the values of
+    real or string variables raise ValueError.
+
+    Returns:
+        times, values, masks: Lists with the time, value bit plane and mask
+        bit plane of each transition, see FourState.
+    """
+
+    times = [tv[0] for tv in waveform]
+    strings = [tv[1] for tv in waveform]
+    values = list(map(int, map(str.translate, strings, repeat(VALUE_BITS)), repeat(2)))
+    masks = list(map(int, map(str.translate, strings, repeat(MASK_BITS)), repeat(2)))
+    if strings and min(map(len, strings)) < width:
+        for i, bits in enumerate(strings):
+            if len(bits) < width and bits[0] in UNKNOWN_CHARS:
+                extended = FourState.from_str(bits, width)
+                values[i], masks[i] = extended.value, extended.mask
+    return times, values, masks
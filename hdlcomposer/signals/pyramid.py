@@ -0,0 +1,302 @@
+from bisect                         import (bisect_right)
+from gzip                           import (open as gzip_open)
+from json                           import (dump, load)
+from os.path                        import (join)
+
+from hdlcomposer.utils.general      import (tv_files, hash_files)
+from hdlcomposer.signals.signals    import (Signal)
+from hdlcomposer.signals.fourstate  import (FourState)
+
+
+
+__all__ = ['WaveformPyramid', 'numeric_value', 'pyramid_file', 'load_pyramid', 'PYRAMID_BRANCHING']
+
+
+
+PYRAMID_BRANCHING = 16
+
+
+
+def numeric_value(value):
+    """Integer (or number) used for the min/max of a waveform value
+
+    Binary strings are parsed, FourState values with X or Z bits and values
+    that cannot be converted are None.
+    """
+
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else (int(value) if isinstance(value, bool) else value)
+    if isinstance(value, FourState):
+        return value.to_int()
+    try:
+        return int(value, 2)
+    except (TypeError, ValueError):
+        return None
+
+
+
+def bit_toggles(previous, value):
+    """Number of bits that change between two values, 1 if they cannot be compared bitwise
+    """
+
+    if isinstance(previous, int) and isinstance(value, int):
+        return bin(previous ^ value).count('1')
+    return 0 if previous == value else 1
+
+
+
+def min_known(a, b):
+    """Minimum of two values, ignoring the one that is None
+    """
+
+    return b if a is None else (a if b is None or a <= b else b)
+
+
+
+def max_known(a, b):
+    """Maximum of two values, ignoring the one that is None
+    """
+
+    return b if a is None else (a if b is None or a >= b else b)
+
+
+
+class WaveformPyramid():
+    """Precomputed summary of a waveform for range queries
+
+    Level 0 has the value of each transition; each level above has the min
+    and max of blocks of PYRAMID_BRANCHING elements of the level below. The
+    transitions and bit toggles are kept as prefix sums. A query over any
+    time range only reads the partial blocks at its ends on each level, so
+    it takes O(log n) instead of a scan of the transitions.
+
+    Values are converted with numeric_value(); unknown values (X, Z, None)
+    are left out of the min and max.
+
+    Args:
+        waveform: Signal, or its [[time, value], ...] list.
+        branching (int): Elements per block.
+    """
+
+    def __init__(self, waveform=None, branching=PYRAMID_BRANCHING):
+        self.branching = branching
+        self.times = []
+        self.minimums = []
+        self.maximums = []
+        self.changes = []
+        self.toggles = []
+        if waveform is not None:
+            self.build(waveform.waveform if isinstance(waveform, Signal) else waveform)
+
+
+
+    def __repr__(self):
+        return 'WaveformPyramid - ' + str(len(self.times)) + ' transitions, ' + \
+               str(len(self.minimums)) + ' levels'
+
+
+
+    def __len__(self):
+        return len(self.times)
+
+
+
+    def build(self, waveform):
+        self.times = [tv[0] for tv in waveform]
+        values = [tv[1] for tv in waveform]
+        numbers = [numeric_value(value) for value in values]
+
+        self.changes = [0]
+        self.toggles = [0]
+        for i in range(1, len(values)):
+            changed = values[i] != values[i - 1]
+            self.changes.append(self.changes[-1] + changed)
+            self.toggles.append(self.toggles[-1] +
+                                (bit_toggles(numbers[i - 1], numbers[i]) if changed else 0))
+
+        self.minimums = [numbers]
+        self.maximums = [numbers]
+        while len(self.minimums[-1]) > 1:
+            minimums = []
+            maximums = []
+            below_min = self.minimums[-1]
+            below_max = self.maximums[-1]
+            for start in range(0, len(below_min), self.branching):
+                block_min = None
+                block_max = None
+                for i in range(start, min(start + self.branching, len(below_min))):
+                    block_min = min_known(block_min, below_min[i])
+                    block_max = max_known(block_max, below_max[i])
+                minimums.append(block_min)
+                maximums.append(block_max)
+            self.minimums.append(minimums)
+            self.maximums.append(maximums)
+        return self
+
+
+
+    def index_range(self, start, end):
+        """First and last transitions that define the values in [start, end]
+
+        The first one is the transition in effect at start.
+        """
+
+        first = max(bisect_right(self.times, start) - 1, 0)
+        last = bisect_right(self.times, end) - 1
+        return first, last
+
+
+
+    def minmax(self, start, end):
+        """Minimum and maximum value in the time range [start, end]
+
+        None if the range is before the first transition or all the values
+        are unknown.
+        """
+
+        low, high = self.index_range(start, end)
+        minimum = None
+        maximum = None
+        level = 0
+        while low <= high:
+            level_min = self.minimums[level]
+            level_max = self.maximums[level]
+            if high - low < self.branching or level == len(self.minimums) - 1:
+                for i in range(low, high + 1):
+                    minimum = min_known(minimum, level_min[i])
+                    maximum = max_known(maximum, level_max[i])
+                break
+            while low % self.branching and low <= high:
+                minimum = min_known(minimum, level_min[low])
+                maximum = max_known(maximum, level_max[low])
+                low += 1
+            while (high + 1) % self.branching and high >= low:
+                minimum = min_known(minimum, level_min[high])
+                maximum = max_known(maximum, level_max[high])
+                high -= 1
+            low //= self.branching
+            high = (high + 1) // self.branching - 1
+            level += 1
+        return minimum, maximum
+
+
+
+    def any_nonzero(self, start, end):
+        """The signal has a known value other than 0 at some time in [start, end]
+        """
+
+        minimum, maximum = self.minmax(start, end)
+        return maximum is not None and (minimum != 0 or maximum != 0)
+
+
+
+    def prefix(self, counts, time):
+        i = bisect_right(self.times, time) - 1
+        return counts[i] if i >= 0 else 0
+
+
+
+    def transitions(self, start, end):
+        """Number of value changes in the time range (start, end]
+        """
+
+        return self.prefix(self.changes, end) - self.prefix(self.changes, start)
+
+
+
+    def toggle_count(self, start, end):
+        """Number of bit toggles in the time range (start, end]
+        """
+
+        return self.prefix(self.toggles, end) - self.prefix(self.toggles, start)
+
+
+
+    def bins(self, start, end, count):
+        """Edges of count equal bins between start and end
+        """
+
+        step = (end - start) / count
+        return [start + round(i * step) for i in range(count + 1)]
+
+
+
+    def activity(self, start, end, count, toggles=True):
+        """Histogram of the activity between start and end
+
+        Returns the number of bit toggles (or value changes) in each of count
+        equal bins.
+        """
+
+        edges = self.bins(start, end, count)
+        counter = self.toggle_count if toggles else self.transitions
+        return [counter(edges[i], edges[i + 1]) for i in range(count)]
+
+
+
+    def envelope(self, start, end, count):
+        """Min/max envelope for plotting the range zoomed out
+
+        Returns a list of (bin start, minimum, maximum) for count equal bins.
+        """
+
+        edges = self.bins(start, end, count)
+        return [(edges[i],) + self.minmax(edges[i], edges[i + 1]) for i in range(count)]
+
+
+
+    def save(self, file_path, key=None):
+        """Save the pyramid to a compressed file, see save_hierarchy()
+        """
+
+        with gzip_open(file_path, 'wt', encoding='utf-8') as f:
+            dump({'key': key, 'branching': self.branching, 'times': self.times,
+                  'minimums': self.minimums, 'maximums': self.maximums,
+                  'changes': self.changes, 'toggles': self.toggles}, f, separators=(',', ':'))
+
+
+
+    @classmethod
+    def load(cls, file_path, key=None):
+        """Load a pyramid saved by save()
+
+        Returns None if the file does not exist or was saved with a
+        different key.
+        """
+
+        try:
+            with gzip_open(file_path, 'rt', encoding='utf-8') as f:
+                saved = load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+        if saved.get('key') != key:
+            return None
+        pyramid = cls(branching=saved['branching'])
+        for name in ('times', 'minimums', 'maximums', 'changes', 'toggles'):
+            setattr(pyramid, name, saved[name])
+        return pyramid
+
+
+
+def pyramid_file(signal_name, directory_path):
+    """Path of the pyramid saved next to the tv_files() of a signal
+    """
+
+    return join(directory_path, signal_name + '_pyramid.json.gz')
+
+
+
+def load_pyramid(signal_name, directory_path, signal_type='unsigned'):
+    """Pyramid of a signal stored as tv_files(), built and saved only when they change
+
+    The hash of the time and value files is the key of the saved pyramid.
+    """
+
+    file_paths = tv_files(signal_name, directory_path)
+    key = hash_files(file_paths)
+    file_path = pyramid_file(signal_name, directory_path)
+    pyramid = WaveformPyramid.load(file_path, key)
+    if pyramid is None:
+        pyramid = WaveformPyramid(Signal(file_paths, signal_type, init_files=True))
+        pyramid.save(file_path, key)
+    return pyramid
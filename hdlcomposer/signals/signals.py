@@ -1,7 +1,18 @@
+from bisect                    import (bisect_right)
+
 from hdlcomposer.utils.general import (bin_str_to)
 
 
 
+__all__ = ['Tick', 'Constant', 'Signal', 'Group', 'EDGES', 'HIGH_VALUES']
+
+
+
+EDGES = ('rising', 'falling', 'both')
+HIGH_VALUES = (1, '1', True)
+
+
+
 class Tick():
     """Clock shorthand
 
@@ -170,6 +181,44 @@ class Signal():
 
 
 
+    def edges(self, edge='rising'):
+        """Ticks where the signal, used as a clock, has an edge
+
+        The signal is high when its value is 1, '1' or True, and low
+        otherwise. The initial value is not an edge.
+
+        Args:
+            edge: 'rising', 'falling' or 'both'.
+        """
+
+        if edge not in EDGES:
+            raise ValueError('Invalid edge. Valid values are ' + ', '.join(EDGES))
+        edge_ticks = []
+        previous_high = None
+        for tick, value in self.waveform:
+            high = value in HIGH_VALUES
+            if previous_high is not None and high != previous_high and \
+               (edge == 'both' or high == (edge == 'rising')):
+                edge_ticks.append(tick)
+            previous_high = high
+        return edge_ticks
+
+
+
+    def sample(self, ticks):
+        """Values of the signal at each of the provided ticks, as get_value() would return them
+
+        The ticks are searched in the waveform by bisection, so sampling is
+        O(log n) per tick instead of a walk from the first transition. The
+        value at a tick includes the change made at that same tick, if any.
+        """
+
+        times = [tv[self.t] for tv in self.waveform]
+        values = [tv[self.v] for tv in self.waveform]
+        return [values[max(bisect_right(times, tick) - 1, 0)] for tick in ticks]
+
+
+
     def append(self, new_value, current_tick=None):
         """Add a new value of the signal
 
@@ -311,3 +360,30 @@ class Group():
     def read_values(self, ticks=1, reset=False):
         read_result = self.read(ticks, reset)
         return {signal: read_result[signal][0] for signal in read_result}
+
+
+
+    def sample_on(self, clock, edge='rising'):
+        """Value of every signal of the group at each edge of a clock
+
+        The edges are found once and every signal is sampled at all of them
+        at once, see Signal.sample(). As in get_value(), a signal that changes
+        at the tick of an edge is sampled with its new value, not the one it
+        had before the edge.
+
+        Args:
+            clock: Signal, or name of a signal of the group.
+            edge: 'rising', 'falling' or 'both'.
+
+        Returns:
+            A table with one column per signal, plus the ticks of the edges:
+            {'tick': [t0, t1, ...], 'signal_name_a': [a(t0), a(t1), ...], ...}
+        """
+
+        if not isinstance(clock, Signal):
+            clock = self.signals[clock]
+        edge_ticks = clock.edges(edge)
+        table = {'tick': edge_ticks}
+        for name, signal in self.signals.items():
+            table[name] = signal.sample(edge_ticks)
+        return table
@@ -1 +1,13 @@
-from hdlcomposer.sim import ghdl
+from importlib import (import_module)
+
+
+
+SIMULATORS = ('ghdl',)
+__all__ = list(SIMULATORS)
+
+
+
+def __getattr__(name):
+    if name in SIMULATORS:
+        return import_module('hdlcomposer.sim.' + name)
+    raise AttributeError("module 'hdlcomposer.sim' has no attribute '" + name + "'")
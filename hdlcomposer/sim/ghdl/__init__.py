@@ -1,2 +1,32 @@
-from hdlcomposer.sim.ghdl.ghdl  import *
-from hdlcomposer.sim.ghdl.parse import *
+from importlib import (import_module)
+
+
+
+# The GHDL wrapper is imported the first time one of its names is used
+# (PEP 562), so the server client does not load it
+LAZY_MODULES = ('ghdl', 'parse')
+
+
+
+def public_names(module):
+    return [name for name in vars(module) if not name.startswith('_')]
+
+
+
+def __getattr__(name):
+    if name == '__all__':
+        # Only needed by 'from hdlcomposer.sim.ghdl import *', which loads
+        # the modules and exports the same names as before the lazy loading
+        all_names = sorted({name for module_name in LAZY_MODULES
+                            for name in public_names(import_module('hdlcomposer.sim.ghdl.' + module_name))})
+        globals()['__all__'] = all_names
+        return all_names
+    if name in LAZY_MODULES:
+        return import_module('hdlcomposer.sim.ghdl.' + name)
+    if not name.startswith('_'):
+        for module_name in LAZY_MODULES:
+            module = import_module('hdlcomposer.sim.ghdl.' + module_name)
+            if name in vars(module):
+                globals()[name] = vars(module)[name]
+                return globals()[name]
+    raise AttributeError("module 'hdlcomposer.sim.ghdl' has no attribute '" + name + "'")
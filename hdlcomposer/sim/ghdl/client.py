@@ -0,0 +1,131 @@
+from os                         import (getcwd, environ, mkdir, lstat)
+from os.path                    import (join)
+from re                         import (compile)
+from json                       import (dumps, loads)
+from getpass                    import (getuser)
+from tempfile                   import (gettempdir)
+from stat                       import (S_ISDIR, S_IMODE)
+from socket                     import (socket as create_socket, gethostbyname, AF_INET, SOCK_STREAM)
+try:
+    from socket                 import (AF_UNIX)
+except ImportError:
+    AF_UNIX = None
+try:
+    from os                     import (getuid)
+except ImportError:
+    getuid = None
+
+
+
+DEFAULT_TCP_ADDRESS = '127.0.0.1:7474'
+RE_TCP_ADDRESS = compile(r'^(?P<host>[\w.\-]*):(?P<port>\d+)$')
+
+
+
+###############################################################################
+# ADDRESSES
+###############################################################################
+
+def default_address():
+    """Unix socket in a private directory, or a localhost port where not available
+
+    The socket is in $XDG_RUNTIME_DIR or, if it is not set, in a directory of
+    the user in the temporary directory. See private_directory().
+    """
+
+    if AF_UNIX is None:
+        return DEFAULT_TCP_ADDRESS
+    runtime_directory = environ.get('XDG_RUNTIME_DIR')
+    if runtime_directory:
+        return join(runtime_directory, 'hdlcomposer-ghdl.sock')
+    return join(gettempdir(), 'hdlcomposer-' + getuser(), 'ghdl.sock')
+
+
+
+def private_directory(directory_path):
+    """Create a directory only accessible by the current user, or check an existing one
+
+    Raises ValueError if the directory belongs to another user, is a link or
+    is accessible by others, since someone else could replace the socket.
+    """
+
+    try:
+        mkdir(directory_path, 0o700)
+    except FileExistsError:
+        pass
+    status = lstat(directory_path)
+    if not S_ISDIR(status.st_mode) or S_IMODE(status.st_mode) & 0o077 or \
+       (getuid is not None and status.st_uid != getuid()):
+        raise ValueError('Error ' + directory_path + ' must be a directory that only ' +
+                         'the current user can access')
+    return directory_path
+
+
+
+def is_loopback(host):
+    """The host name or IP address is a loopback address (127.0.0.1, ::1, localhost)
+
+    ipaddress is imported here, only the server needs it.
+    """
+
+    from ipaddress import (ip_address)
+
+    try:
+        return ip_address(gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+
+def parse_address(address=None):
+    """Socket family and address for 'host:port' or the path of a Unix socket
+    """
+
+    address = address or default_address()
+    match = RE_TCP_ADDRESS.match(address)
+    if match:
+        return AF_INET, (match.group('host') or '127.0.0.1', int(match.group('port')))
+    return AF_UNIX, address
+
+
+
+###############################################################################
+# CLIENT
+###############################################################################
+
+def request(command, address=None, timeout=None, **fields):
+    """Send a request to a running GHDLServer and wait for the response
+
+    Args:
+        command (str): ping, import, run, parse or shutdown.
+        address (str): Address of the server. See default_address().
+        timeout (float): Seconds to wait for the response. None waits forever.
+        fields: Rest of the request, for example options (the GHDL arguments),
+            testbench or run_time. The current directory is sent as cwd.
+
+    Returns:
+        The response, a dictionary with the error code and the output.
+    """
+
+    family, address = parse_address(address)
+    fields.setdefault('cwd', getcwd())
+    with create_socket(family, SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(address)
+        connection.sendall((dumps(dict(fields, command=command)) + '\n').encode('utf-8'))
+        with connection.makefile('rb') as response:
+            line = response.readline()
+    if not line:
+        return {'error': 1, 'output': 'No response from the server'}
+    return loads(line)
+
+
+
+def ping(address=None, timeout=1.0):
+    """True if a server is answering at the address
+    """
+
+    try:
+        return request('ping', address, timeout)['output'] == 'pong'
+    except OSError:
+        return False
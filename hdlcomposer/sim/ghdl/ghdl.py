@@ -1,19 +1,45 @@
-from os                         import (getcwd, mkdir)
-from os.path                    import (normpath, join, abspath,
-                                        exists, dirname, isabs, basename)
+from os                         import (getcwd, mkdir, makedirs, replace, symlink, remove,
+                                        readlink, stat, environ, cpu_count, listdir)
+from os.path                    import (normpath, join, abspath, getmtime, realpath, islink,
+                                        exists, dirname, isabs, basename, splitext, expanduser)
 from sys                        import (stdout)
 from shutil                     import (rmtree)
 from platform                   import (system)
-from json                       import (dump, load)
 from math                       import (ceil)
 from re                         import (compile)
-
-from hdlcomposer.utils          import (run_console_command,
-                                        get_dirs_containing_files,
-                                        save_txt, get_filepaths_recursive,
-                                        gtkwave_open_wave)
-from hdlcomposer.vhdl.utils     import (data_to_package)
-from hdlcomposer.sim.ghdl.parse import (parse_run, parse_included)
+from json                       import (dump)
+from hashlib                    import (sha256)
+from tempfile                   import (mkdtemp)
+from html                       import (escape)
+
+from hdlcomposer.utils          import (run_command, run_command_chains, command_to_str,
+                                        hash_files, ConfigStore,
+                                        DirectoryCache, locked_file,
+                                        get_dirs_containing_files, walk_directories,
+                                        get_filepaths_recursive,
+                                        gtkwave_open_wave, gtkw_signals, create_watcher)
+from hdlcomposer.vhdl.utils     import (data_to_package, data_to_stimulus)
+from hdlcomposer.vhdl.units     import (save_hierarchy, load_hierarchy, Port, Signal)
+from hdlcomposer.vhdl.index     import (HierarchyIndex, PATH_SEPARATOR)
+from hdlcomposer.vcd.subset     import (vcd_subset)
+from hdlcomposer.sim.ghdl.parse import (RunParser, LogAnalyzer, parse_included, index_xml_dump)
+
+
+
+VHDL_EXTENSIONS = ['.vhd', '.vhdl']
+WAVE_SIGNALS_FROM_GTKW = 'gtkw'
+WAVE_FORMATS = ('ghw', 'vcd')
+VENDOR_CACHE_MANIFEST = 'hdlcomposer-vendor.json'
+XREF_STATE_FILE = 'hdlcomposer-xref.json'
+XREF_BATCH_SIZE = 50
+XREF_INDEX = 'index.html'
+XREF_STYLE = 'ghdl.css'
+# Libraries of each vendor script, and the libraries they are compiled against
+VENDOR_LIBRARIES = {
+    'xilinx-vivado': {'Unisim': [], 'UniMacro': ['Unisim'], 'UniFast': [], 'SecureIP': []},
+    'xilinx-ise': {'Unisim': [], 'UniMacro': ['Unisim'], 'Simprim': [], 'CoreLib': ['Unisim'],
+                   'SecureIP': []},
+}
 
 
 
@@ -21,25 +47,64 @@ from hdlcomposer.sim.ghdl.parse import (parse_run, parse_included)
 # GHDL COMMANDS
 ###############################################################################
 
+def command_from_parameters(parameters):
+    """Flatten a dictionary of argument lists into a single command
+    """
+
+    return [arg for value in parameters.values() for arg in value]
+
+
+
+def vendor_vhdl_standard(vhdl_standard):
+    """Name of the VHDL standard for the vendor compilation scripts
+    """
+
+    if vhdl_standard in ('93', '93c', 93):
+        return 'VHDL93'
+    elif vhdl_standard in ('2008', '08', 2008, 8):
+        return 'VHDL2008'
+    raise ValueError('Invalid VHDL standard. Valid values are 93, 2008')
+
+
+
+def vendor_library_chains(vendor_name):
+    """Groups of vendor libraries that can be compiled independently
+
+    Each group starts with a library that depends on no other, followed by
+    the libraries compiled against it. None if the libraries of the vendor
+    are not known.
+    """
+
+    libraries = VENDOR_LIBRARIES.get(vendor_name.lower())
+    if libraries is None:
+        return None
+    chains = {library: [library] for library, dependencies in libraries.items() if not dependencies}
+    for library, dependencies in libraries.items():
+        if dependencies:
+            chains[dependencies[0]].append(library)
+    return list(chains.values())
+
+
+
 def compile_vendor(vendor_name, output_path, vendor_install_path, ghdl_install_path,
-                   vhdl_standard='93c', recompile=False, verbose=False):
+                   vhdl_standard='93c', recompile=False, verbose=False, jobs=1):
     """Compile vendor libraries
 
     For a list of supported libraries check your GHDL version.
     This should be run once in the system, the compiled result can be reused by
     pointing to the compiled output directory.
-    """
 
-    if vhdl_standard in ('93', '93c', 93):
-        vhdl_standard = 'VHDL93'
-    elif vhdl_standard in ('2008', '08', 2008, 8):
-        vhdl_standard = 'VHDL2008'
-    else:
-        raise ValueError('Invalid VHDL standard. Valid values are 93, 2008')
+    With more than one job, the libraries that do not depend on each other
+    (see VENDOR_LIBRARIES) are compiled at the same time, each group in its
+    own subdirectory of output_path. Vendors not listed there are compiled
+    with a single -All run.
+    """
 
+    vhdl_standard = vendor_vhdl_standard(vhdl_standard)
 
     output_path_norm = abspath(output_path)
-    if (not recompile) and get_dirs_containing_files(output_path_norm, extension='.cf'):
+    if (not recompile) and get_dirs_containing_files(output_path_norm, extension='.cf',
+                                                             first_only=True):
         message = vendor_name + ' libraries found, not recompiling'
         if verbose:
             stdout.write(message + '\n')
@@ -57,21 +122,161 @@ def compile_vendor(vendor_name, output_path, vendor_install_path, ghdl_install_p
 
 
     OS = system()
-    compile_vendor_command = \
-        normpath( join( join(ghdl_install_path, 'lib/vendors'),
-                        ('compile-' + vendor_name + ('.ps1' if OS == 'Windows' else '.sh')) ) ) + \
-        ' -Source "' + vendor_sources_dir + '"' + \
-        ' -' + vhdl_standard + \
-        ' -SuppressWarnings' + \
-        ' -Output "' + output_path_norm + '"' + \
-        ' -All -GHDL "' + normpath( join(ghdl_install_path, 'bin') ) + '"'
-    if OS == 'Windows':
-        compile_vendor_command = 'powershell.exe -Command "' + compile_vendor_command + '"'
-
     if OS not in ('Windows', 'Linux','Darwin'):
         raise ValueError('Automatic vendor libs compilation is only available in Linux, Mac and Windows')
 
-    return run_console_command(compile_vendor_command)
+    parameters = {
+        'shell': ['powershell.exe', '-File'] if OS == 'Windows' else [],
+        'script': [normpath( join( join(ghdl_install_path, 'lib/vendors'),
+                                   ('compile-' + vendor_name + ('.ps1' if OS == 'Windows' else '.sh')) ) )],
+        'source': ['-Source', vendor_sources_dir],
+        'standard': ['-' + vhdl_standard],
+        'warnings': ['-SuppressWarnings'],
+        'ghdl': ['-GHDL', normpath( join(ghdl_install_path, 'bin') )],
+    }
+
+    chains = vendor_library_chains(vendor_name) if jobs > 1 else None
+    if not chains:
+        parameters['output'] = ['-Output', output_path_norm]
+        parameters['all'] = ['-All']
+        return run_command(command_from_parameters(parameters))
+
+    commands = []
+    for chain in chains:
+        chain_output = ['-Output', join(output_path_norm, chain[0].lower())]
+        commands.append([command_from_parameters(parameters) + chain_output + ['-' + library]
+                         for library in chain])
+    error = 0
+    terminal_output = ''
+    for chain_results in run_command_chains(commands, jobs):
+        for result in chain_results:
+            error = error or result.error
+            terminal_output += result.output
+    return error, terminal_output
+
+
+
+def ghdl_version(ghdl_install_path=None):
+    """First line of ghdl --version, None if GHDL cannot be run
+    """
+
+    executable = join(ghdl_install_path, 'bin', 'ghdl') if ghdl_install_path else 'ghdl'
+    if not exists(executable) and not exists(executable + '.exe'):
+        executable = 'ghdl'
+    error, terminal_output = run_command([executable, '--version'])
+    if error or not terminal_output.strip():
+        return None
+    return terminal_output.strip().splitlines()[0]
+
+
+
+def vendor_cache_directory():
+    """Machine wide directory of the compiled vendor libraries
+
+    HDLCOMPOSER_CACHE if defined, otherwise hdlcomposer/vendor in the user
+    cache directory (XDG_CACHE_HOME or ~/.cache).
+    """
+
+    if environ.get('HDLCOMPOSER_CACHE'):
+        return join(abspath(environ['HDLCOMPOSER_CACHE']), 'vendor')
+    cache_home = environ.get('XDG_CACHE_HOME') or join(expanduser('~'), '.cache')
+    return join(cache_home, 'hdlcomposer', 'vendor')
+
+
+
+def vendor_cache_path(vendor_name, vendor_install_path, ghdl_install_path, vhdl_standard='93c',
+                      cache_directory=None):
+    """Directory of the cache entry for a vendor compilation
+
+    The entry depends on the vendor name, the vendor install (its real path,
+    which contains the version, and its modification time), the GHDL version
+    and the VHDL standard, so any of them changing leads to a new entry.
+    """
+
+    vendor_install_path = realpath(vendor_install_path)
+    vhdl_standard = vendor_vhdl_standard(vhdl_standard)
+    key = [vendor_name.lower(), vendor_install_path, stat(vendor_install_path).st_mtime_ns,
+           ghdl_version(ghdl_install_path), vhdl_standard]
+    key_hash = sha256(repr(key).encode('utf-8')).hexdigest()[:16]
+    return join(cache_directory or vendor_cache_directory(),
+                vendor_name.lower() + '-' + vhdl_standard.lower() + '-' + key_hash)
+
+
+
+def cached_compile_vendor(vendor_name, vendor_install_path, ghdl_install_path, vhdl_standard='93c',
+                          cache_directory=None, recompile=False, verbose=False, jobs=1):
+    """compile_vendor() into a cache shared by all the projects of the machine
+
+    The libraries are compiled in a temporary directory next to the entry,
+    which is renamed to the entry once the compilation succeeds, so an entry
+    is either complete or missing. A lock file makes other processes wait
+    for a compilation in progress and then reuse its result.
+
+    Returns:
+        error (2 if the libraries were already in the cache)
+        terminal_output
+        cache_path: Directory of the compiled libraries
+    """
+
+    cache_path = vendor_cache_path(vendor_name, vendor_install_path, ghdl_install_path,
+                                   vhdl_standard, cache_directory)
+    manifest_path = join(cache_path, VENDOR_CACHE_MANIFEST)
+    message = vendor_name + ' libraries found in cache ' + cache_path
+    if not recompile and exists(manifest_path):
+        if verbose:
+            stdout.write(message + '\n')
+        return 2, message, cache_path
+
+    makedirs(dirname(cache_path), exist_ok=True)
+    with locked_file(cache_path + '.lock'):
+        # Another process may have compiled them while waiting for the lock
+        if not recompile and exists(manifest_path):
+            if verbose:
+                stdout.write(message + '\n')
+            return 2, message, cache_path
+
+        temporary_path = mkdtemp(prefix='.' + basename(cache_path) + '-', dir=dirname(cache_path))
+        error, terminal_output = compile_vendor(vendor_name, temporary_path, vendor_install_path,
+                                                ghdl_install_path, vhdl_standard, True, verbose,
+                                                jobs)
+        if error:
+            rmtree(temporary_path, ignore_errors=True)
+            return error, terminal_output, cache_path
+
+        with open(join(temporary_path, VENDOR_CACHE_MANIFEST), 'w') as manifest_file:
+            dump({
+                'vendor': vendor_name,
+                'vendor_install_path': realpath(vendor_install_path),
+                'ghdl_version': ghdl_version(ghdl_install_path),
+                'vhdl_standard': vendor_vhdl_standard(vhdl_standard),
+            }, manifest_file, indent=4)
+        if exists(cache_path):
+            rmtree(cache_path)
+        replace(temporary_path, cache_path)
+    return error, terminal_output, cache_path
+
+
+
+def link_directory(target_path, link_path):
+    """Make link_path a symbolic link to target_path
+
+    An existing link is updated. Returns False if link_path is a real
+    directory or links are not supported (for example in Windows without
+    the required privilege).
+    """
+
+    if islink(link_path):
+        if readlink(link_path) == target_path:
+            return True
+        remove(link_path)
+    elif exists(link_path):
+        return False
+    try:
+        makedirs(dirname(abspath(link_path)), exist_ok=True)
+        symlink(target_path, link_path, target_is_directory=True)
+    except OSError:
+        return False
+    return True
 
 
 
@@ -82,19 +287,17 @@ def import_file(file_path, workdir, vhdl_standard='93c'):
     file_path = normpath(file_path)
     workdir = normpath(workdir)
     parameters = {
-        'ghdl': 'ghdl -i -v',
-        'synopsys': '--ieee=synopsys -fexplicit',
-        'standard': (' --std=' + str(vhdl_standard)) if vhdl_standard else '',
-        'work': '--workdir="' + workdir + '"',
-        'file': '"' + file_path + '"',
+        'ghdl': ['ghdl', '-i', '-v'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'standard': ['--std=' + str(vhdl_standard)] if vhdl_standard else [],
+        'work': ['--workdir=' + workdir],
+        'file': [file_path],
     }
-    import_command = ' '.join(parameters.values())
-    command_run_result = run_console_command(import_command)
+    import_command = command_from_parameters(parameters)
+    error, terminal_output = run_command(import_command)
 
-    error = command_run_result[0]
-    terminal_output = command_run_result[1]
     units_description = parse_included(terminal_output)
-    return error, terminal_output, import_command, units_description
+    return error, terminal_output, command_to_str(import_command), units_description
 
 
 
@@ -105,36 +308,65 @@ def make_entity(entity_name, workdir, additional_libs, vhdl_standard='93c'):
     """
 
     workdir = normpath(workdir)
-    additional_libs = ' -P' + ' -P'.join(additional_libs) if additional_libs else ''
     parameters = {
-        'ghdl': 'ghdl -m -v',
-        'synopsys': '--ieee=synopsys -fexplicit',
-        'standard': (' --std=' + str(vhdl_standard)) if vhdl_standard else '',
-        'work': '--workdir="' + workdir + '"',
-        'libs': additional_libs,
-        'entity': entity_name,
+        'ghdl': ['ghdl', '-m', '-v'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'standard': ['--std=' + str(vhdl_standard)] if vhdl_standard else [],
+        'work': ['--workdir=' + workdir],
+        'libs': ['-P' + lib for lib in additional_libs] if additional_libs else [],
+        'entity': [entity_name],
+    }
+    make_command = command_from_parameters(parameters)
+    error, terminal_output = run_command(make_command)
+    return error, terminal_output, command_to_str(make_command)
+
+
+
+def entity_dependencies(entity_name, workdir, additional_libs, vhdl_standard='93c'):
+    """Source files needed to build an entity (--gen-depends)
+
+    Requires previous import_file. Returns the error and the set of absolute
+    paths found in the generated Makefile.
+    """
+
+    workdir = normpath(workdir)
+    parameters = {
+        'ghdl': ['ghdl', '--gen-depends'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'standard': ['--std=' + str(vhdl_standard)] if vhdl_standard else [],
+        'work': ['--workdir=' + workdir],
+        'libs': ['-P' + lib for lib in additional_libs] if additional_libs else [],
+        'entity': [entity_name],
     }
-    make_command = ' '.join(parameters.values())
-    return run_console_command(make_command) + (make_command,)
+    error, terminal_output = run_command(command_from_parameters(parameters))
+    dependencies = set()
+    if not error:
+        for line in terminal_output.splitlines():
+            if line.startswith('#') or ': ' not in line:
+                continue
+            for token in line.split(': ', 1)[1].split():
+                if token.lower().endswith(tuple(VHDL_EXTENSIONS)):
+                    dependencies.add(abspath(token))
+    return error, dependencies
 
 
 
 def dump_xml_file(file_path, workdir, additional_libs, output_file_path):
     """Generate a (large) XML representation of the VHDL code
+
+    The output of GHDL goes straight to the file, it is never held in
+    memory. See index_xml_dump() to extract the declarations from it.
     """
 
-    additional_libs = ' -P ' + ' -P '.join(additional_libs) if additional_libs else ''
     output_file_path = abspath(output_file_path)
     parameters = {
-        'ghdl': 'ghdl --file-to-xml -v',
-        'synopsys': '--ieee=synopsys -fexplicit',
-        'work': '--workdir="' + workdir + '"',
-        'file': '"' + file_path + '"',
+        'ghdl': ['ghdl', '--file-to-xml', '-v'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'work': ['--workdir=' + workdir],
+        'file': [file_path],
     }
-    dump_xml_command = ' '.join(parameters.values())
-    error, xml = run_console_command(dump_xml_command)
-    if not error:
-        save_txt(xml, output_file_path)
+    with open(output_file_path, 'wb') as output_file:
+        error, _ = run_command(command_from_parameters(parameters), output_file=output_file)
     return error, output_file_path
 
 
@@ -145,20 +377,153 @@ def generate_cross_references_html(file_path, workdir, additional_libs, output_p
     Requires previous make_entity.
     """
 
-    additional_libs = ' -P ' + ' -P '.join(additional_libs) if additional_libs else ''
     output_path = abspath(output_path) if output_path else ''
-    if not exists(output_path):
+    if output_path and not exists(output_path):
         mkdir(output_path)
     parameters = {
-        'ghdl': 'ghdl --xref-html -v',
-        'synopsys': '--ieee=synopsys -fexplicit',
-        'work': '--workdir="' + workdir + '"',
-        'format': '--format=css',
-        'o': '-o ' + ('"' + output_path + '"') if output_path else '',
-        'file': '"' + file_path + '"',
+        'ghdl': ['ghdl', '--xref-html', '-v'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'work': ['--workdir=' + workdir],
+        'format': ['--format=css'],
+        'o': ['-o', output_path] if output_path else [],
+        'file': [file_path],
+    }
+    return run_command(command_from_parameters(parameters))
+
+
+
+def xref_page(file_path, page_names):
+    """Name of the page that GHDL generated for a source file, None if not found
+    """
+
+    name = basename(file_path)
+    for page_name in (name + '.html', splitext(name)[0] + '.html'):
+        if page_name in page_names:
+            return page_name
+    return None
+
+
+
+def write_cross_references_index(output_path, generated):
+    """Write the index of a cross references directory
+
+    Args:
+        generated (dict): {source path: {'page': page name, ...}}, as in XREF_STATE_FILE.
+    """
+
+    pages = {file_path: entry['page'] for file_path, entry in generated.items() if entry.get('page')}
+
+    with open(join(output_path, XREF_INDEX), 'w', encoding='utf-8') as index_file:
+        index_file.write('<html>\n<head>\n<title>Sources</title>\n'
+                         '<link rel="stylesheet" href="' + XREF_STYLE + '" type="text/css"/>\n'
+                         '</head>\n<body>\n<h1>Sources</h1>\n<ul>\n')
+        for file_path in sorted(pages):
+            index_file.write('<li><a href="' + escape(pages[file_path]) + '">' +
+                             escape(file_path) + '</a></li>\n')
+        index_file.write('</ul>\n</body>\n</html>\n')
+
+
+
+def generate_project_cross_references_html(file_paths, workdir, additional_libs, output_path,
+                                           jobs=1, force=False):
+    """generate_cross_references_html() for all the sources of a project
+
+    Only the files whose contents changed since the previous call are
+    processed, in batches that run in parallel (jobs). Each batch writes to
+    its own temporary directory, then its pages are moved to output_path
+    and a single index of all the sources is written. The hash of each
+    generated file is kept in XREF_STATE_FILE inside output_path; files
+    with the same size and modification time are not even hashed again,
+    and the pages of sources that are no longer in file_paths are removed.
+    Pages of unchanged files that point to a changed one keep the old
+    line numbers until they are regenerated, use force to rebuild all.
+
+    Returns:
+        error (the first one found)
+        terminal_output
+        updated_paths: Sources whose page was generated
+    """
+
+    output_path = abspath(output_path)
+    makedirs(output_path, exist_ok=True)
+    state = ConfigStore(join(output_path, XREF_STATE_FILE), {'files': {}})
+    generated = state.load()['files']
+    file_paths = sorted({abspath(file_path) for file_path in file_paths})
+
+    changed = {}
+    with state.batch():
+        removed = [file_path for file_path in generated if file_path not in file_paths]
+        for file_path in removed:
+            page_name = generated.pop(file_path).get('page')
+            if page_name and page_name not in [entry.get('page') for entry in generated.values()] \
+               and exists(join(output_path, page_name)):
+                remove(join(output_path, page_name))
+        if removed:
+            state.save()
+
+        for file_path in file_paths:
+            try:
+                file_stat = stat(file_path)
+            except OSError:
+                continue
+            previous = generated.get(file_path)
+            if not force and previous and previous['mtime'] == file_stat.st_mtime_ns and \
+               previous['size'] == file_stat.st_size:
+                continue
+            entry = {'mtime': file_stat.st_mtime_ns, 'size': file_stat.st_size,
+                     'hash': hash_files([file_path])}
+            if not force and previous and previous['hash'] == entry['hash']:
+                entry['page'] = previous.get('page')
+                generated[file_path] = entry
+                state.save()
+            else:
+                changed[file_path] = entry
+
+    if not changed:
+        if removed:
+            write_cross_references_index(output_path, generated)
+        return 2, 'Cross references are up to date', []
+
+    parameters = {
+        'ghdl': ['ghdl', '--xref-html'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'work': ['--workdir=' + normpath(workdir)],
+        'libs': ['-P' + lib for lib in additional_libs] if additional_libs else [],
+        'format': ['--format=css'],
     }
-    gen_cross_refs_command = ' '.join(parameters.values())
-    return run_console_command(gen_cross_refs_command)
+    changed_paths = list(changed)
+    batches = [changed_paths[i:i + XREF_BATCH_SIZE]
+               for i in range(0, len(changed_paths), XREF_BATCH_SIZE)]
+    batch_paths = [mkdtemp(prefix='.xref-', dir=output_path) for _ in batches]
+    chains = [[command_from_parameters(parameters) + ['-o', batch_path] + batch]
+              for batch, batch_path in zip(batches, batch_paths)]
+
+    error = 0
+    terminal_output = ''
+    updated_paths = []
+    try:
+        with state.batch():
+            results = run_command_chains(chains, jobs)
+            for batch, batch_path, chain_results in zip(batches, batch_paths, results):
+                result = chain_results[0]
+                terminal_output += result.output
+                if result.error:
+                    error = error or result.error
+                    continue
+                page_names = set(listdir(batch_path))
+                for name in page_names - {XREF_INDEX}:
+                    replace(join(batch_path, name), join(output_path, name))
+                for file_path in batch:
+                    changed[file_path]['page'] = xref_page(file_path, page_names)
+                    generated[file_path] = changed[file_path]
+                updated_paths += batch
+            state.save()
+    finally:
+        for batch_path in batch_paths:
+            rmtree(batch_path, ignore_errors=True)
+
+    write_cross_references_index(output_path, generated)
+    return error, terminal_output, updated_paths
 
 
 
@@ -166,16 +531,14 @@ def analyze_file(file_path, workdir, additional_libs):
     """Analyze source file (-a)
     """
 
-    additional_libs = ' -P ' + ' -P '.join(additional_libs) if additional_libs else ''
     parameters = {
-        'ghdl': 'ghdl -a -v',
-        'synopsys': '--ieee=synopsys -fexplicit',
-        'work': '--workdir="' + workdir + '"',
-        'libs': additional_libs,
-        'file': '"' + file_path + '"',
+        'ghdl': ['ghdl', '-a', '-v'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'work': ['--workdir=' + workdir],
+        'libs': ['-P' + lib for lib in additional_libs] if additional_libs else [],
+        'file': [file_path],
     }
-    analyze_command = ' '.join(parameters.values())
-    return run_console_command(analyze_command)
+    return run_command(command_from_parameters(parameters))
 
 
 
@@ -184,38 +547,85 @@ def elaborate_entity(entity_name, workdir):
     """
 
     parameters = {
-        'ghdl': 'ghdl -e -v',
-        'synopsys': '--ieee=synopsys -fexplicit',
-        'work': '--workdir="' + workdir + '"',
-        'entity': entity_name,
+        'ghdl': ['ghdl', '-e', '-v'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'work': ['--workdir=' + workdir],
+        'entity': [entity_name],
     }
-    elaborate_command = ' '.join(parameters.values())
-    return run_console_command(elaborate_command)
+    return run_command(command_from_parameters(parameters))
+
+
+
+def write_wave_options(signal_paths, file_path):
+    """Write a GHDL wave option file (--read-wave-opt)
+
+    Only the signals in the file are recorded in the waveform. Paths start
+    with the top entity name, for example 'tb/u_core/data', and 'tb/u_core/*'
+    selects all the signals declared in u_core.
+    """
+
+    with open(file_path, 'w', encoding='utf-8') as options_file:
+        options_file.write('$ version 1.1\n')
+        for path in signal_paths:
+            options_file.write(PATH_SEPARATOR + path.strip(PATH_SEPARATOR) + '\n')
+    return file_path
 
 
 
-def run_tb(testbench_name, workdir, run_time='1us', generate_waveform=True):
+def run_tb(testbench_name, workdir, run_time='1us', generate_waveform=True, timeout=None,
+           stdout_handler=None, keep_output=True, wave_options_path=None, stderr_handler=None,
+           wave_format='ghw'):
     """Run the desired testbench (-r)
 
     Provide the entity name in the testbench, not the file name.
     Requires previous (-a, -e) or (-i, -m).
+
+    Args:
+        timeout (float): Kill the simulation after this number of seconds.
+        stdout_handler: Function called with each line of the output while the
+            simulation runs. If it returns True the simulation is stopped.
+        keep_output (bool): Return the whole output once finished.
+        wave_options_path: Wave option file that selects the signals recorded
+            in the waveform, see write_wave_options(). All of them by default.
+        stderr_handler: Same as stdout_handler for the error output, where GHDL
+            prints the reports and assertions. If not provided it goes to the
+            console.
+        wave_format: 'ghw' (<testbench>.ghw) or 'vcd' (<testbench>.vcd).
     """
 
     workdir = normpath(workdir)
     parameters = {
-        'ghdl': 'ghdl -r -v',
-        'synopsys': '--ieee=synopsys -fexplicit',
-        'work': '--workdir="' + workdir + '"',
-        'testbench': testbench_name,
-        'wave': ('--wave="' + join(workdir, (testbench_name + '.ghw')) + '"') \
+        'ghdl': ['ghdl', '-r', '-v'],
+        'synopsys': ['--ieee=synopsys', '-fexplicit'],
+        'work': ['--workdir=' + workdir],
+        'testbench': [testbench_name],
+        'wave': [('--vcd=' if wave_format == 'vcd' else '--wave=') +
+                 join(workdir, (testbench_name + '.' + wave_format))] \
                 if generate_waveform \
-                else '',
-        'time': ('--stop-time=' + run_time) \
+                else [],
+        'wave_options': ['--read-wave-opt=' + wave_options_path] \
+                        if generate_waveform and wave_options_path \
+                        else [],
+        'time': ['--stop-time=' + run_time] \
                 if (run_time and not run_time == '0') \
-                else '--no-run --disp-tree=port',
+                else ['--no-run', '--disp-tree=port'],
     }
-    run_command = ' '.join(parameters.values())
-    return run_console_command(run_command)
+    return run_command(command_from_parameters(parameters), timeout,
+                       stdout_handler=stdout_handler, stderr_handler=stderr_handler,
+                       keep_output=keep_output)
+
+
+
+def elaborated_hash(entity_name, workdir):
+    """Hash of the elaborated design of an entity
+
+    Covers the executable generated by the GCC/LLVM backends (if any) and the
+    library files in the work dir. Returns None if none of them exist.
+    """
+
+    workdir = normpath(workdir)
+    library_files = sorted(get_filepaths_recursive(workdir, extensions=['.cf']))
+    return hash_files([abspath(entity_name.lower())] + library_files)
 
 
 
@@ -248,8 +658,29 @@ class GHDL():
     def __init__(self, verbose=False, install_path=None, vhdl_standard=None,
                  work_dir_path=None, compiled_libs_paths=None, always_reimport=True,
                  sources_directories=None, sources_paths=None, exclude_files=None,
-                 testbench=None, waves_dir=None):
+                 testbench=None, waves_dir=None, timeout=None, cache_hierarchy=True,
+                 ignore=None, wave_signals=None, abort_severity=None, max_failures=None,
+                 wave_format='ghw', reduce_waves=False, wave_window=None, vendor_cache=True,
+                 jobs=1, live_output=False):
+        if wave_format not in WAVE_FORMATS:
+            raise ValueError('Invalid wave format. Valid values are ' + ', '.join(WAVE_FORMATS))
         self.verbose = verbose
+        self.wave_format = wave_format
+        self.reduce_waves = reduce_waves
+        self.wave_window = wave_window
+        self.vendor_cache = vendor_cache
+        self.jobs = jobs
+        self.live_output = live_output
+        self.abort_severity = abort_severity
+        self.max_failures = max_failures
+        self.wave_signals = wave_signals
+        self.ignore = ignore or []
+        self.directory_cache = DirectoryCache()
+        self.timeout = timeout
+        self.cache_hierarchy = cache_hierarchy
+        self.hierarchy_indexes = {}
+        self.testbench_dependencies = {}
+        self.package_hashes = {}
         self.vhdl_standard = vhdl_standard or '93c'
         self.work_dir_path = normpath(work_dir_path) if work_dir_path else join(getcwd(), normpath('./work/'))
 
@@ -259,6 +690,12 @@ class GHDL():
         else:
             self.compiled_libs_paths = SetExt([abspath('./compiled')])
 
+        self.config_store = ConfigStore(join(self.work_dir_path, 'config'), {
+            'install_path': '',
+            'imported_entities': {},
+            'imported_packages': {},
+            'imported_files': {},
+        })
         self.load_config_from_file()
         if install_path:
             self.install_path = install_path
@@ -297,8 +734,15 @@ class GHDL():
 
     @install_path.setter
     def install_path(self, val):
-        self.config['install_path'] = val
-        self.save_config_to_file()
+        if self.config['install_path'] != val:
+            self.config['install_path'] = val
+            self.save_config_to_file()
+
+
+
+    @property
+    def config(self):
+        return self.config_store.data
 
 
 
@@ -320,17 +764,7 @@ class GHDL():
         once per project.
         """
 
-        try:
-            with open(join(self.work_dir_path, 'config')) as infile:
-                self.config = load(infile)
-        except FileNotFoundError:
-            self.config = {
-                'install_path': '',
-                'imported_entities': {},
-                'imported_packages': {},
-                'imported_files': {},
-            }
-            self.save_config_to_file()
+        self.config_store.load()
 
 
 
@@ -338,50 +772,105 @@ class GHDL():
         """Save persistent configuration
 
         For example, the GHDL install path, so that it only has to be input
-        once per project.
+        once per project. Inside config_batch() the file is only written once,
+        at the end of the batch. Several processes can share the file.
         """
 
-        try:
-            with open(join(self.work_dir_path, 'config'), 'w') as outfile:
-                dump(self.config, outfile)
-        except FileNotFoundError:
-            mkdir(self.work_dir_path)
-            with open(join(self.work_dir_path, 'config'), 'w') as outfile:
-                dump(self.config, outfile)
+        self.config_store.save()
+
+
+
+    def config_batch(self):
+        """Context where the configuration changes are saved once, at the end
+        """
+
+        return self.config_store.batch()
 
 
 
     def generate_and_run(self, simulation_data, sim_pkgs_directory, run_time=None,
-                         package_name='HDLComposerDataPkg', open_waves=True):
+                         package_name='HDLComposerDataPkg', open_waves=True,
+                         stimulus_files=False):
         """Short for data_to_package(), then run()
+
+        With stimulus_files, data_to_stimulus() is used instead, so the data is
+        read from files during the simulation rather than compiled as constants.
+
+        An unchanged package is not rewritten, so GHDL does not analyze it again.
+        Its content hash is stored in package_hashes and returned.
         """
 
-        data_to_package(simulation_data, package_name, sim_pkgs_directory)
+        content_hash = None
+        if stimulus_files:
+            data_to_stimulus(simulation_data, package_name, sim_pkgs_directory)
+        else:
+            content_hash = data_to_package(simulation_data, package_name, sim_pkgs_directory)
+            self.package_hashes[package_name] = content_hash
         self.run(run_time, open_waves)
+        return content_hash
 
 
 
     def add_compiled_libs(self, directory_paths):
         """Find the paths that contain compiled libs and add them to compiled_libs_paths
+
+        Links to directories, like the ones to the vendor cache made by
+        compile_vendor(), are followed once. Each tree is walked once, with
+        the listings of directory_cache, so a repeated call only costs a stat
+        per directory, also inside the vendor cache.
         """
 
         if not isinstance(directory_paths, list):
             directory_paths = [directory_paths]
-        for directory_path in directory_paths:
-            self.compiled_libs_paths.update([abspath(directory) \
-             for directory in get_dirs_containing_files(directory_path, extension='.cf')])
+        pending = list(directory_paths)
+        scanned = set()
+        while pending:
+            directory_path = pending.pop()
+            if realpath(directory_path) in scanned:
+                continue
+            scanned.add(realpath(directory_path))
+            for root, files, links in walk_directories(directory_path, cache=self.directory_cache):
+                if any(file.lower().endswith('.cf') for file in files):
+                    self.compiled_libs_paths.add(abspath(root))
+                pending.extend(join(root, link) for link in links)
 
 
 
     def compile_vendor(self, vendor_name, vendor_install_path, output_path='./compiled/vendor',
                        recompile=False):
         """compile_vendor() wrapper
+
+        With vendor_cache (True for the default directory, or the path of the
+        cache), the libraries are compiled once per machine, see
+        cached_compile_vendor(), and output_path/vendor_name links to them.
+        If output_path/vendor_name is already a directory (compiled before
+        the cache existed, or with vendor_cache disabled), it is used as
+        before: its libraries are reused, or compiled again in place.
         """
 
         output_path = join(normpath(output_path), vendor_name)
         if not self.install_path:
             raise ValueError('compile_vendor requires GHDL install_path')
 
+        if self.vendor_cache and (islink(output_path) or not exists(output_path)):
+            error, terminal_output, cache_path = cached_compile_vendor(
+                vendor_name,
+                vendor_install_path,
+                self.install_path,
+                self.vhdl_standard,
+                self.vendor_cache if isinstance(self.vendor_cache, str) else None,
+                recompile,
+                self.verbose,
+                self.jobs
+            )
+            if error == 0 and self.verbose:
+                stdout.write('Finished compilation of ' + vendor_name + '\n')
+            if error in (0, 2):
+                # Without links (Windows without privileges), the cache is used directly
+                self.add_compiled_libs(output_path if link_directory(cache_path, output_path)
+                                       else cache_path)
+            return error, terminal_output
+
         command_run_result = compile_vendor(
             vendor_name,
             output_path,
@@ -389,7 +878,8 @@ class GHDL():
             self.install_path,
             self.vhdl_standard,
             recompile,
-            self.verbose
+            self.verbose,
+            self.jobs
         )
         if command_run_result[0] == 0 and self.verbose:
             stdout.write('Finished compilation of ' + vendor_name + '\n')
@@ -399,7 +889,7 @@ class GHDL():
 
 
 
-    def add_sources_from_dir(self, sources_directories, extensions=['.vhd', '.vhdl'],
+    def add_sources_from_dir(self, sources_directories, extensions=VHDL_EXTENSIONS,
                              include_files=[]):
         """Scan a directory for sources
 
@@ -408,12 +898,16 @@ class GHDL():
             extensions: File extensions that should be included
             include_files: File name list, if provided only these files will be
                 used. The path is automatically found.
+
+        The directories that match the ignore globs are not scanned, and the
+        listings of unchanged directories are reused between calls.
         """
 
         vhd_paths = set()
         for src_folder in sources_directories:
             vhd_paths.update( [abspath(file_path) for file_path in
-                               get_filepaths_recursive(src_folder, extensions, include_files, self.exclude_files)] )
+                               get_filepaths_recursive(src_folder, extensions, include_files, self.exclude_files,
+                                                       self.ignore, self.directory_cache)] )
         new_sources = SetExt(vhd_paths - self.sources_paths)
         self.sources_paths.update(vhd_paths)
         if self.verbose:
@@ -438,7 +932,7 @@ class GHDL():
                     self.config['imported_files'][file_path].append(unit_description[1])
                 else:
                     self.config['imported_files'][file_path] = [unit_description[1]]
-                self.save_config_to_file()
+            self.save_config_to_file()
         return error, terminal_out, command, description
 
 
@@ -459,6 +953,17 @@ class GHDL():
 
 
 
+    def index_xml_file(self, file_path, output_file_path):
+        """Dump the XML of a file and index its declarations, see index_xml_dump()
+
+        Returns the error and the index (None if the dump failed).
+        """
+
+        error, output_file_path = self.dump_xml_file(file_path, output_file_path)
+        return error, (None if error else index_xml_dump(output_file_path))
+
+
+
     def generate_cross_references_html(self, file_path, output_path=''):
         """ generate_cross_references_html() wrapper
         """
@@ -467,27 +972,169 @@ class GHDL():
 
 
 
-    def run_tb(self, entity, run_time, generate_waveform=True):
+    def generate_project_cross_references_html(self, output_path='./xref', force=False, jobs=None):
+        """generate_project_cross_references_html() of all the sources_paths
+
+        Uses jobs parallel processes, by default the jobs attribute or, if it
+        is 1, one per CPU.
+        """
+
+        jobs = jobs or (self.jobs if self.jobs > 1 else cpu_count() or 1)
+        error, terminal_output, updated_paths = generate_project_cross_references_html(
+            self.sources_paths, self.work_dir_path, self.compiled_libs_paths, output_path, jobs, force
+        )
+        if self.verbose:
+            stdout.write('Generated the cross references of ' + str(len(updated_paths)) + ' of ' +
+                         str(len(self.sources_paths)) + ' files\n')
+        if error and error != 2:
+            stdout.write('ERROR Generating cross references\n' + terminal_output + '\n')
+        return error, updated_paths
+
+
+
+    def run_tb(self, entity, run_time, generate_waveform=True, stdout_handler=None,
+               wave_signals=None, log_analyzer=None):
         """ run_tb() wrapper
+
+        If wave_signals (or the wave_signals attribute) is set, only the
+        selected signals are recorded. See wave_selection().
+        A LogAnalyzer receives both outputs while the simulation runs, and
+        stops it according to its abort policy.
         """
 
-        return run_tb(entity, self.work_dir_path, run_time, generate_waveform)
+        wave_signals = wave_signals or self.wave_signals
+        wave_options_path = self.write_wave_options(entity, wave_signals) \
+                            if generate_waveform and wave_signals \
+                            else None
+        stderr_handler = None
+        if log_analyzer:
+            stderr_handler = log_analyzer.feed
+            if stdout_handler:
+                user_handler = stdout_handler
+                stdout_handler = lambda line: user_handler(line) or log_analyzer.feed(line)
+            else:
+                stdout_handler = log_analyzer.feed
+        return run_tb(entity, self.work_dir_path, run_time, generate_waveform, self.timeout,
+                      stdout_handler, wave_options_path=wave_options_path,
+                      stderr_handler=stderr_handler, wave_format=self.wave_format)
+
 
 
+    def wave_selection(self, entity, wave_signals):
+        """ Paths of the signals (and ports) selected for the waveform of a testbench
+
+        Args:
+            wave_signals: A path or a list of them. They can be glob patterns
+                like 'tb/u_core/*' or 'tb/**/valid', resolved against the
+                parsed hierarchy, and they can start below the testbench
+                ('u_core/data'). Selecting an instance, process or generate
+                selects all the signals inside, as a 'scope/*' path for each
+                level that declares signals. WAVE_SIGNALS_FROM_GTKW selects
+                the signals displayed by the gtkw files of the testbench.
+        """
+
+        if isinstance(wave_signals, str):
+            wave_signals = [wave_signals]
+        patterns = []
+        for pattern in wave_signals:
+            if pattern == WAVE_SIGNALS_FROM_GTKW:
+                for gtkw_file in self.wave_files(entity):
+                    patterns.extend(gtkw_signals(gtkw_file, entity))
+            else:
+                patterns.append(pattern)
+
+        index = self.hierarchy_index(entity)
+        top_name = index.top.entity.name.lower()
+        selected = {}
+        for pattern in patterns:
+            units = index.glob(pattern)
+            if not units:
+                units = index.glob(top_name + PATH_SEPARATOR + pattern.strip(PATH_SEPARATOR))
+            if not units:
+                stdout.write('WARNING No signals match ' + pattern + ' in ' + entity + '\n')
+            for unit in units:
+                path = index.path(unit)
+                if isinstance(unit, (Port, Signal)):
+                    selected[path] = None
+                else:
+                    for child_path in index.prefixed(path + PATH_SEPARATOR):
+                        if isinstance(index.units[child_path], (Port, Signal)):
+                            scope = child_path.rpartition(PATH_SEPARATOR)[0]
+                            selected[scope + PATH_SEPARATOR + '*'] = None
+        return list(selected)
+
+
+
+    def write_wave_options(self, entity, wave_signals):
+        """ Write the wave option file of a testbench for the selected signals
+
+        Returns its path, or None if no signal was selected (then the whole
+        design is recorded).
+        """
 
-    def parse_entity(self, entity):
+        signal_paths = self.wave_selection(entity, wave_signals)
+        if not signal_paths:
+            stdout.write('WARNING No signals selected, recording all the signals of ' + entity + '\n')
+            return None
+        if self.verbose:
+            stdout.write('Recording ' + str(len(signal_paths)) + ' signal paths of ' + entity + '\n')
+        return write_wave_options(signal_paths, join(self.work_dir_path, entity.lower() + '.opt'))
+
+
+
+    def parse_entity(self, entity, cache_key=None):
         """ Parse an entity architecture
+
+        The hierarchy is parsed while GHDL prints it. If cache_hierarchy is
+        enabled, the result is saved in the work dir and reused while the
+        elaborated design does not change. cache_key is the elaborated_hash()
+        of the entity, if the caller already has it.
         """
 
-        error, terminal_output = run_tb(entity, self.work_dir_path, 0, False)
-        return parse_run(terminal_output)
+        if not self.cache_hierarchy:
+            cache_key = None
+        elif cache_key is None:
+            cache_key = elaborated_hash(entity, self.work_dir_path)
+        cache_path = join(self.work_dir_path, entity.lower() + '.hierarchy')
+        if cache_key:
+            top = load_hierarchy(cache_path, cache_key)
+            if top:
+                if self.verbose:
+                    stdout.write('Loaded ' + entity + ' hierarchy from cache\n')
+                return top
 
+        parser = RunParser()
+        run_tb(entity, self.work_dir_path, 0, False, self.timeout,
+               stdout_handler=parser.feed, keep_output=False)
+        top = parser.close()
 
+        if cache_key:
+            save_hierarchy(top, cache_path, cache_key)
+        return top
 
-    def open_waves(self, entity):
-        """ Open the wave files of all the simulation runs using GTKWave
 
-        If gtkw files are found, they are used to configure the waveform display.
+
+    def hierarchy_index(self, entity):
+        """ Parse an entity and index its hierarchy for queries
+
+        The index is kept in memory while the elaborated design does not change.
+        """
+
+        index_key = elaborated_hash(entity, self.work_dir_path)
+        cached = self.hierarchy_indexes.get(entity.lower())
+        if cached and index_key and cached[0] == index_key:
+            return cached[1]
+        index = HierarchyIndex(self.parse_entity(entity, index_key))
+        self.hierarchy_indexes[entity.lower()] = (index_key, index)
+        return index
+
+
+
+    def wave_files(self, entity):
+        """ gtkw files of a testbench
+
+        They are searched in waves_dir, by default the waves directory next to
+        the testbench source.
         """
 
         self.load_config_from_file()
@@ -501,19 +1148,81 @@ class GHDL():
         else:
             testbench_waves_dir = join(entity_dir, normpath('./waves/'))
 
-        found_wave_files = get_filepaths_recursive(testbench_waves_dir, extensions=['.gtkw'])
+        return get_filepaths_recursive(testbench_waves_dir, extensions=['.gtkw'])
+
+
+
+    def wave_path(self, entity):
+        """ Path of the waveform of a testbench run
+        """
+
+        return join(self.work_dir_path, (entity + '.' + self.wave_format))
 
-        ghw_path = join(self.work_dir_path, (entity + '.ghw'))
+
+
+    def reduce_wave(self, entity, gtkw_file):
+        """ Write a waveform with only the signals displayed by a gtkw file
+
+        Limited to wave_window (start, end) if set, for example ('10us', '20us').
+        Only vcd waveforms can be reduced, for ghw use wave_signals to record
+        fewer signals instead. The reduced file is reused while it is newer
+        than the waveform and the gtkw file.
+
+        Returns:
+            Path of the reduced waveform, or the complete one if it cannot be reduced
+        """
+
+        wave_path = self.wave_path(entity)
+        signal_paths = gtkw_signals(gtkw_file, entity)
+        if self.wave_format != 'vcd' or not signal_paths:
+            return wave_path
+
+        reduced_path = join(self.work_dir_path,
+                            entity + '_' + splitext(basename(gtkw_file))[0] + '.vcd')
+        window = tuple(self.wave_window) if self.wave_window else (None, None)
+        window_path = reduced_path + '.window'
+        window_text = repr(window)
+        if exists(reduced_path) and exists(window_path) and \
+           getmtime(reduced_path) >= max(getmtime(wave_path), getmtime(gtkw_file)):
+            with open(window_path, 'r') as window_file:
+                if window_file.read() == window_text:
+                    return reduced_path
+
+        signals_written = vcd_subset(wave_path, reduced_path, signal_paths, *window)
+        with open(window_path, 'w') as window_file:
+            window_file.write(window_text)
+        if self.verbose:
+            stdout.write(' ' * 4 + 'Reduced ' + basename(gtkw_file) + ' waveform to ' +
+                         str(signals_written) + ' signals\n')
+        return reduced_path
+
+
+
+    def open_waves(self, entity):
+        """ Open the wave files of all the simulation runs using GTKWave
+
+        If gtkw files are found, they are used to configure the waveform display.
+        With reduce_waves, GTKWave opens a waveform that only contains the
+        signals of each gtkw file, see reduce_wave().
+        """
+
+        found_wave_files = self.wave_files(entity)
+
+        wave_path = self.wave_path(entity)
         if found_wave_files:
             if self.verbose:
                 stdout.write( ' ' * 2 + 'Found ' + str(len(found_wave_files)) +
                               ' wave file' + ('s' if len(found_wave_files) > 1 else '') + '\n')
+            if self.reduce_waves and self.wave_format != 'vcd':
+                stdout.write('WARNING Only vcd waveforms can be reduced, opening the complete ' +
+                             self.wave_format + ' file\n')
             for gtkw_file in found_wave_files:
-                gtkwave_open_wave(ghw_path, gtkw_file)
+                gtkwave_open_wave(self.reduce_wave(entity, gtkw_file) if self.reduce_waves else wave_path,
+                                  gtkw_file)
                 if self.verbose:
                     stdout.write(' ' * 4 + 'Opening ' + basename(gtkw_file) + '\n')
         else:
-            gtkwave_open_wave(ghw_path)
+            gtkwave_open_wave(wave_path)
 
 
 
@@ -526,7 +1235,8 @@ class GHDL():
 
         has_to_import = True
         if exists(self.work_dir_path):
-            if not self.always_reimport and get_dirs_containing_files(self.work_dir_path, extension='.cf'):
+            if not self.always_reimport and get_dirs_containing_files(self.work_dir_path, extension='.cf',
+                                                                           first_only=True):
                 has_to_import = False
                 if self.verbose:
                     stdout.write('Not reimporting sources\n')
@@ -546,26 +1256,28 @@ class GHDL():
                 stdout.write('Importing ' + str(len(new_sources)) + ' new files...\n')
         imported = 0
         previous_len = 0
-        for file_path in sources_to_import:
-            import_error, terminal_output, import_command, units_description = self.import_file(file_path)
-
-            if import_error:
-                stdout.write('\nERROR Importing ' + file_path + '\n' + terminal_output + '\n' +
-                             'For more details, you can run:\n' + import_command + '\n')
-            else:
+        # Save the configuration once, after all the imports
+        with self.config_batch():
+            for file_path in sources_to_import:
+                import_error, terminal_output, import_command, units_description = self.import_file(file_path)
+
+                if import_error:
+                    stdout.write('\nERROR Importing ' + file_path + '\n' + terminal_output + '\n' +
+                                 'For more details, you can run:\n' + import_command + '\n')
+                else:
+                    if self.verbose:
+                        # Progress bar
+                        imported += 1
+                        i = ceil(imported * 20 / len(self.sources_paths))
+                        stdout.write('\r')
+                        stdout.write(' ' * 2 + '[%-20s] %d%% ' % ('='*i, imported / len(self.sources_paths) * 100))
+                        imported_message = 'Imported ' + ' '.join([unit[1] for unit in units_description])
+                        stdout.write(imported_message)
+                        current_len = len(imported_message)
+                        stdout.write(' ' * ((previous_len - current_len) if previous_len > current_len else 0))
+                        previous_len = current_len
                 if self.verbose:
-                    # Progress bar
-                    imported += 1
-                    i = ceil(imported * 20 / len(self.sources_paths))
-                    stdout.write('\r')
-                    stdout.write(' ' * 2 + '[%-20s] %d%% ' % ('='*i, imported / len(self.sources_paths) * 100))
-                    imported_message = 'Imported ' + ' '.join([unit[1] for unit in units_description])
-                    stdout.write(imported_message)
-                    current_len = len(imported_message)
-                    stdout.write(' ' * ((previous_len - current_len) if previous_len > current_len else 0))
-                    previous_len = current_len
-            if self.verbose:
-                stdout.flush()
+                    stdout.flush()
         if self.verbose and sources_to_import:
             stdout.write('\n')
 
@@ -588,10 +1300,11 @@ class GHDL():
 
 
 
-    def run(self, run_time='1us', open_waves=True):
+    def run(self, run_time='1us', open_waves=True, wave_signals=None):
         """ Makes, runs and opens the waveforms for the configured testbenches
 
         Requires previous import self.import_sources or equivalent.
+        wave_signals selects the signals recorded, see wave_selection().
         """
 
         # Import
@@ -609,34 +1322,183 @@ class GHDL():
             if self.verbose:
                 stdout.write('No testbench selected\n')
 
-        # Make
         for entity in self.testbench:
+            self.make_and_run(entity, run_time, open_waves, wave_signals)
+
+
+
+    def make_and_run(self, entity, run_time='1us', open_waves=True, wave_signals=None):
+        """ Makes, runs and opens the waveforms of one testbench
+
+        Requires previous import. The output is analyzed while the simulation
+        runs, and it is stopped according to abort_severity and max_failures.
+        With live_output, the lines are shown as they are printed, otherwise
+        the last ones are shown when the run finishes.
+        Returns True if the testbench ran without errors or failed assertions.
+        """
+
+        # Make
+        if self.verbose:
+            stdout.write('Make ' + entity + '\n')
+        make_error, make_terminal_output, make_command = self.make_entity(entity)
+        if make_error:
+            stdout.write('ERROR Make ' + entity + '\n')
+            if make_terminal_output:
+                stdout.write(make_terminal_output + '\n')
+            stdout.write('For more details, you can run:' + '\n' + make_command + '\n')
+            return False
+
+        # Run
+        if self.verbose:
+            stdout.write('Running testbench ' + entity + ' ' + (run_time or '') + '...\n')
+
+        log_analyzer = LogAnalyzer(self.abort_severity, self.max_failures,
+                                   echo=self.echo_line if self.live_output else None)
+        run_result = self.run_tb(entity, run_time, open_waves, wave_signals=wave_signals,
+                                 log_analyzer=log_analyzer)
+        error_occurred = run_result.error
+        if self.verbose:
+            stdout.write('Finished ' + entity + ' ' + run_result.times + '\n')
+
+        # The output was already shown with live_output
+        output = '' if self.live_output else log_analyzer.output() + '\n'
+        if run_result.timed_out:
+            stdout.write('ERROR Timeout running testbench ' + entity + '\n')
+        elif run_result.aborted:
+            stdout.write('ERROR Stopped testbench ' + entity + ', ' + log_analyzer.abort_reason + '\n')
+            stdout.write(output)
+        elif error_occurred:
+            stdout.write('ERROR Running testbench ' + entity + '\n')
+            stdout.write(output)
+        elif log_analyzer.messages and output:
+            stdout.write('Output of testbench run ' + entity + '\n')
+            stdout.write(output)
+        if log_analyzer.messages:
+            stdout.write(entity + ' messages: ' + log_analyzer.summary() + '\n')
+
+        # Open wave files
+        if not error_occurred and open_waves:
             if self.verbose:
-                stdout.write('Make ' + entity + '\n')
-            make_error, make_terminal_output, make_command = self.make_entity(entity)
+                stdout.write('Opening ' + entity + ' wave files\n')
+            self.open_waves(entity)
+        return not error_occurred and not log_analyzer.failures
+
+
+
+    def echo_line(self, line):
+        """Show a line of the simulation output while it runs, see live_output
+        """
+
+        stdout.write(line + '\n')
+        stdout.flush()
 
-            # Run
-            if not make_error:
-                if self.verbose:
-                    stdout.write('Running testbench ' + entity + ' ' + (run_time or '') + '...\n')
 
-                error_occurred, run_terminal_output = self.run_tb(entity, run_time, open_waves)
 
-                if error_occurred:
-                    stdout.write('ERROR Running testbench ' + entity + '\n')
-                    stdout.write(run_terminal_output + '\n')
-                elif 'report' in run_terminal_output:
-                    stdout.write('Output of testbench run ' + entity + '\n')
-                    stdout.write(run_terminal_output + '\n')
+    def update_sources(self, changed_paths, extensions=VHDL_EXTENSIONS):
+        """ Import the sources that were created or modified, forget the deleted ones
 
-                # Open wave files
-                if not error_occurred and open_waves:
+        Only the files with the given extensions that are not excluded are
+        considered. Units of a deleted file stay in the work library until
+        the next full import.
+
+        Returns:
+            The set of source paths that changed
+        """
+
+        extensions = tuple(extension.lower() for extension in extensions)
+        changed_sources = {abspath(path) for path in changed_paths
+                           if path.lower().endswith(extensions) and
+                           basename(path) not in self.exclude_files}
+        with self.config_batch():
+            for file_path in sorted(changed_sources):
+                if not exists(file_path):
+                    self.sources_paths.discard(file_path)
+                    for unit_name in self.config['imported_files'].pop(file_path, []):
+                        for units in (self.config['imported_entities'], self.config['imported_packages']):
+                            if units.get(unit_name) == file_path:
+                                del units[unit_name]
+                    self.save_config_to_file()
                     if self.verbose:
-                        stdout.write('Opening ' + entity + ' wave files\n')
-                    self.open_waves(entity)
+                        stdout.write('Removed ' + file_path + '\n')
+                    continue
 
-            else:
-                stdout.write('ERROR Make ' + entity + '\n')
-                if make_terminal_output:
-                    stdout.write(make_terminal_output + '\n')
-                stdout.write('For more details, you can run:' + '\n' + make_command + '\n')
+                # Import again from scratch, the units of the file may have changed
+                self.config['imported_files'].pop(file_path, None)
+                self.sources_paths.add(file_path)
+                import_error, terminal_output, import_command, units_description = self.import_file(file_path)
+                if import_error:
+                    stdout.write('\nERROR Importing ' + file_path + '\n' + terminal_output + '\n' +
+                                 'For more details, you can run:\n' + import_command + '\n')
+                elif self.verbose:
+                    stdout.write('Imported ' + ' '.join([unit[1] for unit in units_description]) + '\n')
+        return changed_sources
+
+
+
+    def affected_testbenches(self, changed_sources):
+        """ Testbenches that depend on any of the changed sources
+
+        The dependencies are the ones found the last time each testbench was
+        made. Testbenches without known dependencies are always included.
+        """
+
+        return [entity for entity in self.testbench
+                if not self.testbench_dependencies.get(entity) or
+                self.testbench_dependencies[entity] & changed_sources]
+
+
+
+    def watch(self, run_time='1us', open_waves=False, polling=False, interval=1.0,
+              iterations=None):
+        """ Run the testbenches, then run them again every time the sources change
+
+        Changes in the sources directories are detected with inotify (Linux)
+        or by polling every interval seconds. Only the changed files are
+        imported again, and only the testbenches that depend on them are made
+        (GHDL recompiles just the outdated units) and run again.
+        Stops with Ctrl+C, or after the given number of iterations.
+        """
+
+        watcher = create_watcher(self.sources_directories, self.ignore, interval, polling)
+        try:
+            self.run(run_time, open_waves)
+            self.update_testbench_dependencies(self.testbench)
+            if self.verbose:
+                stdout.write('Watching ' + ' '.join(sorted(self.sources_directories)) + '\n')
+
+            iteration = 0
+            while iterations is None or iteration < iterations:
+                changed_paths = watcher.wait()
+                if changed_paths is None:
+                    # Events were lost, import everything that may have changed
+                    self.add_sources_from_dir(self.sources_directories)
+                    changed_paths = set(self.sources_paths)
+                changed_sources = self.update_sources(changed_paths)
+                if not changed_sources:
+                    continue
+                iteration += 1
+
+                testbenches = self.affected_testbenches(changed_sources)
+                for entity in testbenches:
+                    self.make_and_run(entity, run_time, open_waves)
+                self.update_testbench_dependencies(testbenches)
+                if self.verbose:
+                    stdout.write('Waiting for changes...\n')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+
+
+
+    def update_testbench_dependencies(self, testbenches):
+        """ Find the source files each testbench is built from, see entity_dependencies()
+
+        Used by affected_testbenches(). Testbenches whose dependencies cannot
+        be found get an empty set, so they are always run again.
+        """
+
+        for entity in testbenches:
+            error, dependencies = entity_dependencies(entity, self.work_dir_path, self.compiled_libs_paths,
+                                                      self.vhdl_standard)
+            self.testbench_dependencies[entity] = dependencies if not error else set()
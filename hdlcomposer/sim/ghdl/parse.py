@@ -1,5 +1,9 @@
-from re                     import (compile, sub)
-from hdlcomposer.vhdl.units import *
+from re                         import (compile, sub)
+from sys                        import (intern)
+from collections                import (deque)
+from xml.etree.ElementTree      import (iterparse)
+from hdlcomposer.vhdl.units     import *
+from hdlcomposer.utils.general  import (time_to_fs)
 
 
 
@@ -15,6 +19,8 @@ re_index = compile(r'\((?P<index>\d+)\)')
 
 re_include_output = compile(r'(?P<type>(entity|package))\s(?P<name>\w+)')
 
+re_find_line = compile(r'(?P<indentation>\W*)(?P<name>[\w|\(|\)|\.]+)\s\[(?P<unit>(package|if-generate|for-generate|instance|arch|entity|process|port|signal)).*\]')
+
 
 
 def get_name_and_unit(line):
@@ -71,63 +77,122 @@ def parse_included(include_terminal_output):
 
 
 
-def parse_run(ghdl_output):
-    """ Parse GHDL run output
+def get_index(find_index_result):
+    return find_index_result.group('index')
+
+
+
+def get_line_fields(line):
+    """Indentation, name and unit of a line
+
+    A single regex covers the usual lines, anything else goes through
+    get_indentation and get_name_and_unit. Names are interned, since the
+    ports and signals of an entity repeat in each of its instances.
     """
 
-    ghdl_output_lines = ghdl_output.splitlines()
-    lines_to_process = len(ghdl_output_lines) - 2
-
-    # First line contains the top entity name, second contains the top entity arch
-    current_line = 0
-    unit = ''
-    while unit != 'entity':
-        entity_name, unit = get_name_and_unit(ghdl_output_lines[current_line])
-        current_line += 1
-    arch_name, unit = get_name_and_unit(ghdl_output_lines[current_line])
-    current_line += 1
-
-
-    # Create top representation
-    top = Top(name='top')
-    top.entity = Entity(name=entity_name, parent=top, indentation=TAB, arch=arch_name)
-
-
-    # Get blocks by level of indentation
-    current_unit = top.entity
-    previous_type = 'entity'
-    previous_indentation = TAB
-
-    while current_line < lines_to_process:
-        current_indentation = get_indentation(ghdl_output_lines[current_line])
-        current_name, current_type = get_name_and_unit(ghdl_output_lines[current_line])
-
-        # Add to top
-        if current_indentation == 2:
-            current_parent = top.entity
-        # Add at the same level
-        elif current_indentation == previous_indentation:
-            current_parent = current_unit.parent
-        # Add inside previous
-        elif current_indentation == previous_indentation + TAB:
-            if not previous_type == 'arch':
-                current_parent = current_unit
-        # Search parent and add
-        elif current_indentation < previous_indentation:
-            current_parent = get_parent(current_unit, current_indentation)
-        else:
-            raise ValueError('Error processing indentation in line: ' + str(current_line + 1))
+    find_line_result = re_find_line.match(line)
+    if find_line_result:
+        indentation, name, unit = find_line_result.group('indentation', 'name', 'unit')
+        if '(' in name:
+            name = re_index.sub(get_index, name)
+        return len(indentation), intern(name), unit
+    name, unit = get_name_and_unit(line)
+    return get_indentation(line), name, unit
+
+
+
+class RunParser():
+    """Incremental parser of the GHDL run output (--disp-tree)
+
+    Lines are fed one at a time, for example while they are read from the
+    GHDL process, so the whole output never has to be stored. The chain of
+    open units is kept in a stack, so finding the parent of a line does not
+    require walking up the tree.
+    """
+
+    # The last lines of the output are not part of the tree
+    TRAILING_LINES = 2
+
+    def __init__(self):
+        self.top = None
+        self.entity_name = None
+        self.pending = deque()
+        self.stack = []
+        self.previous_indentation = TAB
+        self.line_number = 0
+
+
+
+    def feed(self, line):
+        """Process a line of the GHDL output
+        """
+
+        self.pending.append(line)
+        if len(self.pending) > self.TRAILING_LINES:
+            self.line_number += 1
+            self.process(self.pending.popleft())
+
+
+
+    def feed_lines(self, lines):
+        for line in lines:
+            self.feed(line)
+
 
 
+    def close(self):
+        """Finish parsing and return the Top representation
+        """
+
+        if self.top is None:
+            raise ValueError('Top entity not found in GHDL output.')
+        return self.top
+
+
+
+    def process(self, line):
+        # First lines contain the top entity name, then the top entity arch
+        if self.top is None:
+            if self.entity_name is None:
+                entity_name, unit = get_name_and_unit(line)
+                if unit == 'entity':
+                    self.entity_name = entity_name
+            else:
+                arch_name, unit = get_name_and_unit(line)
+                self.top = Top(name='top')
+                self.top.entity = Entity(name=self.entity_name, parent=self.top,
+                                         indentation=TAB, arch=arch_name)
+                self.stack = [self.top.entity]
+            return
+
+        current_indentation, current_name, current_type = get_line_fields(line)
+        if current_indentation > self.previous_indentation + TAB:
+            raise ValueError('Error processing indentation in line: ' + str(self.line_number))
+        self.previous_indentation = current_indentation
+
+        stack = self.stack
+
         # Package
         if current_type == 'package':
-            top.packages.append(current_name)
+            self.top.packages.append(current_name)
+            return
+
+        # Architecture of the current unit
+        if current_type == 'arch':
+            stack[-1].arch = current_name
+            stack[-1].indentation = current_indentation
+            return
+
+        # Close the units at the same or deeper level
+        while len(stack) > 1 and stack[-1].indentation >= current_indentation:
+            stack.pop()
+        current_parent = stack[-1]
 
         # Generate
-        elif current_type in GENERATE_STATEMENTS:
+        if current_type in GENERATE_STATEMENTS:
             current_unit = Generate(name=current_name, parent=current_parent,
                                     indentation=current_indentation,
-                                    value=get_generate_value(ghdl_output_lines[current_line]))
+                                    value=get_generate_value(line))
 
         # Entity
         elif current_type == 'instance':
@@ -136,9 +201,6 @@ def parse_run(ghdl_output):
         elif current_type == 'entity':
             current_unit = Entity(name=current_name, parent=current_parent,
                                   indentation=current_indentation)
-        elif current_type == 'arch':
-            current_unit.arch = current_name
-            current_unit.indentation = current_indentation
 
         elif current_type == 'process':
             current_unit = Process(name=current_name, parent=current_parent,
@@ -146,7 +208,7 @@ def parse_run(ghdl_output):
         elif current_type == 'port':
             current_unit = Port(name=current_name, parent=current_parent,
                                 indentation=current_indentation,
-                                direction=get_port_direction(ghdl_output_lines[current_line]))
+                                direction=get_port_direction(line))
         elif current_type == 'signal':
             current_unit = Signal(name=current_name, parent=current_parent,
                                   indentation=current_indentation)
@@ -154,11 +216,259 @@ def parse_run(ghdl_output):
         else:
             raise ValueError('Error invalid unit type: ' + current_type)
 
+        stack.append(current_unit)
+
+
+
+def parse_run_lines(lines):
+    """ Parse GHDL run output provided as an iterable of lines
+
+    For example, the lines read from a pipe or a file.
+    """
+
+    parser = RunParser()
+    parser.feed_lines(lines)
+    return parser.close()
+
+
+
+def parse_run(ghdl_output):
+    """ Parse GHDL run output
+    """
+
+    return parse_run_lines(ghdl_output.splitlines())
+
 
-        current_line += 1
-        previous_type = current_type
-        previous_indentation = current_indentation
 
+###############################################################################
+# Simulation log
+###############################################################################
 
-    return top
+SEVERITY_LEVELS = ('note', 'warning', 'error', 'failure')
+
+re_log_message = compile(r'^(?P<file>.*?):(?P<line>\d+):(?P<column>\d+):@(?P<time>[\d.]+)(?P<unit>[a-z]+):'
+                         r'\((?P<kind>report|assertion) (?P<severity>note|warning|error|failure)\):\s?'
+                         r'(?P<message>.*)$')
+
+
+
+class LogMessage():
+    """A report or assertion message of the simulation
+    """
+
+    __slots__ = ('file', 'line', 'column', 'time', 'time_fs', 'kind', 'severity', 'message')
+
+    def __init__(self, file, line, column, time, time_fs, kind, severity, message):
+        self.file = file
+        self.line = line
+        self.column = column
+        self.time = time
+        self.time_fs = time_fs
+        self.kind = kind
+        self.severity = severity
+        self.message = message
+
+
+
+    def __repr__(self):
+        return (self.file + ':' + str(self.line) + ':' + str(self.column) + ':@' + self.time +
+                ':(' + self.kind + ' ' + self.severity + '): ' + self.message)
+
+
+
+def parse_log_line(line):
+    """LogMessage for a GHDL report or assertion line, None for other lines
+    """
+
+    match = re_log_message.match(line)
+    if not match:
+        return None
+    return LogMessage(match.group('file'), int(match.group('line')), int(match.group('column')),
+                      match.group('time') + match.group('unit'),
+                      time_to_fs(match.group('time'), match.group('unit')),
+                      match.group('kind'), match.group('severity'), match.group('message'))
+
+
+
+class LogAnalyzer():
+    """Incremental analysis of the output of a simulation
+
+    Feed it the lines while GHDL runs (it can be used directly as the output
+    handler of run_tb). The report and assertion messages are counted by
+    severity, and feed() returns True when the simulation should be
+    stopped according to the abort policy.
+
+    Args:
+        abort_severity (str): Stop at the first message with this severity
+            or a higher one ('note', 'warning', 'error' or 'failure').
+            None never stops for a single message.
+        max_failures (int): Stop after this number of failures. None does not
+            limit them.
+        failure_severity (str): Lowest severity that counts as a failure.
+        max_lines (int): Number of output lines kept, the last ones.
+        echo: Function called with every line, for example to show them.
+    """
+
+    def __init__(self, abort_severity=None, max_failures=None, failure_severity='error',
+                 max_lines=1000, echo=None):
+        for severity in (abort_severity, failure_severity):
+            if severity is not None and severity not in SEVERITY_LEVELS:
+                raise ValueError('Invalid severity ' + str(severity) + '. Valid values are ' +
+                                 ', '.join(SEVERITY_LEVELS))
+        self.abort_level = SEVERITY_LEVELS.index(abort_severity) if abort_severity else None
+        self.failure_level = SEVERITY_LEVELS.index(failure_severity)
+        self.max_failures = max_failures
+        self.echo = echo
+        self.counts = {severity: 0 for severity in SEVERITY_LEVELS}
+        self.messages = []
+        self.lines = deque(maxlen=max_lines)
+        self.failures = 0
+        self.first_failure = None
+        self.abort_reason = None
+
+
+
+    def __repr__(self):
+        return 'LogAnalyzer - ' + self.summary()
+
+
+
+    @property
+    def aborted(self):
+        return self.abort_reason is not None
+
+
+
+    def feed(self, line):
+        """Process a line of output, return True if the simulation should stop
+        """
+
+        if self.echo:
+            self.echo(line)
+        self.lines.append(line)
+        if self.aborted:
+            return True
+
+        message = parse_log_line(line)
+        if message is None:
+            return False
+        self.messages.append(message)
+        self.counts[message.severity] += 1
+
+        level = SEVERITY_LEVELS.index(message.severity)
+        if level >= self.failure_level:
+            self.failures += 1
+            if self.first_failure is None:
+                self.first_failure = message
+        if self.abort_level is not None and level >= self.abort_level:
+            self.abort_reason = message.severity + ' at ' + message.time + ': ' + message.message
+        elif self.max_failures is not None and self.failures >= self.max_failures:
+            self.abort_reason = str(self.failures) + ' failures, last at ' + message.time
+        return self.aborted
+
+
+
+    def output(self):
+        """The last lines of output
+        """
+
+        return '\n'.join(self.lines)
+
+
+
+    def summary(self):
+        return ', '.join(str(self.counts[severity]) + ' ' + severity for severity in SEVERITY_LEVELS)
+
+
+
+XML_SCOPE_KINDS = ('entity_declaration', 'architecture_body', 'package_declaration',
+                   'package_body', 'component_declaration', 'function_declaration',
+                   'procedure_declaration', 'process_statement', 'sensitized_process_statement',
+                   'block_statement')
+XML_DECLARATION_KINDS = XML_SCOPE_KINDS + (
+    'configuration_declaration', 'type_declaration', 'subtype_declaration',
+    'signal_declaration', 'constant_declaration', 'variable_declaration',
+    'interface_signal_declaration', 'interface_constant_declaration',
+    'interface_variable_declaration', 'component_instantiation_statement')
+XML_TYPE_KINDS = ('type_declaration', 'subtype_declaration')
+XML_TYPE_FIELDS = ('subtype_indication', 'type_mark', 'subtype_type_mark')
+XML_NAME_KINDS = ('simple_name', 'selected_name')
+
+
+
+def index_xml_dump(xml_path):
+    """Compact index of the declarations in a ghdl --file-to-xml dump
+
+    The file is read with iterparse and each element is dropped once
+    processed, so memory use depends on the nesting depth and not on the
+    size of the dump. Names are lower case, as in the dump.
+
+    Returns:
+        A dictionary with:
+            entities: {name: {'generics': [(name, type)], 'ports': [(name, mode, type)]}}
+            types: {name: (kind, scope)}
+            declarations: [(kind, name, scope, line)], scope being the
+                names of the enclosing units separated by '.'
+    """
 
+    index = {'entities': {}, 'types': {}, 'declarations': []}
+    elements = []       # Open elements, each one is removed from its parent when it ends
+    tags = []           # Tags of the open elements
+    scopes = []         # (depth, kind, name) of the open scopes
+    typed = None        # (depth, record) of the interface waiting for its type
+
+    for event, element in iterparse(xml_path, events=('start', 'end')):
+        if event == 'end':
+            elements.pop()
+            tags.pop()
+            if scopes and scopes[-1][0] == len(tags):
+                scopes.pop()
+            if typed is not None and typed[0] == len(tags):
+                typed = None
+            if elements:
+                del elements[-1][-1]
+            continue
+
+        kind = element.get('kind')
+        name = element.get('identifier') or element.get('label')
+        elements.append(element)
+        tags.append(element.tag)
+        if kind is None or not name:
+            continue
+
+        if kind in XML_NAME_KINDS:
+            if typed is not None and typed[1][-1] is None and \
+               any(tag in XML_TYPE_FIELDS for tag in tags[typed[0] + 1:]):
+                typed[1][-1] = name
+            continue
+        if kind not in XML_DECLARATION_KINDS:
+            continue
+
+        scope = '.'.join(scope[2] for scope in scopes)
+        index['declarations'].append((kind, name, scope, int(element.get('line', 0))))
+        if kind in XML_TYPE_KINDS:
+            index['types'][name] = (kind, scope)
+        elif kind == 'entity_declaration':
+            index['entities'][name] = {'generics': [], 'ports': []}
+        elif kind.startswith('interface_') and scopes and scopes[-1][0] == len(tags) - 3 and \
+             scopes[-1][1] == 'entity_declaration' and tags[-2] in ('port_chain', 'generic_chain'):
+            interfaces = index['entities'][scopes[-1][2]]
+            if tags[-2] == 'port_chain':
+                mode = element.get('mode')
+                record = [name, mode[:-len('_mode')] if mode and mode.endswith('_mode') else mode, None]
+                interfaces['ports'].append(record)
+            else:
+                record = [name, None]
+                interfaces['generics'].append(record)
+            typed = (len(tags) - 1, record)
+        if kind in XML_SCOPE_KINDS:
+            scopes.append((len(tags) - 1, kind, name))
+
+    for entity in index['entities'].values():
+        for interfaces in (entity['generics'], entity['ports']):
+            for i, interface in enumerate(interfaces):
+                # Names declared together (a, b : std_logic) only have the type once
+                if interface[-1] is None and i > 0:
+                    interface[-1] = interfaces[i - 1][-1]
+                interfaces[i] = tuple(interface)
+    return index
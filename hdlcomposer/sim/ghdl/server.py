@@ -0,0 +1,236 @@
+from os                         import (getcwd, chdir, remove, umask)
+from os.path                    import (exists, dirname)
+from sys                        import (stdout)
+from io                         import (StringIO)
+from json                       import (dumps, loads)
+from contextlib                 import (contextmanager, redirect_stdout)
+from traceback                  import (format_exc)
+from time                       import (perf_counter)
+from socketserver               import (StreamRequestHandler, TCPServer)
+try:
+    from socketserver           import (UnixStreamServer)
+except ImportError:
+    UnixStreamServer = None
+
+from hdlcomposer.utils          import (create_watcher, collect_stderr)
+from hdlcomposer.sim.ghdl       import ghdl as ghdl_module
+from hdlcomposer.sim.ghdl.client import (AF_UNIX, default_address, parse_address, ping,
+                                         is_loopback, private_directory)
+
+
+
+###############################################################################
+# SERVER
+###############################################################################
+
+@contextmanager
+def captured_output():
+    """Collect everything the GHDL class and print() write while the context is active
+
+    The standard error of the GHDL commands (analysis and elaboration errors)
+    is collected too, instead of going to the console of the server.
+    """
+
+    output = StringIO()
+
+    def write_line(line):
+        output.write(line + '\n')
+
+    original_stdout = ghdl_module.stdout
+    ghdl_module.stdout = output
+    try:
+        with redirect_stdout(output), collect_stderr(write_line):
+            yield output
+    finally:
+        ghdl_module.stdout = original_stdout
+
+
+
+class Session():
+    """A GHDL configuration kept in memory between requests
+
+    The sources directories are watched from the moment it is created, so
+    each request only imports the files that changed since the previous one.
+    """
+
+    def __init__(self, options):
+        self.ghdl = ghdl_module.GHDL(**options)
+        self.watcher = create_watcher(self.ghdl.sources_directories, self.ghdl.ignore)
+        self.imported = False
+        self.requests = 0
+
+
+
+    def update(self):
+        """Import the sources, all of them the first time and then only the changed ones
+        """
+
+        if not self.imported:
+            self.ghdl.import_sources()
+            self.imported = True
+            return
+        changed_paths = self.watcher.wait(0)
+        if changed_paths is None:
+            self.ghdl.add_sources_from_dir(self.ghdl.sources_directories)
+            changed_paths = set(self.ghdl.sources_paths)
+        if changed_paths:
+            self.ghdl.update_sources(changed_paths)
+
+
+
+    def close(self):
+        self.watcher.close()
+
+
+
+class GHDLServer():
+    """Long lived process that keeps GHDL sessions in memory
+
+    Clients send one JSON object per line and get one JSON object per line
+    back, with the error code and the output of the command. Requests are
+    handled one at a time. A session (GHDL instance, directory listings,
+    testbench dependencies, parsed hierarchies...) is kept for each working
+    directory and set of GHDL options.
+
+    Commands:
+        ping: Check that the server is running.
+        import: Import the sources that changed.
+        run: Import the changes, then make and run the testbenches.
+            Arguments: run_time, testbench, open_waves, wave_signals.
+        parse: Import the changes and print the hierarchy of the testbenches.
+        shutdown: Stop the server.
+
+    Anyone who can connect can run GHDL with any options in any directory,
+    with the permissions of the server. The Unix socket is only accessible by
+    its owner, see private_directory(). A TCP port has no authentication:
+    only loopback addresses are accepted, and every local user can still
+    connect to them, so prefer the Unix socket on shared machines.
+
+    Args:
+        address (str): 'host:port' or the path of a Unix socket. See default_address().
+        verbose (bool): Log the requests.
+    """
+
+    def __init__(self, address=None, verbose=False):
+        self.address = address or default_address()
+        self.verbose = verbose
+        self.sessions = {}
+        self.running = False
+
+
+
+    def session(self, cwd, options):
+        key = dumps([cwd, options], sort_keys=True)
+        if key not in self.sessions:
+            self.sessions[key] = Session(options)
+        return self.sessions[key]
+
+
+
+    def handle(self, request):
+        """Run a request, return the response
+        """
+
+        command = request.get('command')
+        if command == 'ping':
+            return {'error': 0, 'output': 'pong'}
+        if command == 'shutdown':
+            self.running = False
+            return {'error': 0, 'output': 'Shutting down'}
+        if command not in ('import', 'run', 'parse'):
+            return {'error': 1, 'output': 'Unknown command ' + str(command)}
+
+        error = 0
+        cwd = request.get('cwd') or getcwd()
+        previous_cwd = getcwd()
+        with captured_output() as output:
+            try:
+                chdir(cwd)
+                session = self.session(cwd, request.get('options', {}))
+                session.requests += 1
+                session.update()
+                testbench = request.get('testbench') or session.ghdl.testbench
+                if isinstance(testbench, str):
+                    testbench = [testbench]
+                if command == 'run':
+                    for entity in testbench:
+                        if not session.ghdl.make_and_run(entity, request.get('run_time', '1us'),
+                                                         request.get('open_waves', False),
+                                                         request.get('wave_signals')):
+                            error = 1
+                elif command == 'parse':
+                    for entity in testbench:
+                        output.write('* ' + entity.upper() + ' TREE:\n')
+                        session.ghdl.parse_entity(entity).print_children()
+            except Exception:
+                error = 1
+                output.write(format_exc())
+            finally:
+                chdir(previous_cwd)
+        return {'error': error, 'output': output.getvalue()}
+
+
+
+    def serve_forever(self):
+        family, address = parse_address(self.address)
+        server = self
+
+        class RequestHandler(StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    start = perf_counter()
+                    try:
+                        request = loads(line)
+                    except ValueError:
+                        response = {'error': 1, 'output': 'Invalid request'}
+                    else:
+                        response = server.handle(request)
+                        if server.verbose:
+                            stdout.write(str(request.get('command')) + ' ' + str(response['error']) +
+                                         ' (%.3fs)' % (perf_counter() - start) + '\n')
+                            stdout.flush()
+                    self.wfile.write((dumps(response) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+                    if not server.running:
+                        break
+
+        if family == AF_UNIX:
+            if self.address == default_address():
+                private_directory(dirname(address))
+            if exists(address):
+                if ping(self.address):
+                    raise ValueError('A server is already running at ' + address)
+                remove(address)
+            # Only the owner can connect, from the moment the socket is created
+            previous_umask = umask(0o177)
+            try:
+                socket_server = UnixStreamServer(address, RequestHandler)
+            finally:
+                umask(previous_umask)
+        else:
+            if not is_loopback(address[0]):
+                raise ValueError('The server has no authentication, it only listens on ' +
+                                 'loopback addresses, not ' + address[0])
+            socket_server = TCPServer(address, RequestHandler, bind_and_activate=False)
+            socket_server.allow_reuse_address = True
+            socket_server.server_bind()
+            socket_server.server_activate()
+
+        if self.verbose:
+            stdout.write('Listening on ' + self.address + '\n')
+            stdout.flush()
+        self.running = True
+        try:
+            with socket_server:
+                while self.running:
+                    socket_server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            for session in self.sessions.values():
+                session.close()
+            if family == AF_UNIX and exists(address):
+                remove(address)
@@ -9,6 +9,8 @@ class Unit():
     """ Base unit with common properties
     """
 
+    __slots__ = ('name', 'parent', 'indentation')
+
     def __init__(self, name, parent, indentation):
         self.name = name
         self.parent = parent
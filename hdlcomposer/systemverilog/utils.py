@@ -1,9 +1,13 @@
 from os                import (getcwd)
-from os.path           import (join)
+from os.path           import (join, abspath)
 
 from hdlcomposer.utils import (int_tobin, data_to_pkg_cfg)
 
 
+WRITE_BUFFER_SIZE = 1024 * 1024
+WRITE_CHUNK_ELEMENTS = 64 * 1024
+
+
 def generate_package(pkg_cfg, package_name, output_directory=None, indentation=2):
     """Generate a SystemVerilog package with the provided constants
 
@@ -153,3 +157,167 @@ def data_to_package(signals, package_name, output_dir=None):
         """
 
         generate_package(data_to_pkg_cfg(signals), package_name, output_dir)
+
+
+
+
+def memory_word_width(data_type, data_w):
+    """Width in bits of a memory word for the given type
+    """
+
+    if data_type in ('boolean', 'logic', 'reg', 'std_logic'):
+        return 1
+    elif data_type == 'integer':
+        return 32
+    elif data_type in ('signed', 'unsigned', 'logic_vector', 'std_logic_vector'):
+        return data_w
+    else:
+        raise ValueError('Type ' +  data_type + ' is not supported yet.')
+
+
+
+def memory_word_value(data_i, data_type):
+    """Integer value of a memory word, binary strings are converted
+    """
+
+    if data_type in ('boolean', 'logic', 'reg', 'std_logic'):
+        if isinstance(data_i, str):
+            return 0 if data_i.lower() in ('false', '0') else 1
+        return 1 if data_i else 0
+    if isinstance(data_i, str):
+        value = int(data_i, 2)
+        if data_type == 'signed' and data_i[0] == '1':
+            value -= 1 << len(data_i)
+        return value
+    if isinstance(data_i, int):
+        return data_i
+    raise ValueError('Data type must be binary representation string or int.')
+
+
+
+def memory_words(data, data_type, word_width, radix='h'):
+    """Format a list of values as $readmemh ('h') or $readmemb ('b') words
+    """
+
+    mask = (1 << word_width) - 1
+    if radix == 'h':
+        to_word = ('{:0' + str((word_width + 3) // 4) + 'x}').format
+    elif radix == 'b':
+        to_word = ('{:0' + str(word_width) + 'b}').format
+    else:
+        raise ValueError('Invalid radix. Valid values are h, b')
+    if data_type in ('integer', 'signed', 'unsigned', 'logic_vector', 'std_logic_vector'):
+        try:
+            return [to_word(data_i & mask) for data_i in data]
+        except TypeError:
+            pass
+    return [to_word(memory_word_value(data_i, data_type) & mask) for data_i in data]
+
+
+
+def write_memory_file(file_path, data, data_type, word_width, radix='h'):
+    """Write the values to a memory file that can be loaded with $readmemh / $readmemb
+
+    Words are formatted and written in chunks, one per line.
+    """
+
+    with open(file_path, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+        for chunk_start in range(0, len(data), WRITE_CHUNK_ELEMENTS):
+            chunk = data[chunk_start:chunk_start + WRITE_CHUNK_ELEMENTS]
+            f.write('\n'.join(memory_words(chunk, data_type, word_width, radix)))
+            f.write('\n')
+
+
+
+def generate_memory_package(pkg_cfg, package_name, output_directory=None, indentation=2,
+                            radix='h'):
+    """Generate a SystemVerilog package whose arrays are loaded from memory files
+
+    Instead of inlining every element (see generate_package), the data of each
+    array is written to <package_name>_<constant>.mem. The package declares the
+    arrays, their length and width, the file paths and a load_memories task
+    that reads them with $readmemh or $readmemb. The package does not grow with
+    the stimulus length.
+
+    Usage in the testbench:
+
+        import <package_name>::*;
+        initial load_memories();
+
+    Args:
+        pkg_cfg (dict): Same format as in generate_package. Arrays can not be
+            empty, SystemVerilog has no empty unpacked array range.
+        package_name (str): Package name.
+        output_directory (str): Output path.
+        radix (str): 'h' for hexadecimal files ($readmemh), 'b' for binary ($readmemb).
+
+    Returns:
+        list: Paths of the generated files.
+    """
+
+    for constant_name in pkg_cfg.keys():
+        data = pkg_cfg[constant_name]['data']
+        if isinstance(data, list) and not data:
+            raise ValueError('Error ' + constant_name + ' has no data, SystemVerilog arrays can not be empty.')
+
+    output_directory = abspath(output_directory or getcwd())
+    indent = ' ' * 1 * indentation
+    generated_files = []
+
+    package_text = []
+    package_text.append('')
+    package_text.append('package ' + package_name + ';')
+    package_text.append('')
+
+    load_text = []
+
+    for constant_name in pkg_cfg.keys():
+        data_w = pkg_cfg[constant_name]['width'] if ('width' in pkg_cfg[constant_name].keys()) else None
+        data_type = pkg_cfg[constant_name]['type']
+        data = pkg_cfg[constant_name]['data']
+        word_width = memory_word_width(data_type, data_w)
+        word_type = 'logic signed' if data_type in ('signed', 'integer') else 'logic'
+        word_range = ' [' + constant_name + '_w-1:0]'
+
+        package_text.append(indent + 'localparam ' + constant_name + '_w = ' + str(word_width) + ';')
+
+        if not isinstance(data, list):
+            package_text.append(indent + 'localparam ' + word_type + word_range + ' ' + constant_name +
+                                ' = ' + str(word_width) + '\'' + radix +
+                                memory_words([data], data_type, word_width, radix)[0] + ';')
+            package_text.append('')
+            continue
+
+        memory_path = join(output_directory, package_name + '_' + constant_name + '.mem')
+        write_memory_file(memory_path, data, data_type, word_width, radix)
+        generated_files.append(memory_path)
+
+        package_text.append(indent + 'localparam ' + constant_name + '_l = ' + str(len(data)) + ';')
+        package_text.append(indent + 'localparam string ' + constant_name + '_file = "' +
+                            memory_path.replace('\\', '/') + '";')
+        package_text.append(indent + word_type + word_range + ' ' + constant_name +
+                            ' [0:' + constant_name + '_l-1];')
+        package_text.append('')
+        load_text.append(indent * 2 + '$readmem' + radix + '(' + constant_name + '_file, ' +
+                         constant_name + ');')
+
+    package_text.append(indent + 'task automatic load_memories();')
+    package_text += load_text
+    package_text.append(indent + 'endtask')
+    package_text.append('')
+    package_text.append('endpackage')
+
+    package_path = join(output_directory, package_name + '.sv')
+    with open(package_path, 'w+') as f:
+        for line in package_text:
+            f.write(line + '\n')
+    generated_files.append(package_path)
+    return generated_files
+
+
+
+def data_to_memory_package(signals, package_name, output_dir=None, radix='h'):
+        """Generate a SystemVerilog package and memory files from a group of signals
+        """
+
+        return generate_memory_package(data_to_pkg_cfg(signals), package_name, output_dir, radix=radix)
@@ -1 +1,36 @@
-from hdlcomposer.utils.general import *
+from importlib                  import (import_module)
+
+from hdlcomposer.utils          import general
+from hdlcomposer.utils.general  import *
+
+
+
+# These modules are imported the first time one of their names is used
+# (PEP 562). commands loads asyncio, which is slow to import.
+LAZY_MODULES = ('commands', 'config', 'watch')
+
+
+
+def public_names(module):
+    return [name for name in vars(module) if not name.startswith('_')]
+
+
+
+def __getattr__(name):
+    if name == '__all__':
+        # Only needed by 'from hdlcomposer.utils import *', which loads the
+        # lazy modules too
+        all_names = sorted(set(public_names(general)).union(
+            *[public_names(import_module('hdlcomposer.utils.' + module_name))
+              for module_name in LAZY_MODULES]))
+        globals()['__all__'] = all_names
+        return all_names
+    if name in LAZY_MODULES:
+        return import_module('hdlcomposer.utils.' + name)
+    if not name.startswith('_'):
+        for module_name in LAZY_MODULES:
+            module = import_module('hdlcomposer.utils.' + module_name)
+            if name in vars(module):
+                globals()[name] = vars(module)[name]
+                return globals()[name]
+    raise AttributeError("module 'hdlcomposer.utils' has no attribute '" + name + "'")
@@ -0,0 +1,301 @@
+from asyncio    import (create_subprocess_exec, wait_for, gather, run, Semaphore,
+                        get_running_loop, CancelledError,
+                        TimeoutError as AsyncTimeoutError)
+from asyncio    import subprocess as async_subprocess
+from threading  import (Thread)
+from contextlib import (contextmanager)
+from shlex      import (quote)
+from time       import (perf_counter)
+try:
+    from resource import (getrusage, RUSAGE_CHILDREN)
+except ImportError:
+    getrusage = None
+
+
+
+TIMEOUT_ERROR = 124
+NOT_FOUND_ERROR = 127
+READ_CHUNK_SIZE = 64 * 1024
+
+# Handlers set by collect_stderr(), the innermost one is used
+stderr_collectors = []
+
+
+
+###############################################################################
+# COMMAND EXECUTION
+###############################################################################
+
+class CommandResult():
+    """Outcome of a command
+
+    It can be unpacked like the (error, terminal_output) pair returned by
+    run_console_command.
+
+    Args:
+        command (list): Arguments of the command that was run.
+        error (int): Return code, TIMEOUT_ERROR if it was killed after the timeout.
+        output (str): Standard output, empty if it was not kept.
+        wall_time (float): Elapsed seconds.
+        cpu_time (float): User + system seconds of the child processes, None if
+            not available in this platform. When several commands run
+            concurrently the value can include time of the other children.
+        timed_out (bool): It was killed after the timeout.
+        aborted (bool): It was killed because an output handler returned True.
+    """
+
+    def __init__(self, command, error, output='', wall_time=0.0, cpu_time=None, timed_out=False,
+                 aborted=False):
+        self.command = command
+        self.error = error
+        self.output = output
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.timed_out = timed_out
+        self.aborted = aborted
+
+
+
+    def __repr__(self):
+        return 'CommandResult - error: ' + str(self.error) + ' ' + self.times
+
+
+
+    @property
+    def times(self):
+        return ('(' + '%.2f' % self.wall_time + 's' +
+                ((' wall, ' + '%.2f' % self.cpu_time + 's cpu') if self.cpu_time is not None else '') +
+                ')')
+
+
+
+    def __iter__(self):
+        return iter((self.error, self.output))
+
+
+
+    def __getitem__(self, index):
+        return (self.error, self.output)[index]
+
+
+
+    def __len__(self):
+        return 2
+
+
+
+def command_to_str(command):
+    """Printable version of an argument list, for example to show it to the user
+    """
+
+    return ' '.join(quote(str(arg)) for arg in command)
+
+
+
+def _children_cpu_time():
+    if getrusage is None:
+        return None
+    usage = getrusage(RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+
+async def _read_lines(stream, handler):
+    """Call handler for each line of the stream, without the line terminator
+
+    Stops and returns True as soon as the handler returns True.
+    """
+
+    pending = b''
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            if handler(line.decode('utf-8', errors='replace').rstrip('\r')) is True:
+                return True
+    if pending:
+        return handler(pending.decode('utf-8', errors='replace').rstrip('\r')) is True
+    return False
+
+
+
+@contextmanager
+def collect_stderr(handler):
+    """Send the standard error of the commands run inside the context to handler
+
+    It applies to the commands that do not get their own stderr_handler, whose
+    errors would go to the console otherwise. For example, a server uses it
+    to return the compiler messages to its client.
+    """
+
+    stderr_collectors.append(handler)
+    try:
+        yield
+    finally:
+        stderr_collectors.remove(handler)
+
+
+
+async def run_command_async(command, timeout=None, stdout_handler=None, stderr_handler=None,
+                            keep_output=True, cwd=None, output_file=None):
+    """Run a command without a shell and stream its output
+
+    Args:
+        command (list): Program and arguments, for example ['ghdl', '-r', 'tb'].
+        timeout (float): Seconds before the process is killed. None waits forever.
+        stdout_handler: Function called with every line of the standard output.
+            If it returns True, the process is killed (for example when the
+            output shows that a simulation already failed).
+        stderr_handler: Function called with every line of the standard error,
+            it can also return True to kill the process. If not provided, the
+            standard error goes to the handler of collect_stderr(), or to
+            the console if there is none, as it does with run_console_command.
+        keep_output (bool): Store the standard output in the result. Disable it
+            for large outputs that are already processed by stdout_handler.
+        cwd (str): Working directory.
+        output_file: Binary file the standard output is written to by the
+            process itself, without reading it here. For very large outputs
+            like XML dumps. stdout_handler and keep_output are ignored.
+
+    Returns:
+        CommandResult
+    """
+
+    command = [str(arg) for arg in command]
+    output_lines = []
+    if stderr_handler is None and stderr_collectors:
+        stderr_handler = stderr_collectors[-1]
+
+    def handle_stdout(line):
+        if keep_output:
+            output_lines.append(line)
+        if stdout_handler:
+            return stdout_handler(line)
+
+    start_wall = perf_counter()
+    start_cpu = _children_cpu_time()
+    try:
+        process = await create_subprocess_exec(
+            *command,
+            stdout=output_file if output_file is not None else async_subprocess.PIPE,
+            stderr=async_subprocess.PIPE if stderr_handler else None,
+            cwd=cwd
+        )
+    except OSError as err:
+        return CommandResult(command, NOT_FOUND_ERROR, str(err), perf_counter() - start_wall)
+
+    aborted = False
+
+    async def read_stream(stream, handler):
+        nonlocal aborted
+        if await _read_lines(stream, handler):
+            aborted = True
+            if process.returncode is None:
+                process.kill()
+
+    readers = [read_stream(process.stdout, handle_stdout)] if output_file is None else []
+    if stderr_handler:
+        readers.append(read_stream(process.stderr, stderr_handler))
+
+    timed_out = False
+    try:
+        await wait_for(gather(*readers, process.wait()), timeout)
+    except AsyncTimeoutError:
+        timed_out = True
+        process.kill()
+        await process.wait()
+    except CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+
+    end_cpu = _children_cpu_time()
+    return CommandResult(
+        command,
+        TIMEOUT_ERROR if timed_out else process.returncode,
+        ('\n'.join(output_lines) + '\n') if output_lines else '',
+        perf_counter() - start_wall,
+        (end_cpu - start_cpu) if start_cpu is not None else None,
+        timed_out,
+        aborted
+    )
+
+
+
+def run_sync(coroutine):
+    """Run a coroutine to completion from synchronous code
+
+    If an event loop is already running in this thread (for example in a
+    notebook), the coroutine runs in its own loop in a helper thread.
+    """
+
+    try:
+        get_running_loop()
+    except RuntimeError:
+        return run(coroutine)
+
+    result = {}
+    def target():
+        try:
+            result['value'] = run(coroutine)
+        except BaseException as err:
+            result['error'] = err
+    thread = Thread(target=target)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+
+
+def run_command(command, timeout=None, stdout_handler=None, stderr_handler=None,
+                keep_output=True, cwd=None, output_file=None):
+    """Blocking version of run_command_async()
+    """
+
+    return run_sync(run_command_async(command, timeout, stdout_handler, stderr_handler,
+                                      keep_output, cwd, output_file))
+
+
+
+async def run_command_chains_async(chains, jobs=1, timeout=None, cwd=None):
+    """Run several sequences of commands concurrently
+
+    The commands of a chain run one after the other, and the chain stops at
+    the first one that fails. Different chains run in parallel, with at most
+    jobs commands running at the same time.
+
+    Args:
+        chains (list): Lists of commands, each command an argument list.
+        jobs (int): Maximum number of concurrent commands.
+        timeout (float): Seconds before each command is killed.
+
+    Returns:
+        A list with the CommandResults of each chain
+    """
+
+    semaphore = Semaphore(max(1, jobs))
+
+    async def run_chain(chain):
+        results = []
+        for command in chain:
+            async with semaphore:
+                result = await run_command_async(command, timeout, cwd=cwd)
+            results.append(result)
+            if result.error:
+                break
+        return results
+
+    return list(await gather(*[run_chain(chain) for chain in chains]))
+
+
+
+def run_command_chains(chains, jobs=1, timeout=None, cwd=None):
+    """Blocking version of run_command_chains_async()
+    """
+
+    return run_sync(run_command_chains_async(chains, jobs, timeout, cwd))
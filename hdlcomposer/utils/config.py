@@ -0,0 +1,136 @@
+from os                         import (makedirs, replace, remove)
+from os.path                    import (dirname)
+from json                       import (dump, load)
+from copy                       import (deepcopy)
+from tempfile                   import (NamedTemporaryFile)
+from contextlib                 import (contextmanager)
+
+from hdlcomposer.utils.general  import (locked_file)
+
+
+
+def apply_config_changes(current, base, new):
+    """Apply to current the changes that turn base into new
+
+    Keys removed from base are removed from current, and keys added or
+    changed in new are written to current. The rest of current, including
+    the keys that another writer changed, is kept.
+    """
+
+    for key in base:
+        if key not in new:
+            current.pop(key, None)
+    for key, value in new.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict) and \
+           isinstance(current.get(key), dict):
+            apply_config_changes(current[key], base[key], value)
+        elif key not in base or base[key] != value:
+            current[key] = deepcopy(value)
+    return current
+
+
+
+class ConfigStore():
+    """Persistent JSON configuration that can be shared by several processes
+
+    Changes are kept in memory inside a batch() and written once when it ends.
+    Every write takes a lock, applies the changes made since the last load or
+    write (additions, updates and deletions) to the file contents, so the
+    entries changed by other processes are kept, and replaces the file
+    atomically, so readers never see a partially written file.
+
+    Args:
+        file_path (str): Path of the JSON file.
+        default (dict): Contents used when the file does not exist.
+    """
+
+    def __init__(self, file_path, default=None):
+        self.file_path = file_path
+        self.lock_path = file_path + '.lock'
+        self.default = default or {}
+        self.data = deepcopy(self.default)
+        self.base = {}          # Contents of the file when it was last read or written
+        self.batch_depth = 0
+        self.dirty = False
+
+
+
+    def __repr__(self):
+        return 'ConfigStore - ' + self.file_path
+
+
+
+    def read(self):
+        try:
+            with open(self.file_path) as infile:
+                return load(infile)
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+
+    def load(self):
+        """Read the configuration from the file
+
+        If the file does not exist, it is created with the default contents.
+        """
+
+        makedirs(dirname(self.file_path), exist_ok=True)
+        with locked_file(self.lock_path):
+            data = self.read()
+        if data is None:
+            self.base = {}
+            self.data = deepcopy(self.default)
+            self.save()
+        else:
+            self.base = deepcopy(data)
+            self.data = data
+        return self.data
+
+
+
+    def save(self):
+        """Write the configuration, or mark it to be written at the end of the batch
+        """
+
+        if self.batch_depth:
+            self.dirty = True
+        else:
+            self.flush()
+
+
+
+    def flush(self):
+        """Apply the changes to the file contents and write it atomically
+        """
+
+        makedirs(dirname(self.file_path), exist_ok=True)
+        with locked_file(self.lock_path):
+            data = apply_config_changes(self.read() or {}, self.base, self.data)
+            with NamedTemporaryFile('w', dir=dirname(self.file_path), delete=False,
+                                    suffix='.tmp') as outfile:
+                dump(data, outfile)
+            try:
+                replace(outfile.name, self.file_path)
+            except OSError:
+                remove(outfile.name)
+                raise
+        self.data.clear()
+        self.data.update(data)
+        self.base = deepcopy(data)
+        self.dirty = False
+
+
+
+    @contextmanager
+    def batch(self):
+        """Defer the writes inside the context to a single flush at the end
+        """
+
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth and self.dirty:
+                self.flush()
@@ -1,8 +1,17 @@
-from re         import (sub)
-from os         import (listdir, walk, getcwd)
+from re         import (sub, compile as re_compile)
+from fnmatch    import (translate)
+from hashlib    import (sha256)
+from json       import (dumps)
+from os         import (listdir, scandir, stat, getcwd)
 from os.path    import (normpath, abspath, join, isdir)
 from subprocess import (check_output, Popen, DEVNULL, STDOUT, check_call,
                         CalledProcessError)
+from contextlib import (contextmanager)
+try:
+    from fcntl  import (flock, LOCK_EX, LOCK_UN)
+except ImportError:
+    flock = None
+    from msvcrt import (locking, LK_LOCK, LK_UNLCK)
 
 
 
@@ -19,6 +28,119 @@ def save_txt(text, path):
 
 
 
+def hash_files(file_paths, chunk_size=1024 * 1024):
+    """SHA-256 of the names and contents of several files
+
+    Files that do not exist are skipped. Returns None if none of them exist.
+    """
+
+    file_hash = sha256()
+    found = False
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'rb') as f:
+                file_hash.update(file_path.encode('utf-8') + b'\0')
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    file_hash.update(chunk)
+            found = True
+        except FileNotFoundError:
+            pass
+    return file_hash.hexdigest() if found else None
+
+
+
+def package_hash(pkg_cfg, *parameters):
+    """Content hash of a package configuration
+
+    Two calls with equal pkg_cfg (same constants, in the same order) and equal
+    parameters, like the package name, return the same hash. Generators use it
+    to skip writing packages that did not change.
+    """
+
+    content = dumps([parameters, pkg_cfg], separators=(',', ':'),
+                    default=lambda obj: obj.tolist() if hasattr(obj, 'tolist') else str(obj))
+    return sha256(content.encode('utf-8')).hexdigest()
+
+
+
+def read_package_hash(file_path):
+    """Hash saved next to a generated package, None if there is none
+    """
+
+    try:
+        with open(file_path + '.sha256') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+
+def write_package_hash(file_path, content_hash):
+    """Save the hash of a generated package next to it
+    """
+
+    with open(file_path + '.sha256', 'w') as f:
+        f.write(content_hash + '\n')
+
+
+
+@contextmanager
+def locked_file(lock_path):
+    """Hold an exclusive lock on a file while the context is active
+
+    Used to coordinate several processes that share files, for example
+    parallel runs using the same work dir. The lock file is created if needed.
+    """
+
+    with open(lock_path, 'a+') as lock_file:
+        if flock:
+            flock(lock_file.fileno(), LOCK_EX)
+        else:
+            lock_file.seek(0)
+            locking(lock_file.fileno(), LK_LOCK, 1)
+        try:
+            yield lock_file
+        finally:
+            if flock:
+                flock(lock_file.fileno(), LOCK_UN)
+            else:
+                lock_file.seek(0)
+                locking(lock_file.fileno(), LK_UNLCK, 1)
+
+
+
+TIME_UNITS = {'fs': 1, 'ps': 10**3, 'ns': 10**6, 'us': 10**9, 'ms': 10**12,
+              'sec': 10**15, 's': 10**15, 'min': 60 * 10**15, 'hr': 3600 * 10**15}
+RE_TIME = re_compile(r'^\s*(?P<value>\d+(\.\d*)?)\s*(?P<unit>[a-z]*)\s*$')
+
+
+
+def time_to_fs(value, unit):
+    """Simulation time in femtoseconds, for example time_to_fs('15', 'ns')
+    """
+
+    if '.' in value:
+        return round(float(value) * TIME_UNITS[unit])
+    return int(value) * TIME_UNITS[unit]
+
+
+
+def parse_time(time):
+    """Femtoseconds of a time like '15ns' or '1.5 us'
+
+    Numbers without a unit are already femtoseconds.
+    """
+
+    if isinstance(time, (int, float)):
+        return int(time)
+    match = RE_TIME.match(time.lower())
+    unit = (match.group('unit') or 'fs') if match else None
+    if unit not in TIME_UNITS:
+        raise ValueError('Invalid time ' + str(time))
+    return time_to_fs(match.group('value'), unit)
+
+
+
 def get_bit(y, x):
     """Get single bit at index
     """
@@ -29,11 +151,13 @@ def get_bit(y, x):
 
 def int_tobin(x, count=8):
     """ Integer to binary string
+
+    Negative numbers are represented in two's complement.
     """
 
-    shift = range(count - 1, -1, -1)
-    bits = map(lambda y: get_bit(y, x), shift)
-    return "".join(bits)
+    if count <= 0:
+        return ''
+    return format(x & ((1 << count) - 1), '0' + str(count) + 'b')
 
 
 
@@ -69,12 +193,32 @@ def tv_files(signal_name, directory_path):
 
 
 
+def waveform_columns(waveform):
+    """Time and value columns of a waveform
+
+    The waveform can be a list of [time, value] pairs (as in Signal.waveform),
+    a (times, values) pair of columns, or a NumPy-like array with one row per
+    transition. Arrays and columns are converted in bulk.
+
+    Returns:
+        times (list), values (list)
+    """
+
+    if getattr(waveform, 'ndim', None) == 2:
+        return waveform[:, 0].tolist(), waveform[:, 1].tolist()
+    if isinstance(waveform, tuple) and len(waveform) == 2:
+        return [(column.tolist() if hasattr(column, 'tolist') else list(column)) for column in waveform]
+    return [tv[0] for tv in waveform], [tv[1] for tv in waveform]
+
+
+
 def data_to_pkg_cfg(data):
     """Generate the config structure needed to generate a VHDL package from Signal(s) or Constant(s)
 
     Args:
         data: A dictionary like {'signal_name_a': Signal(a), 'constant_a': Constant(b), ...} or
-              a Group instance.
+              a Group instance. The waveforms can be in any of the formats accepted by
+              waveform_columns.
     """
 
     from hdlcomposer.signals import (Group, Signal, Constant)
@@ -88,15 +232,16 @@ def data_to_pkg_cfg(data):
 
     pkg_cfg = {}
     for element_name in elements.keys():
+        element_name_in_pkg = sub(r'[\[\]\(\)]', '', element_name)
         if isinstance(elements[element_name], Signal):
-            element_name_in_pkg = sub(r'[\[\]\(\)]', '', element_name)
+            times, values = waveform_columns(elements[element_name].waveform)
             pkg_cfg[element_name_in_pkg + '_t'] = {
-                'data': [data[Signal.t] for data in elements[element_name].waveform],
+                'data': times,
                 'type': 'integer',
                 'element_name': element_name_in_pkg,
             }
             pkg_cfg[element_name_in_pkg + '_v'] = {
-                'data': [data[Signal.v] for data in elements[element_name].waveform],
+                'data': values,
                 'type': elements[element_name].type,
                 'width': elements[element_name].width,
                 'element_name': element_name_in_pkg,
@@ -115,6 +260,10 @@ def data_to_pkg_cfg(data):
 def run_console_command(command):
     """Run a command in the console
 
+    The command is a string interpreted by the shell. The GHDL wrappers use
+    run_command() instead, which takes an argument list, streams the output
+    and supports timeouts.
+
     Returns:
         error
         terminal_output
@@ -144,55 +293,227 @@ def get_dirs_inside(dir_path):
 
 
 
-def get_filepaths_recursive(dir_path, extensions=[], include_files=[], exclude_files=[]):
+def scan_directory(dir_path):
+    """Names of the files, subdirectories and links to directories of a directory
+
+    Uses the file type reported by os.scandir, so most entries do not need
+    an extra stat. Unreadable directories are empty, like in os.walk.
+    Symbolic links to directories are returned apart, so walk_files() does
+    not follow them, like os.walk(followlinks=False).
+
+    Returns:
+        files, dirs, links: Lists of names.
+    """
+
+    files = []
+    dirs = []
+    links = []
+    try:
+        with scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.is_symlink() and entry.is_dir():
+                        links.append(entry.name)
+                    else:
+                        files.append(entry.name)
+                except OSError:
+                    files.append(entry.name)
+    except OSError:
+        pass
+    return files, dirs, links
+
+
+
+class DirectoryCache():
+    """Listings of the scanned directories, reused while they do not change
+
+    Adding, removing or renaming an entry updates the modification time of
+    its directory, so a directory is only listed again when its mtime
+    changes. Repeated scans of a large tree cost one stat per directory
+    instead of listing every file again.
+    """
+
+    def __init__(self):
+        self.listings = {}
+
+
+
+    def __len__(self):
+        return len(self.listings)
+
+
+
+    def clear(self):
+        self.listings.clear()
+
+
+
+    def scan(self, dir_path):
+        """Same as scan_directory(), using the cached listing if it is up to date
+        """
+
+        try:
+            mtime = stat(dir_path).st_mtime_ns
+        except OSError:
+            self.listings.pop(dir_path, None)
+            return [], [], []
+        cached = self.listings.get(dir_path)
+        if cached and cached[0] == mtime:
+            return cached[1:]
+        listing = scan_directory(dir_path)
+        self.listings[dir_path] = (mtime,) + listing
+        return listing
+
+
+
+def ignore_matcher(ignore):
+    """Function that tells if a file or directory name matches any of the ignore globs
+    """
+
+    if not ignore:
+        return None
+    if isinstance(ignore, str):
+        ignore = [ignore]
+    return re_compile('|'.join('(?:' + translate(pattern) + ')' for pattern in ignore)).match
+
+
+
+def walk_directories(dir_path, ignore=[], cache=None):
+    """Iterate over (directory, file names, directory link names) for a directory tree
+
+    Like os.walk, top-down and in listing order, but the directories whose
+    name matches an ignore glob (for example '.git' or 'sim_*') are not
+    scanned at all. Files and links that match an ignore glob are skipped
+    too. Links to directories are not followed, they are listed apart so
+    the caller can decide which ones to walk.
+
+    Args:
+        dir_path: Directory to scan.
+        ignore: Glob or list of globs matched against the file and directory names.
+        cache: DirectoryCache to reuse the listings of previous scans.
+    """
+
+    is_ignored = ignore_matcher(ignore)
+    scan = cache.scan if cache is not None else scan_directory
+    pending = [normpath(dir_path)]
+    while pending:
+        root = pending.pop()
+        files, dirs, links = scan(root)
+        if is_ignored:
+            files = [file for file in files if not is_ignored(file)]
+            dirs = [d for d in dirs if not is_ignored(d)]
+            links = [link for link in links if not is_ignored(link)]
+        yield root, files, links
+        pending.extend(join(root, d) for d in reversed(dirs))
+
+
+
+def walk_files(dir_path, ignore=[], cache=None):
+    """Iterate over (directory, file names) for a directory and all its subdirectories
+
+    See walk_directories().
+    """
+
+    for root, files, _ in walk_directories(dir_path, ignore, cache):
+        yield root, files
+
+
+
+def get_filepaths_recursive(dir_path, extensions=[], include_files=[], exclude_files=[],
+                            ignore=[], cache=None):
     """Get a list of all the files inside a given directory
 
     This function is recursive, it will scan all directories inside
-    every subdirectory recursively.
+    every subdirectory recursively. Extensions are not case sensitive.
+    See walk_files() for ignore and cache.
     """
 
-    scan_folder = normpath(dir_path)
+    extensions = tuple(extension.lower() for extension in extensions)
+    include_files = set(include_files)
+    exclude_files = set(exclude_files)
     file_paths = []
 
-    for root, dirs, files in walk(scan_folder):
+    for root, files in walk_files(dir_path, ignore, cache):
         for file in files:
-            if (not(include_files) or (file in include_files)) and (file not in exclude_files):
-                if extensions:
-                    for extension in [ext.lower() for ext in extensions]:
-                        if file.lower().endswith(extension):
-                            file_path = join(root, file)
-                            file_paths.append(file_path)
-                else:
-                    file_path = join(root, file)
-                    file_paths.append(file_path)
+            if ((include_files and file not in include_files) or (file in exclude_files) or
+                (extensions and not file.lower().endswith(extensions))):
+                continue
+            file_paths.append(join(root, file))
     return file_paths
 
 
 
-def get_dirs_containing_files(dir_path, extension=None):
+def get_dirs_containing_files(dir_path, extension=None, ignore=[], cache=None, first_only=False):
     """Get a list of all the directories that contain a file with the given extension
 
     Extension is optional (to find non-empty directories). This function is recursive,
     it will scan all directories inside every subdirectory recursively.
+    Each directory appears once. With first_only, the scan stops at the first
+    directory found, which is enough to know if there are any.
     """
 
-    scan_folder = normpath(dir_path)
+    extension = extension.lower() if extension else ''
     found_dirs = []
-    for root, dirs, files in walk(scan_folder):
-        for file in files:
-            if (not extension) or file.lower().endswith(extension.lower()):
-                found_dirs.append(root)
+    for root, files in walk_files(dir_path, ignore, cache):
+        if any(file.lower().endswith(extension) for file in files):
+            found_dirs.append(root)
+            if first_only:
+                break
     return found_dirs
 
 
 
+GTKW_SETTING_PREFIXES = ('[', '@', '*', '-', '!', '^', '%')
+RE_GTKW_BIT_RANGE = re_compile(r'\[[^\]]*\]$')
+
+
+
+def gtkw_signals(gtkw_path, top=None):
+    """Paths of the signals displayed by a gtkw file
+
+    The paths use '/' as separator and do not include the 'top' level that
+    GTKWave adds to ghw files or the bit ranges of vectors, for example
+    'tb/u_core/data' for 'top.tb.u_core.data[7:0]'.
+
+    Args:
+        top: Name of the top-level entity (the testbench). The first level
+            is only removed when the next one is this entity, so a design
+            whose top entity is called 'top' keeps it. Without it, any
+            leading 'top' level is removed.
+    """
+
+    paths = []
+    with open(gtkw_path, 'r', encoding='utf-8', errors='replace') as gtkw_file:
+        for line in gtkw_file:
+            line = line.strip()
+            if not line or line.startswith(GTKW_SETTING_PREFIXES):
+                continue
+            if line.startswith('#{'):
+                # Vector grouped from bits: #{name} bit bit...
+                line = line[2:line.find('}')]
+            elif line.startswith('+{'):
+                # Alias: +{alias} name
+                line = line[line.find('}') + 1:]
+            name = RE_GTKW_BIT_RANGE.sub('', line.strip())
+            levels = name.split('.')
+            if len(levels) > 1 and levels[0] == 'top' and (not top or levels[1].lower() == top.lower()):
+                levels = levels[1:]
+            path = '/'.join(levels)
+            if path and path not in paths:
+                paths.append(path)
+    return paths
+
+
+
 def gtkwave_open_wave(ghw_path, gtkw_file=''):
     """Open a ghw file in GTKWave
 
     Optionally, you can provide a gtkw file too.
     """
 
-    command_open_wave = 'gtkwave "' + ghw_path + '"'
+    command_open_wave = ['gtkwave', ghw_path]
     if gtkw_file:
-        command_open_wave += ' -a "' + gtkw_file + '"'
+        command_open_wave += ['-a', gtkw_file]
     Popen(command_open_wave, stdout=DEVNULL, stderr=STDOUT)
@@ -0,0 +1,273 @@
+from os                         import (read, close, stat, fsencode, fsdecode, sep)
+from os.path                    import (join, normpath, abspath, isdir)
+from select                     import (select)
+from struct                     import (Struct)
+from time                       import (sleep, monotonic)
+from ctypes                     import (CDLL, get_errno)
+from ctypes.util                import (find_library)
+
+from hdlcomposer.utils.general  import (walk_files, ignore_matcher, DirectoryCache)
+
+
+
+DEBOUNCE_TIME = 0.2
+POLL_INTERVAL = 1.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF)
+INOTIFY_EVENT = Struct('iIII')
+INOTIFY_READ_SIZE = 64 * 1024
+
+
+
+###############################################################################
+# FILESYSTEM WATCHERS
+###############################################################################
+
+def load_inotify():
+    """libc with the inotify functions, None if they are not available
+    """
+
+    try:
+        libc = CDLL(find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+
+class PollingWatcher():
+    """Detect changes comparing the modification time and size of the files
+
+    Works on any platform and filesystem (including network shares), at the
+    cost of one stat per file and directory every interval.
+
+    Args:
+        directories (list): Directories watched recursively.
+        ignore: Globs of file and directory names to skip, as in walk_files().
+        interval (float): Seconds between scans.
+    """
+
+    def __init__(self, directories, ignore=[], interval=POLL_INTERVAL):
+        self.directories = [abspath(normpath(directory)) for directory in directories]
+        self.ignore = ignore
+        self.interval = interval
+        self.directory_cache = DirectoryCache()
+        self.snapshot = self.scan()
+
+
+
+    def scan(self):
+        snapshot = {}
+        for directory in self.directories:
+            for root, files in walk_files(directory, self.ignore, self.directory_cache):
+                for file in files:
+                    file_path = join(root, file)
+                    try:
+                        file_stat = stat(file_path)
+                    except OSError:
+                        continue
+                    snapshot[file_path] = (file_stat.st_mtime_ns, file_stat.st_size)
+        return snapshot
+
+
+
+    def changes(self):
+        """Files created, modified or deleted since the previous call
+        """
+
+        snapshot = self.scan()
+        changed = {path for path, state in snapshot.items() if self.snapshot.get(path) != state}
+        changed.update(path for path in self.snapshot if path not in snapshot)
+        self.snapshot = snapshot
+        return changed
+
+
+
+    def wait(self, timeout=None):
+        """Block until something changes, then return the set of changed paths
+
+        Changes that happen close together are returned at once. Returns an
+        empty set if nothing changed before the timeout.
+        """
+
+        start = monotonic()
+        while True:
+            changed = self.changes()
+            if changed:
+                sleep(DEBOUNCE_TIME)
+                return changed | self.changes()
+            if timeout is not None and monotonic() - start >= timeout:
+                return set()
+            sleep(self.interval)
+
+
+
+    def close(self):
+        pass
+
+
+
+class InotifyWatcher():
+    """Detect changes with the Linux inotify API
+
+    The kernel reports the changes, so waiting costs nothing and the
+    reaction is immediate. New subdirectories are watched as they appear,
+    and when a directory is deleted or moved away, all the files known
+    inside it are reported. If the kernel event queue overflows, wait() returns None: the changes
+    are unknown and everything should be rescanned.
+
+    Args:
+        directories (list): Directories watched recursively.
+        ignore: Globs of file and directory names to skip, as in walk_files().
+        libc: Library returned by load_inotify().
+    """
+
+    def __init__(self, directories, ignore=[], libc=None):
+        self.libc = libc or load_inotify()
+        if self.libc is None:
+            raise OSError('inotify is not available')
+        self.ignore = ignore
+        self.is_ignored = ignore_matcher(ignore)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(get_errno(), 'inotify_init1 failed')
+        self.watched = {}
+        self.files = set()
+        for directory in directories:
+            self.add_tree(abspath(normpath(directory)))
+
+
+
+    def add_tree(self, directory):
+        """Watch a directory and its subdirectories, return the files found inside
+        """
+
+        found = set()
+        for root, files in walk_files(directory, self.ignore):
+            watch = self.libc.inotify_add_watch(self.fd, fsencode(root), WATCH_MASK)
+            if watch >= 0:
+                self.watched[watch] = root
+            found.update(join(root, file) for file in files)
+        self.files.update(found)
+        return found
+
+
+
+    def remove_tree(self, directory):
+        """Stop watching a directory that was deleted or moved, return the files it had
+        """
+
+        prefix = directory + sep
+        removed = {path for path in self.files if path.startswith(prefix)}
+        self.files.difference_update(removed)
+        for watch, root in list(self.watched.items()):
+            if root == directory or root.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, watch)
+                del self.watched[watch]
+        return removed
+
+
+
+    def read_events(self):
+        changed = set()
+        try:
+            data = read(self.fd, INOTIFY_READ_SIZE)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            watch, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self.watched.pop(watch, None)
+                continue
+            root = self.watched.get(watch)
+            if root is None or not name or (self.is_ignored and self.is_ignored(name)):
+                continue
+            path = join(root, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and isdir(path):
+                    changed.update(self.add_tree(path))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    changed.update(self.remove_tree(path))
+            else:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.files.discard(path)
+                else:
+                    self.files.add(path)
+                changed.add(path)
+        return changed
+
+
+
+    def wait(self, timeout=None):
+        """Block until something changes, then return the set of changed paths
+
+        Changes that happen close together are returned at once. Returns an
+        empty set if nothing changed before the timeout, None if events were
+        lost. Events of ignored files do not extend the timeout.
+        """
+
+        deadline = monotonic() + timeout if timeout is not None else None
+        changed = set()
+        while not changed:
+            remaining = max(deadline - monotonic(), 0) if deadline is not None else None
+            ready, _, _ = select([self.fd], [], [], remaining)
+            if not ready:
+                return changed
+            changed = self.read_events()
+            if changed is None:
+                return None
+        # Collect the rest of the burst, for example a checkout of many files,
+        # until no more changes (ignored files do not count) arrive
+        while select([self.fd], [], [], DEBOUNCE_TIME)[0]:
+            more = self.read_events()
+            if more is None:
+                return None
+            if not more:
+                break
+            changed.update(more)
+        return changed
+
+
+
+    def close(self):
+        if self.fd >= 0:
+            close(self.fd)
+            self.fd = -1
+
+
+
+def create_watcher(directories, ignore=[], interval=POLL_INTERVAL, polling=False):
+    """Watcher for a list of directories
+
+    Uses inotify when available (Linux), otherwise polls every interval.
+    """
+
+    libc = None if polling else load_inotify()
+    if libc is not None:
+        try:
+            return InotifyWatcher(directories, ignore, libc)
+        except OSError:
+            pass
+    return PollingWatcher(directories, ignore, interval)
@@ -1,2 +1,3 @@
 from hdlcomposer.vcd.utils import *
 from hdlcomposer.vcd.parse import *
+from hdlcomposer.vcd.subset import *
@@ -0,0 +1,187 @@
+from re                         import (compile)
+
+from hdlcomposer.utils.general  import (parse_time, time_to_fs)
+
+
+
+VCD_BUFFER_SIZE = 1024 * 1024
+VCD_PATH_SEPARATOR = '/'
+SCALAR_VALUES = frozenset(b'01xzXZuUwWlLhH-')
+VECTOR_VALUES = frozenset(b'bBrRsS')
+
+re_timescale = compile(r'^(?P<value>\d+)\s*(?P<unit>[a-z]+)$')
+re_bit_range = compile(r'\[[^\]]*\]$')
+
+
+
+###############################################################################
+# VCD SUBSET
+###############################################################################
+
+def read_vcd_definitions(vcd_file):
+    """Header commands of a vcd file, as lists of tokens from '$keyword' to '$end'
+
+    Reads the file until $enddefinitions, so the value changes can be
+    streamed after it.
+    """
+
+    commands = []
+    command = []
+    for line in vcd_file:
+        for token in line.split():
+            command.append(token)
+            if token == b'$end':
+                commands.append(command)
+                if command[0] == b'$enddefinitions':
+                    return commands
+                command = []
+    raise ValueError('$enddefinitions not found in vcd file')
+
+
+
+def vcd_timescale(commands):
+    """Femtoseconds per time unit of the vcd file
+    """
+
+    for command in commands:
+        if command[0] == b'$timescale':
+            timescale = b''.join(command[1:-1]).decode('ascii').lower()
+            match = re_timescale.match(timescale)
+            if match:
+                return time_to_fs(match.group('value'), match.group('unit'))
+    return 1
+
+
+
+def signal_selector(signals):
+    """Function that tells if a signal path is selected
+
+    A path selects that signal, or all the signals below it if it is a
+    scope (instance, process...). Not case sensitive.
+    """
+
+    selected = {signal.strip(VCD_PATH_SEPARATOR).lower() for signal in signals}
+
+    def is_selected(path):
+        levels = path.split(VCD_PATH_SEPARATOR)
+        return any(VCD_PATH_SEPARATOR.join(levels[:i]) in selected for i in range(1, len(levels) + 1))
+    return is_selected
+
+
+
+def write_vcd_definitions(output_file, commands, is_selected):
+    """Write the header with only the selected variables
+
+    Scopes without any selected variable are left out. Returns the set of
+    identifier codes of the selected variables.
+    """
+
+    keep_codes = set()
+    scopes = []
+    for command in commands:
+        keyword = command[0]
+        if keyword == b'$scope':
+            scopes.append([command, False])
+        elif keyword == b'$upscope':
+            if scopes and scopes.pop()[1]:
+                output_file.write(b' '.join(command) + b'\n')
+        elif keyword == b'$var':
+            # $var type size code reference [range] $end
+            reference = re_bit_range.sub('', command[4].decode('utf-8', errors='replace'))
+            path = VCD_PATH_SEPARATOR.join([scope[0][2].decode('utf-8', errors='replace')
+                                            for scope in scopes] + [reference])
+            if is_selected(path.lower()):
+                for scope in scopes:
+                    if not scope[1]:
+                        output_file.write(b' '.join(scope[0]) + b'\n')
+                        scope[1] = True
+                output_file.write(b' '.join(command) + b'\n')
+                keep_codes.add(command[3])
+        else:
+            output_file.write(b' '.join(command) + b'\n')
+    return keep_codes
+
+
+
+def vcd_subset(vcd_path, output_path, signals, start=None, end=None):
+    """Write a vcd file with only some of the signals, optionally in a time window
+
+    The file is streamed, so it is never loaded in memory, and reading stops
+    at the end of the window. Times without changes of the selected signals
+    are left out.
+
+    Args:
+        vcd_path: Path of the complete vcd file.
+        output_path: Path of the reduced vcd file.
+        signals: Paths of the signals to keep, like 'tb/u_core/data'. A scope
+            like 'tb/u_core' keeps all the signals inside.
+        start: Beginning of the window, like '10us'. The values of the
+            signals at that time are written as the initial values.
+        end: End of the window, like '20us'.
+
+    Returns:
+        Number of signals written.
+    """
+
+    is_selected = signal_selector(signals)
+    with open(vcd_path, 'rb', buffering=VCD_BUFFER_SIZE) as vcd_file, \
+         open(output_path, 'wb', buffering=VCD_BUFFER_SIZE) as output_file:
+        commands = read_vcd_definitions(vcd_file)
+        keep_codes = write_vcd_definitions(output_file, commands, is_selected)
+
+        timescale = vcd_timescale(commands)
+        start_time = parse_time(start) // timescale if start is not None else None
+        end_time = parse_time(end) // timescale if end is not None else None
+        # Before the window only the last value of each signal is tracked
+        last_values = {} if start_time else None
+        pending_time = None
+        written_time = None
+        write = output_file.write
+
+        for line in vcd_file:
+            first = line[0] if line else 0
+            if first == 35:  # '#'
+                time = int(line[1:])
+                if end_time is not None and time > end_time:
+                    break
+                if last_values is not None and time >= start_time:
+                    write(b'#' + str(start_time).encode() + b'\n$dumpvars\n' +
+                          b''.join(last_values.values()) + b'$end\n')
+                    written_time = start_time
+                    last_values = None
+                    pending_time = None if time == start_time else line
+                else:
+                    pending_time = line
+                continue
+            if first in SCALAR_VALUES:
+                code = line[1:].strip()
+            elif first in VECTOR_VALUES:
+                code = line.split(None, 1)[1].strip()
+            elif first == 36:  # '$'
+                if last_values is None:
+                    if pending_time:
+                        write(pending_time)
+                        written_time = int(pending_time[1:])
+                        pending_time = None
+                    write(line)
+                continue
+            else:
+                continue
+
+            if code in keep_codes:
+                if last_values is not None:
+                    last_values[code] = line
+                    continue
+                if pending_time:
+                    write(pending_time)
+                    written_time = int(pending_time[1:])
+                    pending_time = None
+                write(line)
+
+        if last_values is not None:
+            write(b'#' + str(start_time).encode() + b'\n$dumpvars\n' +
+                  b''.join(last_values.values()) + b'$end\n')
+            written_time = start_time
+        if end_time is not None and (written_time is None or end_time > written_time):
+            write(b'#' + str(end_time).encode() + b'\n')
+    return len(keep_codes)
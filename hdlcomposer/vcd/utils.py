@@ -1,14 +1,24 @@
-from vcdvcd                import (VCDVCD)
-
 from hdlcomposer.vcd.parse import (find_signal_name)
 
 
 
+def load_vcd(vcd_path):
+    """Parse a vcd file with vcdvcd
+
+    vcdvcd is imported here, so it is only loaded when a vcd file is read.
+    """
+
+    from vcdvcd import (VCDVCD)
+
+    return VCDVCD(vcd_path)
+
+
+
 def get_signal_names(vcd_path):
     """Load a vcd file and return the list of signal names including path
     """
 
-    vcd = VCDVCD(vcd_path)
+    vcd = load_vcd(vcd_path)
     return vcd.get_signals()
 
 
@@ -17,12 +27,12 @@ def get_data(vcd_path):
     """Load a vcd file and return the list of signal names including path
     """
 
-    vcd = VCDVCD(vcd_path)
+    vcd = load_vcd(vcd_path)
     return vcd.get_data()
 
 
 
-def vcd_to_signals(vcd_path, signals='', module_path=''):
+def vcd_to_signals(vcd_path, signals='', module_path='', four_state=False):
     """Load a vcd file times and values into Signals
 
     Args:
@@ -46,11 +56,15 @@ def vcd_to_signals(vcd_path, signals='', module_path=''):
                        {'data': Signal(this will be 'dut.Top/uMux/data[31:0]'),
                         'en':   Signal(this will be 'dut.Top/uMux/en'),
                         'dv':   Signal(this will be 'dut.Top/uMux/dv')}
+        four_state: Store the values of bit and vector signals as FourState
+                    instead of strings, which keeps X and Z and takes less
+                    memory for wide buses. Real, string and event signals
+                    keep their string values.
     """
 
-    from hdlcomposer.signals import Signal
+    from hdlcomposer.signals import (Signal, FourState, four_state_columns, FOUR_STATE_VAR_TYPES)
 
-    vcd = VCDVCD(vcd_path)
+    vcd = load_vcd(vcd_path)
     signals_in_vcd = vcd.get_signals()
     data = vcd.get_data()
 
@@ -72,14 +86,22 @@ def vcd_to_signals(vcd_path, signals='', module_path=''):
                     vcd_signal_name,
                     signal_name,
                     module_path[signal_name],
-                    (size > 1)
+                    # Reals and integers have a size but no bit range
+                    (size > 1 and vcd_signal_name.endswith(']'))
                 )
                 if matches:
                     module_path.pop(signal_name)
                     result_signals[found_signal_name] = Signal(signal_type=data[identifier]['var_type'],
                                                                signal_width=int(data[identifier]['size']),
                                                                signal_path=vcd_signal_name)
-                    result_signals[found_signal_name].waveform = [list(tv) for tv in data[identifier]['tv']]
+                    if four_state and data[identifier]['var_type'] in FOUR_STATE_VAR_TYPES:
+                        times, values, masks = four_state_columns(data[identifier]['tv'], size)
+                        result_signals[found_signal_name].waveform = [
+                            [time, FourState(value, mask, size)]
+                            for time, value, mask in zip(times, values, masks)
+                        ]
+                    else:
+                        result_signals[found_signal_name].waveform = [list(tv) for tv in data[identifier]['tv']]
                     break
 
     return result_signals
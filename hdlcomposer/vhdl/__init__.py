@@ -1,2 +1,3 @@
 from hdlcomposer.vhdl.utils import *
 from hdlcomposer.vhdl.units import *
+from hdlcomposer.vhdl.index import *
@@ -0,0 +1,227 @@
+from re                     import (compile, escape, IGNORECASE)
+from bisect                 import (bisect_left)
+
+from hdlcomposer.vhdl.units import (Entity, Instance, Port)
+
+
+
+PATH_SEPARATOR = '/'
+GLOB_CHARACTERS = ('*', '?', '[')
+
+
+
+def glob_to_regex(pattern):
+    """Translate a path glob into a regular expression
+
+    '*' and '?' do not cross the path separator, '**' does.
+    """
+
+    expression = ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**', i):
+            expression += '.*'
+            i += 2
+            continue
+        elif char == '*':
+            expression += '[^' + PATH_SEPARATOR + ']*'
+        elif char == '?':
+            expression += '[^' + PATH_SEPARATOR + ']'
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end < 0:
+                expression += escape(char)
+            else:
+                expression += '[' + pattern[i + 1:end].replace('!', '^', 1) + ']'
+                i = end
+        else:
+            expression += escape(char)
+        i += 1
+    return expression
+
+
+
+def normalize_path(path):
+    return path.strip(PATH_SEPARATOR).lower()
+
+
+
+###############################################################################
+# Hierarchy index
+###############################################################################
+
+class HierarchyIndex():
+    """Index of a parsed hierarchy
+
+    Built once from the Top representation returned by parse_run, it answers
+    queries without walking the tree again.
+
+    Paths start with the top entity name and contain the names of the
+    instances, generates, processes, ports and signals below it, for example
+    'tb/u_core/u_alu/result'. The entity level below an instance is not part
+    of the path. Like VHDL names, paths are case insensitive.
+
+    Args:
+        top: Top representation of the design.
+    """
+
+    def __init__(self, top):
+        self.top = top
+        self.units = {}
+        self.unit_paths = {}
+        self.by_type = {}
+        self.by_entity = {}
+        self.by_direction = {}
+        self.build()
+
+
+
+    def __repr__(self):
+        return 'HierarchyIndex - ' + str(len(self.units)) + ' units'
+
+
+
+    def __len__(self):
+        return len(self.units)
+
+
+
+    def __contains__(self, path):
+        return normalize_path(path) in self.units
+
+
+
+    def __getitem__(self, path):
+        return self.units[normalize_path(path)]
+
+
+
+    def build(self):
+        pending = [(self.top.entity, self.top.entity.name.lower())]
+        while pending:
+            unit, path = pending.pop()
+            self.add(unit, path)
+
+            if isinstance(unit, Instance) and isinstance(unit.entity, Entity):
+                # The entity of an instance shares its path
+                entity = unit.entity
+                self.by_entity.setdefault(entity.name.lower(), []).append(unit)
+                self.unit_paths[entity] = path
+            else:
+                entity = unit
+            for attribute in entity.child_lists:
+                for child in reversed(getattr(entity, attribute)):
+                    pending.append((child, path + PATH_SEPARATOR + child.name.lower()))
+            if entity is not unit:
+                for child in reversed(unit.ports):
+                    pending.append((child, path + PATH_SEPARATOR + child.name.lower()))
+
+        self.sorted_paths = sorted(self.units)
+
+
+
+    def add(self, unit, path):
+        self.units[path] = unit
+        self.unit_paths[unit] = path
+        self.by_type.setdefault(unit.type, []).append(unit)
+        if isinstance(unit, Port):
+            self.by_direction.setdefault(unit.direction, []).append(unit)
+
+
+
+    def path(self, unit):
+        """Path of a unit of the hierarchy
+        """
+
+        return self.unit_paths[unit]
+
+
+
+    def find(self, path):
+        """Unit at the given path, None if it does not exist
+        """
+
+        return self.units.get(normalize_path(path))
+
+
+
+    def of_type(self, unit_type):
+        """All the units of a type, for example 'Instance' or Signal
+        """
+
+        if not isinstance(unit_type, str):
+            unit_type = unit_type.__name__
+        return list(self.by_type.get(unit_type, []))
+
+
+
+    def instances_of(self, entity_name):
+        """All the instances of an entity
+        """
+
+        return list(self.by_entity.get(entity_name.lower(), []))
+
+
+
+    def ports(self, direction=None):
+        """All the ports, or only the ones with the given direction (in, out, inout...)
+        """
+
+        if direction is None:
+            return self.of_type(Port)
+        return list(self.by_direction.get(direction.lower(), []))
+
+
+
+    def filter_type(self, paths, unit_type):
+        units = [self.units[path] for path in paths]
+        if unit_type is None:
+            return units
+        if not isinstance(unit_type, str):
+            unit_type = unit_type.__name__
+        return [unit for unit in units if unit.type == unit_type]
+
+
+
+    def prefixed(self, prefix):
+        """Paths that start with prefix, in alphabetical order
+        """
+
+        start = bisect_left(self.sorted_paths, prefix)
+        paths = []
+        for path in self.sorted_paths[start:]:
+            if not path.startswith(prefix):
+                break
+            paths.append(path)
+        return paths
+
+
+
+    def glob(self, pattern, unit_type=None):
+        """Units whose path matches a glob pattern like 'tb/u_core/*/clk'
+
+        Only the paths that share the literal beginning of the pattern are
+        checked. A pattern without wildcards is a direct lookup.
+        """
+
+        pattern = normalize_path(pattern)
+        wildcards = [pattern.find(char) for char in GLOB_CHARACTERS if char in pattern]
+        if not wildcards:
+            unit = self.units.get(pattern)
+            return self.filter_type([pattern] if unit else [], unit_type)
+
+        re_pattern = compile(glob_to_regex(pattern))
+        candidates = self.prefixed(pattern[:min(wildcards)])
+        return self.filter_type([path for path in candidates if re_pattern.fullmatch(path)],
+                                unit_type)
+
+
+
+    def regex(self, expression, unit_type=None):
+        """Units whose path contains a match of the regular expression
+        """
+
+        re_expression = compile(expression, IGNORECASE)
+        return self.filter_type([path for path in self.sorted_paths if re_expression.search(path)],
+                                unit_type)
@@ -1,5 +1,13 @@
+from gzip import (open as gzip_open)
+from json import (dump, load)
+
+
+
 TAB = 2
 GENERATE_STATEMENTS = ['if-generate', 'for-generate']
+CHILD_MAP_THRESHOLD = 8
+# Child lists of units without children, replaced by a list on the first child
+NO_CHILDREN = ()
 
 
 
@@ -9,12 +17,83 @@ GENERATE_STATEMENTS = ['if-generate', 'for-generate']
 
 class Unit():
     """ Base unit with common properties
+
+    Units use __slots__ to keep large hierarchies compact. Children are still
+    reachable as attributes (parent.child_name). Units with a few children
+    find them in their child lists, a name map is only created once they
+    have CHILD_MAP_THRESHOLD children. Empty child lists are the shared
+    NO_CHILDREN tuple, a list is only created for the first child, since
+    most entities only use one or two of their five lists. If a child name
+    clashes with an attribute of the unit (for example a port called
+    'name'), use child().
     """
 
+    __slots__ = ('name', 'parent', 'indentation', 'named_children', 'child_count')
+
+    # Attributes that contain lists of child units
+    child_lists = ()
+
     def __init__(self, name, parent, indentation):
         self.name = name
         self.parent = parent
         self.indentation = indentation
+        self.named_children = None
+        self.child_count = 0
+
+
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or attr == 'named_children':
+            raise AttributeError(attr)
+        found = self.child(attr)
+        if found is None:
+            raise AttributeError('\'' + self.type + '\' object has no attribute or child \'' + attr + '\'')
+        return found
+
+
+
+    def iter_children(self):
+        """All the child units: the ones in the child lists and the entity of an instance
+        """
+
+        for attribute in self.child_lists:
+            yield from getattr(self, attribute)
+
+
+
+    def add_child(self, name, unit, child_list=None):
+        """Add a child to one of the child_lists and make it reachable by name
+
+        Without child_list the child is only named, as the entity of an
+        instance.
+        """
+
+        if self.named_children is None:
+            self.child_count += 1
+            if self.child_count >= CHILD_MAP_THRESHOLD:
+                self.named_children = {child.name: child for child in self.iter_children()}
+        if self.named_children is not None:
+            self.named_children[name] = unit
+        if child_list:
+            children = getattr(self, child_list)
+            if children is NO_CHILDREN:
+                children = []
+                setattr(self, child_list, children)
+            children.append(unit)
+
+
+
+    def child(self, name):
+        """Get a child by name, None if not found
+        """
+
+        if self.named_children is not None:
+            return self.named_children.get(name)
+        found = None
+        for child in self.iter_children():
+            if child.name == name:
+                found = child
+        return found
 
 
 
@@ -58,21 +137,23 @@ class Generate(Unit):
     """ if-generate or for-generate statements
     """
 
+    __slots__ = ('value', 'generates', 'instances', 'processes')
+    child_lists = ('processes', 'generates', 'instances')
+
     def __init__(self, name, parent, indentation, value, generates=None,
                  instances=None, processes=None):
         super().__init__(name, parent, indentation)
         self.value = value
-        self.generates = generates or []
-        self.instances = instances or []
-        self.processes = processes or []
-        setattr(parent, name, self)
-        parent.generates.append(self)
+        self.generates = generates or NO_CHILDREN
+        self.instances = instances or NO_CHILDREN
+        self.processes = processes or NO_CHILDREN
+        parent.add_child(name, self, 'generates')
 
 
 
     @property
     def children(self):
-        return self.generates + self.instances
+        return [*self.generates, *self.instances]
 
 
 
@@ -80,23 +161,26 @@ class Entity(Unit):
     """ VHDL entity
     """
 
+    __slots__ = ('arch', 'generates', 'instances', 'ports', 'signals', 'processes')
+    child_lists = ('ports', 'signals', 'processes', 'generates', 'instances')
+
     def __init__(self, name, parent, indentation, arch='', generates=None,
                  instances=None, ports=None, signals=None, processes=None):
         super().__init__(name, parent, indentation)
         self.arch = arch
-        self.generates = generates or []
-        self.instances = instances or []
-        self.ports = ports or []
-        self.signals = signals or []
-        self.processes = processes or []
-        setattr(parent, name, self)
+        self.generates = generates or NO_CHILDREN
+        self.instances = instances or NO_CHILDREN
+        self.ports = ports or NO_CHILDREN
+        self.signals = signals or NO_CHILDREN
+        self.processes = processes or NO_CHILDREN
+        parent.add_child(name, self)
         parent.entity = self
 
 
 
     @property
     def children(self):
-        return self.generates + self.instances
+        return [*self.generates, *self.instances]
 
 
 
@@ -104,19 +188,28 @@ class Instance(Unit):
     """ Instance of a VHDL entity
     """
 
+    __slots__ = ('entity', 'ports')
+    child_lists = ('ports',)
+
     def __init__(self, name, indentation, parent=None, entity=None, ports=None):
         super().__init__(name, parent, indentation)
-        self.entity = entity or {}
-        self.ports = ports or []
+        self.entity = entity
+        self.ports = ports or NO_CHILDREN
         if parent:
-            setattr(parent, name, self)
-            parent.instances.append(self)
+            parent.add_child(name, self, 'instances')
 
 
 
     @property
     def children(self):
-        return [self.entity]
+        return [self.entity] if self.entity else []
+
+
+
+    def iter_children(self):
+        yield from super().iter_children()
+        if self.entity:
+            yield self.entity
 
 
 
@@ -124,11 +217,12 @@ class Process(Unit):
     """ VHDL process
     """
 
+    __slots__ = ()
+
     def __init__(self, name, indentation, parent=None):
         super().__init__(name, parent, indentation)
         if parent:
-            setattr(parent, name, self)
-            parent.processes.append(self)
+            parent.add_child(name, self, 'processes')
 
 
 
@@ -136,12 +230,13 @@ class Port(Unit):
     """ VHDL port
     """
 
+    __slots__ = ('direction',)
+
     def __init__(self, name, indentation, direction, parent=None):
         self.direction = direction
         super().__init__(name, parent, indentation)
         if parent:
-            setattr(parent, name, self)
-            parent.ports.append(self)
+            parent.add_child(name, self, 'ports')
 
 
 
@@ -149,11 +244,12 @@ class Signal(Unit):
     """ VHDL signal
     """
 
+    __slots__ = ()
+
     def __init__(self, name, indentation, parent=None):
         super().__init__(name, parent, indentation)
         if parent:
-            setattr(parent, name, self)
-            parent.signals.append(self)
+            parent.add_child(name, self, 'signals')
 
 
 
@@ -161,6 +257,108 @@ class Top(Instance):
     """ Top entity
     """
 
+    __slots__ = ('packages',)
+
     def __init__(self, name, packages=None):
         super().__init__(name, parent=None, indentation=-TAB)
         self.packages = packages or []
+
+
+
+
+###############################################################################
+# Serialization
+###############################################################################
+
+def hierarchy_to_records(top):
+    """Flatten a Top hierarchy into a list of records
+
+    Each record is [type, name, parent index, indentation, extra], where extra
+    is the architecture of an Entity, the value of a Generate or the direction
+    of a Port. Parents always come before their children.
+    """
+
+    records = []
+    pending = [(top.entity, -1)]
+    while pending:
+        unit, parent_index = pending.pop()
+        if isinstance(unit, Entity):
+            extra = unit.arch
+        elif isinstance(unit, Generate):
+            extra = unit.value
+        elif isinstance(unit, Port):
+            extra = unit.direction
+        else:
+            extra = None
+        records.append([unit.type, unit.name, parent_index, unit.indentation, extra])
+
+        unit_index = len(records) - 1
+        children = []
+        for attribute in unit.child_lists:
+            children += getattr(unit, attribute)
+        if isinstance(unit, Instance) and isinstance(unit.entity, Entity):
+            children.append(unit.entity)
+        pending += [(child, unit_index) for child in reversed(children)]
+    return {
+        'name': top.name,
+        'packages': top.packages,
+        'records': records,
+    }
+
+
+
+def hierarchy_from_records(hierarchy):
+    """Rebuild a Top hierarchy from the output of hierarchy_to_records
+    """
+
+    top = Top(name=hierarchy['name'], packages=list(hierarchy['packages']))
+    units = []
+    for unit_type, name, parent_index, indentation, extra in hierarchy['records']:
+        parent = units[parent_index] if parent_index >= 0 else top
+        if unit_type == 'Entity':
+            unit = Entity(name=name, parent=parent, indentation=indentation, arch=extra)
+        elif unit_type == 'Instance':
+            unit = Instance(name=name, parent=parent, indentation=indentation)
+        elif unit_type == 'Generate':
+            unit = Generate(name=name, parent=parent, indentation=indentation, value=extra)
+        elif unit_type == 'Process':
+            unit = Process(name=name, parent=parent, indentation=indentation)
+        elif unit_type == 'Port':
+            unit = Port(name=name, parent=parent, indentation=indentation, direction=extra)
+        elif unit_type == 'Signal':
+            unit = Signal(name=name, parent=parent, indentation=indentation)
+        else:
+            raise ValueError('Error invalid unit type: ' + unit_type)
+        units.append(unit)
+    return top
+
+
+
+def save_hierarchy(top, file_path, key=None):
+    """Save a Top hierarchy to a compressed file
+
+    The key (for example, a hash of the elaborated design) is stored with it,
+    so that load_hierarchy can tell if the file is still valid.
+    """
+
+    with gzip_open(file_path, 'wt', encoding='utf-8') as f:
+        dump({'key': key, 'hierarchy': hierarchy_to_records(top)}, f, separators=(',', ':'))
+
+
+
+def load_hierarchy(file_path, key=None):
+    """Load a Top hierarchy saved by save_hierarchy
+
+    Returns:
+        The Top representation, or None if the file does not exist or was
+        saved with a different key.
+    """
+
+    try:
+        with gzip_open(file_path, 'rt', encoding='utf-8') as f:
+            saved = load(f)
+    except (OSError, EOFError, ValueError):
+        return None
+    if saved.get('key') != key:
+        return None
+    return hierarchy_from_records(saved['hierarchy'])
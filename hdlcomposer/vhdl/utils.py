@@ -1,10 +1,18 @@
-from os                import (getcwd)
-from os.path           import (join)
+from os                import (getcwd, remove, replace)
+from os.path           import (join, abspath, exists)
+from operator          import (and_)
+from itertools         import (repeat)
 
-from hdlcomposer.utils import (int_tobin, data_to_pkg_cfg)
+from hdlcomposer.utils import (int_tobin, data_to_pkg_cfg, package_hash,
+                               read_package_hash, write_package_hash)
 
 
-def generate_package(pkg_cfg, package_name, output_directory=None, indentation=2):
+WRITE_BUFFER_SIZE = 1024 * 1024
+WRITE_CHUNK_ELEMENTS = 64 * 1024
+
+
+
+def generate_package(pkg_cfg, package_name, output_directory=None, indentation=2, force=False):
     """Generate a VHDL package with the provided constants
 
     Data can be provided as integer, as a binary representation string, or even as
@@ -51,121 +59,402 @@ def generate_package(pkg_cfg, package_name, output_directory=None, indentation=2
 
         package_name (str): Package name.
         output_directory (str): Output path.
+        force (bool): Write the package even if its content did not change.
+            Otherwise an unchanged package is not rewritten, so its modification
+            time does not trigger a new analysis.
 
     Returns:
-        bool: The return value. True for error, False otherwise.
+        str: Content hash of the package (see package_hash).
     """
 
     file_path = join((output_directory or getcwd()), package_name + '.vhd')
 
-    package_text = []
-    package_text.append('')
+    content_hash = package_hash(pkg_cfg, 'vhdl', package_name, indentation)
+    write_generated(file_path, content_hash,
+                    lambda f: write_package(f, pkg_cfg, package_name, indentation), force)
+    return content_hash
 
-    package_text.append('library   ieee;')
-    package_text.append('use       ieee.std_logic_1164.all;')
-    package_text.append('use       ieee.numeric_std.all;')
-    package_text.append('')
 
-    package_text.append('package ' + package_name + ' is')
-    package_text.append('')
 
+def write_generated(file_path, content_hash, write, force=False):
+    """Write a generated file unless it already has this content hash
+
+    write(f) writes the content to an open file. It is written to a temporary
+    file first, so an error leaves the previous file untouched. The hash is
+    saved next to the file, see write_package_hash.
+
+    Returns:
+        bool: The file was written.
+    """
+
+    if not force and exists(file_path) and read_package_hash(file_path) == content_hash:
+        return False
+
+    temp_file_path = file_path + '.tmp'
+    try:
+        with open(temp_file_path, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+            write(f)
+    except Exception:
+        remove(temp_file_path)
+        raise
+    replace(temp_file_path, file_path)
+    write_package_hash(file_path, content_hash)
+    return True
+
+
+
+def vhdl_literal_formatter(data_type, data_w):
+    """Function that formats a value of the given type as a VHDL literal
+    """
+
+    if data_type in 'boolean':
+        return lambda data_i: 'true' if (data_i and (isinstance(data_i, str) \
+                                         and data_i.lower() not in ('false', '0'))) \
+                                     else 'false'
+    elif data_type in 'std_logic':
+        return lambda data_i: '\'1\'' if data_i else '\'0\''
+    elif data_type in 'integer':
+        return str
+    elif data_type in ('signed', 'unsigned', 'std_logic_vector'):
+        def vector_literal(data_i):
+            if isinstance(data_i, str):
+                if len(data_i) > data_w:
+                    raise ValueError('Data width is larger that the provided width parameter.')
+                fill_char = (data_i[0] if data_type == 'signed' else '0')
+                return '"' + (data_w - len(data_i)) * fill_char + data_i + '"'
+            elif isinstance(data_i, int):
+                return '"' + int_tobin(data_i, data_w) + '"'
+            elif isinstance(data_i, float) and data_i.is_integer():
+                return '"' + int_tobin(int(data_i), data_w) + '"'
+            else:
+                raise ValueError('Data type must be binary representation string or int.')
+        return vector_literal
+    else:
+        raise ValueError('Type ' +  data_type + ' is not supported yet.')
+
+
+
+def vhdl_literals(data, data_type, data_w, separator=', '):
+    """Format a list of values as VHDL literals joined by separator
+
+    Integers and vectors given as integers are formatted with a single
+    str.format() call for the whole list. Integer floats, like the
+    ones of NumPy time columns, are written as integers. Binary strings and
+    booleans are formatted one by one with vhdl_literal_formatter.
+    """
+
+    if not data:
+        return ''
+    if data_type == 'integer':
+        template = separator.join(['{:d}'] * len(data))
+        try:
+            return template.format(*data)
+        except ValueError:
+            # Floats or decimal strings
+            return template.format(*map(int, data))
+    if data_type in ('signed', 'unsigned', 'std_logic_vector') and data_w and data_w > 0:
+        template = separator.join(['"{:0' + str(data_w) + 'b}"'] * len(data))
+        try:
+            return template.format(*map(and_, data, repeat((1 << data_w) - 1)))
+        except TypeError:
+            pass
+    return separator.join(map(vhdl_literal_formatter(data_type, data_w), data))
+
+
+
+def write_package(f, pkg_cfg, package_name, indentation=2):
+    """Write a VHDL package to an open file, see generate_package
+
+    Arrays are formatted and written in chunks of WRITE_CHUNK_ELEMENTS, so the
+    whole package text is never built in memory.
+    """
+
+    f.write('\n')
+    f.write('library   ieee;\n')
+    f.write('use       ieee.std_logic_1164.all;\n')
+    f.write('use       ieee.numeric_std.all;\n')
+    f.write('\n')
+    f.write('package ' + package_name + ' is\n')
+    f.write('\n')
+
+    indent = ' ' * 1 * indentation
+    element_separator = ',\n' + ' ' * 2 * indentation
 
     for constant_name in pkg_cfg.keys():
         data_w = pkg_cfg[constant_name]['width'] if ('width' in pkg_cfg[constant_name].keys()) else None
         data_type = pkg_cfg[constant_name]['type']
+        data = pkg_cfg[constant_name]['data']
 
-        package_text.append(' ' * 1 * indentation)
+        is_array = isinstance(data, list)
+        if not is_array:
+            data = [data]
+        array_len = len(data)
 
-        if isinstance(pkg_cfg[constant_name]['data'], list):
-            is_array = True
+        if data_type in ('boolean', 'std_logic', 'integer'):
+            element_type = data_type
         else:
-            is_array = False
-            pkg_cfg[constant_name]['data'] = [pkg_cfg[constant_name]['data']]
-        array_len = len(pkg_cfg[constant_name]['data'])
+            element_type = data_type + '(' + str(data_w) + ' - 1 downto 0)'
 
+        f.write(indent)
+        if is_array:
+            f.write('type T_' + constant_name.upper() + ' is array(0 to ' +
+                    str(array_len) + ' - 1) of ' + element_type + ';\n' + indent)
+            f.write('constant ' + constant_name.upper() + ' : T_' + constant_name.upper() + ' := (')
+            if array_len == 1:
+                f.write(' 0 => ')
+        else:
+            f.write('constant ' + constant_name.upper() + ' : ' + element_type + ' := ')
 
         if is_array:
-            package_text[-1] += 'type T_' + constant_name.upper() + ' is array(0 to '
-            package_text[-1] += str(array_len) + ' - 1) of '
+            for chunk_start in range(0, array_len, WRITE_CHUNK_ELEMENTS):
+                chunk = data[chunk_start:chunk_start + WRITE_CHUNK_ELEMENTS]
+                if chunk_start:
+                    f.write(',')
+                f.write(element_separator[1:])
+                f.write(vhdl_literals(chunk, data_type, data_w, element_separator))
+            f.write('\n' + indent + ')')
+        else:
+            f.write(vhdl_literals(data, data_type, data_w))
+        f.write(';\n\n')
 
-            if data_type in ('boolean', 'std_logic', 'integer'):
-                package_text[-1] += data_type + ';'
-            else:
-                package_text[-1] += data_type + '(' + str(data_w)
-                package_text[-1] += ' - 1 downto 0);'
+    f.write('end ' + package_name + ';\n')
 
-            package_text.append(' ' * 1 * indentation)
 
 
-        package_text[-1] += 'constant ' + constant_name.upper() + ' : '
-        if is_array:
-            package_text[-1] += 'T_' + constant_name.upper()
+def data_to_package(signals, package_name, output_dir=None, force=False):
+        """Generate a VHDL package from a group of signals
+
+        Returns the content hash of the package, see generate_package.
+        """
+
+        return generate_package(data_to_pkg_cfg(signals), package_name, output_dir, force=force)
+
+
+
+STIMULUS_READER_PACKAGE = """
+library   ieee;
+use       ieee.std_logic_1164.all;
+use       ieee.numeric_std.all;
+use       std.textio.all;
+
+package {package_name} is
+
+  function to_std_logic(c : character) return std_logic;
+
+  procedure read_stimulus(file f : text; value : out integer);
+  procedure read_stimulus(file f : text; value : out boolean);
+  procedure read_stimulus(file f : text; value : out std_logic);
+  procedure read_stimulus(file f : text; value : out std_logic_vector);
+  procedure read_stimulus(file f : text; value : out signed);
+  procedure read_stimulus(file f : text; value : out unsigned);
+
+end {package_name};
+
+package body {package_name} is
+
+  function to_std_logic(c : character) return std_logic is
+  begin
+    case c is
+      when '0'       => return '0';
+      when '1'       => return '1';
+      when 'Z' | 'z' => return 'Z';
+      when 'U' | 'u' => return 'U';
+      when 'W' | 'w' => return 'W';
+      when 'L' | 'l' => return 'L';
+      when 'H' | 'h' => return 'H';
+      when '-'       => return '-';
+      when others    => return 'X';
+    end case;
+  end function;
+
+  procedure read_stimulus(file f : text; value : out integer) is
+    variable l : line;
+  begin
+    readline(f, l);
+    read(l, value);
+    deallocate(l);
+  end procedure;
+
+  procedure read_stimulus(file f : text; value : out boolean) is
+    variable l : line;
+  begin
+    readline(f, l);
+    read(l, value);
+    deallocate(l);
+  end procedure;
+
+  procedure read_stimulus(file f : text; value : out std_logic) is
+    variable l : line;
+    variable c : character;
+  begin
+    readline(f, l);
+    read(l, c);
+    value := to_std_logic(c);
+    deallocate(l);
+  end procedure;
+
+  procedure read_stimulus(file f : text; value : out std_logic_vector) is
+    variable l : line;
+    variable c : character;
+    variable v : std_logic_vector(value'length - 1 downto 0);
+  begin
+    readline(f, l);
+    for i in v'range loop
+      read(l, c);
+      v(i) := to_std_logic(c);
+    end loop;
+    value := v;
+    deallocate(l);
+  end procedure;
+
+  procedure read_stimulus(file f : text; value : out signed) is
+    variable v : std_logic_vector(value'length - 1 downto 0);
+  begin
+    read_stimulus(f, v);
+    value := signed(v);
+  end procedure;
+
+  procedure read_stimulus(file f : text; value : out unsigned) is
+    variable v : std_logic_vector(value'length - 1 downto 0);
+  begin
+    read_stimulus(f, v);
+    value := unsigned(v);
+  end procedure;
+
+end {package_name};
+"""
+
+
+
+def stimulus_value(data_i, data_type, data_w=None):
+    """Format a single value as a line of a stimulus file
+
+    Booleans are written as true / false, std_logic as a single character,
+    integers in decimal and vectors as binary strings extended to data_w.
+    """
+
+    if data_type == 'boolean':
+        if isinstance(data_i, str):
+            return 'false' if data_i.lower() in ('false', '0') else 'true'
+        return 'true' if data_i else 'false'
+    elif data_type == 'std_logic':
+        if isinstance(data_i, str):
+            return '0' if data_i.lower() in ('false', '0') else '1'
+        return '1' if data_i else '0'
+    elif data_type == 'integer':
+        return str(int(data_i))
+    elif data_type in ('signed', 'unsigned', 'std_logic_vector'):
+        if isinstance(data_i, str):
+            if len(data_i) > data_w:
+                raise ValueError('Data width is larger that the provided width parameter.')
+            fill_char = (data_i[0] if data_type == 'signed' else '0')
+            return (data_w - len(data_i)) * fill_char + data_i
+        elif isinstance(data_i, int):
+            return int_tobin(data_i, data_w)
         else:
-            if data_type in ('boolean', 'std_logic', 'integer'):
-                package_text[-1] += data_type
-            else:
-                package_text[-1] += data_type + '(' + str(data_w)
-                package_text[-1] += ' - 1 downto 0)'
-        package_text[-1] += ' := '
+            raise ValueError('Data type must be binary representation string or int.')
+    else:
+        raise ValueError('Type ' +  data_type + ' is not supported yet.')
 
 
-        if is_array:
-            package_text[-1] += '('
-            if array_len == 1:
-                package_text[-1] += ' 0 => '
-
-
-        for i in range(array_len):
-            data_i = pkg_cfg[constant_name]['data'][i]
-
-            if is_array:
-                package_text.append(' ' * 2 * indentation)
-
-            if data_type in 'boolean':
-                boolean_value = 'true' if (data_i and (isinstance(data_i, str) \
-                                       and data_i.lower() not in ('false', '0'))) \
-                                       else 'false'
-                package_text[-1] += boolean_value
-            elif data_type in 'std_logic':
-                package_text[-1] += '\'1\'' if data_i else '\'0\''
-            elif data_type in 'integer':
-                package_text[-1] += str(data_i)
-            elif data_type in ('signed', 'unsigned', 'std_logic_vector'):
-                package_text[-1] += '"'
-                if isinstance(data_i, str):
-                    if len(data_i) > data_w:
-                        raise ValueError('Data width is larger that the provided width parameter.')
-                    fill_char = (data_i[0] if data_type == 'signed' else '0')
-                    package_text[-1] += (data_w - len(data_i)) * fill_char + data_i
-                if isinstance(data_i, int):
-                    package_text[-1] += int_tobin(data_i, data_w)
-                else:
-                    raise ValueError('Data type must be binary representation string or int.')
-                package_text[-1] += '"'
-            else:
-                raise ValueError('Type ' +  data_type + ' is not supported yet.')
 
-            if not i == array_len - 1:
-                package_text[-1] += ','
+def generate_stimulus_reader(output_directory=None, package_name='HDLComposerStimulus',
+                             force=False):
+    """Generate the reusable textio-based VHDL package that reads stimulus files
 
-        if is_array:
-            package_text.append('')
-            package_text[-1] += ' ' * 1 * indentation + ')'
-        package_text[-1] += ';'
-        package_text.append('')
+    The package provides read_stimulus() overloads for every supported type,
+    each one consumes a line of a file created by generate_stimulus().
+    It only has to be analyzed once, regardless of the stimulus size, and it
+    is not rewritten while its content does not change (see generate_package).
+    """
 
+    file_path = join((output_directory or getcwd()), package_name + '.vhd')
+    package_text = STIMULUS_READER_PACKAGE.format(package_name=package_name)
+    write_generated(file_path, package_hash(package_text, 'vhdl-stimulus-reader'),
+                    lambda f: f.write(package_text), force)
+    return file_path
+
+
+
+def generate_stimulus(pkg_cfg, package_name, output_directory=None, indentation=2,
+                      reader_package='HDLComposerStimulus', force=False):
+    """Write the provided constants to stimulus files read during simulation
+
+    Instead of baking the data into constant arrays (see generate_package), each
+    constant is written to a text file with one value per line. A small package
+    contains only the path and length of each file, so the VHDL that has to be
+    analyzed does not grow with the stimulus length.
+
+    Each stimulus file and package is only written when its content changes,
+    as in generate_package, so unchanged constants are not written again and
+    an unchanged package does not trigger a new analysis.
+
+    Usage in the testbench:
+
+        use work.HDLComposerStimulus.all;
+        use work.<package_name>.all;
+        ...
+        file f_data : text open read_mode is DATA_V_FILE;
+        ...
+        read_stimulus(f_data, data_value);
+
+    Args:
+        pkg_cfg (dict): Same format as in generate_package.
+        package_name (str): Package name. Files are named <package_name>_<constant>.txt
+        output_directory (str): Output path.
+        reader_package (str): Also generate the reader package with this name.
+            Set to None to skip it.
+        force (bool): Write all the files even if their content did not change.
+
+    Returns:
+        list: Paths of the generated files.
+    """
+
+    output_directory = abspath(output_directory or getcwd())
+    generated_files = []
+
+    package_text = []
+    package_text.append('')
+    package_text.append('package ' + package_name + ' is')
+    package_text.append('')
+
+    for constant_name in pkg_cfg.keys():
+        data_w = pkg_cfg[constant_name]['width'] if ('width' in pkg_cfg[constant_name].keys()) else None
+        data_type = pkg_cfg[constant_name]['type']
+        data = pkg_cfg[constant_name]['data']
+        if not isinstance(data, list):
+            data = [data]
+
+        stimulus_path = join(output_directory, package_name + '_' + constant_name + '.txt')
+        write_generated(stimulus_path, package_hash(data, 'vhdl-stimulus', data_type, data_w),
+                        lambda f: f.writelines(stimulus_value(data_i, data_type, data_w) + '\n'
+                                               for data_i in data), force)
+        generated_files.append(stimulus_path)
+
+        package_text.append(' ' * indentation + 'constant ' + constant_name.upper() +
+                            '_FILE : string := "' + stimulus_path + '";')
+        package_text.append(' ' * indentation + 'constant ' + constant_name.upper() +
+                            '_LEN : natural := ' + str(len(data)) + ';')
+        package_text.append('')
 
     package_text.append('end ' + package_name + ';')
 
+    package_path = join(output_directory, package_name + '.vhd')
+    package_text = '\n'.join(package_text) + '\n'
+    write_generated(package_path, package_hash(package_text, 'vhdl-stimulus-package'),
+                    lambda f: f.write(package_text), force)
+    generated_files.append(package_path)
 
-    with open(file_path, 'w+') as f:
-        for line in package_text:
-            f.write(line + '\n')
+    if reader_package:
+        generated_files.append(generate_stimulus_reader(output_directory, reader_package, force))
+    return generated_files
 
 
 
-def data_to_package(signals, package_name, output_dir=None):
-        """Generate a VHDL package from a group of signals
+def data_to_stimulus(signals, package_name, output_dir=None, force=False):
+        """Generate stimulus files and their VHDL package from a group of signals
+
+        Files whose content did not change are not rewritten, see generate_stimulus.
         """
 
-        generate_package(data_to_pkg_cfg(signals), package_name, output_dir)
+        return generate_stimulus(data_to_pkg_cfg(signals), package_name, output_dir, force=force)
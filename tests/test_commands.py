@@ -0,0 +1,69 @@
+from os.path                    import (exists, join)
+from sys                        import (executable)
+
+from hdlcomposer.utils.commands import (run_command, run_command_chains, TIMEOUT_ERROR,
+                                        NOT_FOUND_ERROR)
+
+
+
+def python(code):
+    return [executable, '-c', code]
+
+
+
+def test_timeout_kills_the_command():
+    result = run_command(python('import time\nprint("started", flush=True)\ntime.sleep(60)'),
+                         timeout=0.5)
+    assert result.timed_out and not result.aborted
+    assert result.error == TIMEOUT_ERROR
+    assert result.output == 'started\n'
+    assert result.wall_time < 30
+
+
+
+def test_handlers_receive_each_line():
+    stdout_lines = []
+    stderr_lines = []
+    code = 'import sys\nprint("a")\nprint("b\\r")\nsys.stderr.write("warning\\n")\nprint("c", end="")'
+    result = run_command(python(code), stdout_handler=stdout_lines.append,
+                         stderr_handler=stderr_lines.append)
+    assert (result.error, result.timed_out, result.aborted) == (0, False, False)
+    assert stdout_lines == ['a', 'b', 'c']
+    assert stderr_lines == ['warning']
+    assert result.output == 'a\nb\nc\n'
+    assert tuple(result) == (0, 'a\nb\nc\n')
+
+    result = run_command(python('print("a")'), keep_output=False)
+    assert result.output == ''
+
+
+
+def test_handler_returning_true_aborts():
+    lines = []
+    def stop_at_2(line):
+        lines.append(line)
+        return line == '2'
+    code = 'import itertools, time\nfor i in itertools.count():\n    print(i, flush=True)\n    time.sleep(0.01)'
+    result = run_command(python(code), timeout=30, stdout_handler=stop_at_2)
+    assert result.aborted and not result.timed_out
+    assert result.error != 0
+    assert lines == ['0', '1', '2']
+
+
+
+def test_command_not_found():
+    result = run_command(['hdlcomposer-missing-command'])
+    assert result.error == NOT_FOUND_ERROR
+
+
+
+def test_failing_chain_stops(tmp_path):
+    marker = join(str(tmp_path), 'marker')
+    write_marker = python('open(' + repr(marker) + ', "w").close()')
+    chains = [[python('print("one")'), python('raise SystemExit(3)'), write_marker],
+              [python('print("two")'), python('print("three")')]]
+    results = run_command_chains(chains, jobs=2)
+
+    assert [[result.error for result in chain] for chain in results] == [[0, 3], [0, 0]]
+    assert [result.output for result in results[1]] == ['two\n', 'three\n']
+    assert not exists(marker)
@@ -0,0 +1,46 @@
+from os.path                    import (join)
+
+from hdlcomposer.utils.config   import (ConfigStore)
+
+
+
+def test_deleted_key_stays_deleted(tmp_path):
+    file_path = join(str(tmp_path), 'config')
+    store = ConfigStore(file_path, {'files': {}})
+    store.load()
+    store.data['files']['a.vhd'] = ['a']
+    store.data['files']['b.vhd'] = ['b']
+    store.save()
+
+    del store.data['files']['a.vhd']
+    store.save()
+    assert 'a.vhd' not in store.data['files']
+    assert ConfigStore(file_path).load()['files'] == {'b.vhd': ['b']}
+
+
+
+def test_changes_of_other_writers_are_kept(tmp_path):
+    file_path = join(str(tmp_path), 'config')
+    first = ConfigStore(file_path, {'files': {}})
+    second = ConfigStore(file_path, {'files': {}})
+    first.load()
+    second.load()
+
+    first.data['files']['a.vhd'] = ['a']
+    first.save()
+    second.data['files']['b.vhd'] = ['b']
+    second.save()
+
+    assert ConfigStore(file_path).load()['files'] == {'a.vhd': ['a'], 'b.vhd': ['b']}
+
+
+
+def test_batch_writes_once(tmp_path):
+    file_path = join(str(tmp_path), 'config')
+    store = ConfigStore(file_path, {'files': {}})
+    store.load()
+    with store.batch():
+        store.data['files']['a.vhd'] = ['a']
+        store.save()
+        assert ConfigStore(file_path).load()['files'] == {}
+    assert ConfigStore(file_path).load()['files'] == {'a.vhd': ['a']}
@@ -0,0 +1,92 @@
+from os                         import (chmod, environ, pathsep, listdir, remove, makedirs)
+from os.path                    import (join, exists)
+from json                       import (load)
+
+import pytest
+
+from hdlcomposer.sim.ghdl.ghdl  import (generate_project_cross_references_html, XREF_STATE_FILE)
+
+
+
+# Writes one page per source and an index of the sources of the call, like ghdl --xref-html
+FAKE_GHDL = '''#!/bin/sh
+out=.
+files=""
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -o) out=$2; shift;;
+        -*) ;;
+        *) files="$files $1";;
+    esac
+    shift
+done
+: > "$out/index.html"
+for f in $files; do
+    name=$(basename "$f" .vhd)
+    echo "<html>$f</html>" > "$out/$name.html"
+    echo "$name" >> "$out/index.html"
+done
+echo "/* css */" > "$out/ghdl.css"
+'''
+
+
+
+@pytest.fixture
+def fake_ghdl(tmp_path, monkeypatch):
+    bin_path = join(str(tmp_path), 'bin')
+    ghdl_path = join(bin_path, 'ghdl')
+    makedirs(bin_path)
+    with open(ghdl_path, 'w') as script:
+        script.write(FAKE_GHDL)
+    chmod(ghdl_path, 0o755)
+    monkeypatch.setenv('PATH', bin_path + pathsep + environ['PATH'])
+
+
+
+def make_sources(directory, count):
+    paths = []
+    for i in range(count):
+        path = join(directory, 'unit' + str(i) + '.vhd')
+        with open(path, 'w') as source_file:
+            source_file.write('entity unit' + str(i) + ' is end;\n')
+        paths.append(path)
+    return paths
+
+
+
+def index_links(output_path):
+    with open(join(output_path, 'index.html')) as index_file:
+        return index_file.read().count('<li>')
+
+
+
+def test_index_lists_all_the_sources(tmp_path, fake_ghdl):
+    sources = make_sources(str(tmp_path), 120)
+    output_path = join(str(tmp_path), 'xref')
+
+    error, _, updated = generate_project_cross_references_html(sources, 'work', [], output_path, jobs=4)
+    assert error == 0 and len(updated) == 120
+    assert index_links(output_path) == 120
+    assert exists(join(output_path, 'ghdl.css'))
+    assert not [name for name in listdir(output_path) if name.startswith('.xref-')]
+
+    with open(sources[3], 'a') as source_file:
+        source_file.write('-- changed\n')
+    error, _, updated = generate_project_cross_references_html(sources, 'work', [], output_path, jobs=4)
+    assert error == 0 and updated == [sources[3]]
+    assert index_links(output_path) == 120
+
+
+
+def test_deleted_sources_are_pruned(tmp_path, fake_ghdl):
+    sources = make_sources(str(tmp_path), 3)
+    output_path = join(str(tmp_path), 'xref')
+    generate_project_cross_references_html(sources, 'work', [], output_path)
+
+    remove(sources[0])
+    error, _, updated = generate_project_cross_references_html(sources[1:], 'work', [], output_path)
+    assert error == 2 and updated == []
+    with open(join(output_path, XREF_STATE_FILE)) as state_file:
+        assert sorted(load(state_file)['files']) == sorted(sources[1:])
+    assert not exists(join(output_path, 'unit0.html'))
+    assert index_links(output_path) == 2
@@ -0,0 +1,20 @@
+from pytest                     import (raises)
+
+from hdlcomposer.signals        import (FourState)
+
+
+
+def test_bitwise_operations_with_ints():
+    value = FourState.from_str('1x0z')
+    assert str(value & 0b1110) == str(0b1110 & value) == '1x00'
+    assert str(value | 0b0001) == str(0b0001 | value) == '1x01'
+    assert str(value ^ 0b1111) == str(0b1111 ^ value) == '0x1x'
+    assert (FourState.from_str('1100') & 0xF) == 0b1100
+    with raises(TypeError):
+        value & '1010'
+
+
+
+def test_empty_string_is_rejected():
+    with raises(ValueError, match='at least one bit'):
+        FourState.from_str('')
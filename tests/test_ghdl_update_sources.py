@@ -0,0 +1,24 @@
+from os.path                    import (join)
+
+from hdlcomposer.sim.ghdl.ghdl  import (GHDL)
+
+
+
+def test_removed_source_is_forgotten_after_reload(tmp_path):
+    work_dir = join(str(tmp_path), 'work')
+    removed_path = join(str(tmp_path), 'removed.vhd')
+    kept_path = join(str(tmp_path), 'kept.vhd')
+
+    ghdl = GHDL(work_dir_path=work_dir, sources_directories=[str(tmp_path)])
+    ghdl.config['imported_files'].update({removed_path: ['removed_tb', 'removed_pkg'],
+                                          kept_path: ['kept']})
+    ghdl.config['imported_entities'].update({'removed_tb': removed_path, 'kept': kept_path})
+    ghdl.config['imported_packages'].update({'removed_pkg': removed_path})
+    ghdl.save_config_to_file()
+
+    ghdl.update_sources([removed_path])
+
+    config = GHDL(work_dir_path=work_dir, sources_directories=[str(tmp_path)]).config
+    assert config['imported_files'] == {kept_path: ['kept']}
+    assert config['imported_entities'] == {'kept': kept_path}
+    assert config['imported_packages'] == {}
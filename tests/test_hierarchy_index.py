@@ -0,0 +1,42 @@
+from os                         import (makedirs)
+from os.path                    import (join)
+
+from hdlcomposer.sim.ghdl       import ghdl as ghdl_module
+from hdlcomposer.sim.ghdl.ghdl  import (GHDL)
+
+
+
+DISP_TREE = ['tb [entity]', '  behav [arch]', '    clk [signal]', '    u_core [instance]',
+             '      core [entity]', '        rtl [arch]', '          data [port in]', '', '']
+
+
+
+def test_design_is_hashed_once_per_query(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    monkeypatch.chdir(root)
+    makedirs(join(root, 'work'))
+    with open(join(root, 'work', 'work-obj93.cf'), 'w') as library_file:
+        library_file.write('v 4\n')
+
+    hashes = []
+    elaborated_hash = ghdl_module.elaborated_hash
+    monkeypatch.setattr(ghdl_module, 'elaborated_hash',
+                        lambda *args: hashes.append(args) or elaborated_hash(*args))
+    runs = []
+    def fake_run_tb(entity, *args, stdout_handler=None, **kwargs):
+        runs.append(entity)
+        for line in DISP_TREE:
+            stdout_handler(line)
+    monkeypatch.setattr(ghdl_module, 'run_tb', fake_run_tb)
+
+    ghdl = GHDL(install_path=root, work_dir_path=join(root, 'work'),
+                compiled_libs_paths=[join(root, 'compiled')])
+    index = ghdl.hierarchy_index('tb')
+    assert index.top.entity.u_core.core.data.direction == 'in'
+    assert (len(hashes), runs) == (1, ['tb'])
+
+    # Cached in memory, then in the work dir
+    assert ghdl.hierarchy_index('tb') is index
+    ghdl.hierarchy_indexes.clear()
+    ghdl.hierarchy_index('tb')
+    assert (len(hashes), runs) == (3, ['tb'])
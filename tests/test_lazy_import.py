@@ -0,0 +1,43 @@
+from sys                        import (executable)
+from subprocess                 import (run, PIPE)
+from os.path                    import (dirname, abspath)
+
+
+
+REPO_PATH = dirname(dirname(abspath(__file__)))
+
+
+
+def loaded_modules(statement):
+    """Modules loaded by a statement in a fresh interpreter
+    """
+
+    result = run([executable, '-c', statement + '\nimport sys\nprint(" ".join(sys.modules))'],
+                 stdout=PIPE, universal_newlines=True, cwd=REPO_PATH, check=True)
+    return set(result.stdout.split())
+
+
+
+def test_import_hdlcomposer_is_lazy():
+    modules = loaded_modules('import hdlcomposer')
+    assert 'asyncio' not in modules
+    assert 'hdlcomposer.sim.ghdl.ghdl' not in modules
+    assert 'hdlcomposer.utils' not in modules
+
+
+
+def test_client_does_not_load_the_ghdl_wrapper():
+    modules = loaded_modules('import hdlcomposer.sim.ghdl.client')
+    assert 'hdlcomposer.sim.ghdl.ghdl' not in modules
+    assert 'asyncio' not in modules
+
+
+
+def test_star_imports_export_the_lazy_names():
+    namespace = {}
+    exec('from hdlcomposer.sim.ghdl import *', namespace)
+    assert 'GHDL' in namespace and 'parse_run' in namespace
+    exec('from hdlcomposer.utils import *', namespace)
+    assert 'ConfigStore' in namespace and 'run_command' in namespace and 'walk_files' in namespace
+    exec('from hdlcomposer import *', namespace)
+    assert all(name in namespace for name in ('utils', 'sim', 'signals', 'vhdl', 'vcd'))
@@ -0,0 +1,101 @@
+from io                         import (StringIO)
+from os                         import (makedirs)
+from os.path                    import (join)
+
+from hdlcomposer.sim.ghdl       import ghdl as ghdl_module
+from hdlcomposer.sim.ghdl.ghdl  import (GHDL)
+from hdlcomposer.sim.ghdl.parse import (LogAnalyzer, parse_log_line)
+from hdlcomposer.utils.commands import (CommandResult)
+
+
+
+def report(severity, time='10ns', message='message'):
+    return 'tb.vhd:12:5:@' + time + ':(report ' + severity + '): ' + message
+
+
+
+def test_parse_log_line():
+    message = parse_log_line('tb.vhd:12:5:@1.5us:(assertion error): data mismatch')
+    assert (message.file, message.line, message.column) == ('tb.vhd', 12, 5)
+    assert (message.time, message.time_fs) == ('1.5us', 1500000000)
+    assert (message.kind, message.severity, message.message) == ('assertion', 'error', 'data mismatch')
+    assert parse_log_line('simulation finished @100ns') is None
+
+
+
+def test_abort_on_first_message_at_severity():
+    echoed = []
+    log_analyzer = LogAnalyzer(abort_severity='error', echo=echoed.append)
+    assert log_analyzer.feed('starting') is False
+    assert log_analyzer.feed(report('note')) is False
+    assert log_analyzer.feed(report('warning')) is False
+    assert not log_analyzer.aborted
+
+    assert log_analyzer.feed(report('error', '20ns', 'bad data')) is True
+    assert log_analyzer.abort_reason == 'error at 20ns: bad data'
+    # Once stopped, the later lines are kept but not analyzed
+    assert log_analyzer.feed(report('failure')) is True
+    assert log_analyzer.abort_reason == 'error at 20ns: bad data'
+    assert log_analyzer.summary() == '1 note, 1 warning, 1 error, 0 failure'
+    assert log_analyzer.first_failure.message == 'bad data'
+    assert echoed == ['starting', report('note'), report('warning'), report('error', '20ns', 'bad data'),
+                      report('failure')]
+
+    log_analyzer = LogAnalyzer(abort_severity='warning')
+    assert log_analyzer.feed(report('failure')) is True
+
+
+
+def test_abort_after_max_failures():
+    log_analyzer = LogAnalyzer(max_failures=2)
+    assert log_analyzer.feed(report('warning')) is False
+    assert log_analyzer.feed(report('error', '10ns')) is False
+    assert log_analyzer.feed(report('failure', '30ns')) is True
+    assert log_analyzer.failures == 2
+    assert log_analyzer.abort_reason == '2 failures, last at 30ns'
+
+    log_analyzer = LogAnalyzer()
+    for _ in range(10):
+        assert log_analyzer.feed(report('failure')) is False
+    assert log_analyzer.failures == 10
+
+
+
+def make_and_run(tmp_path, monkeypatch, lines, **ghdl_options):
+    root = str(tmp_path)
+    monkeypatch.chdir(root)
+    makedirs(join(root, 'work'))
+
+    def fake_run_tb(entity, *args, stdout_handler=None, stderr_handler=None, **kwargs):
+        for line in lines:
+            if stderr_handler(line):
+                return CommandResult(['ghdl', '-r', entity], -9, aborted=True)
+        return CommandResult(['ghdl', '-r', entity], 0)
+    monkeypatch.setattr(ghdl_module, 'run_tb', fake_run_tb)
+    output = StringIO()
+    monkeypatch.setattr(ghdl_module, 'stdout', output)
+
+    ghdl = GHDL(install_path=root, work_dir_path=join(root, 'work'),
+                compiled_libs_paths=[join(root, 'compiled')], **ghdl_options)
+    monkeypatch.setattr(ghdl, 'make_entity', lambda entity: (0, '', 'ghdl -m ' + entity))
+    return ghdl.make_and_run('tb', open_waves=False), output.getvalue()
+
+
+
+def test_make_and_run_stops_on_abort_severity(tmp_path, monkeypatch):
+    lines = [report('note', '10ns', 'first'), report('error', '20ns', 'bad data'),
+             report('note', '30ns', 'never')]
+    passed, output = make_and_run(tmp_path, monkeypatch, lines, abort_severity='error')
+    assert passed is False
+    assert output.splitlines() == ['ERROR Stopped testbench tb, error at 20ns: bad data',
+                                   lines[0], lines[1],
+                                   'tb messages: 1 note, 0 warning, 1 error, 0 failure']
+
+
+
+def test_make_and_run_live_output(tmp_path, monkeypatch):
+    lines = ['starting', report('note', '10ns', 'first')]
+    passed, output = make_and_run(tmp_path, monkeypatch, lines, live_output=True)
+    assert passed is True
+    # Shown once, while running
+    assert output.splitlines() == lines + ['tb messages: 1 note, 0 warning, 0 error, 0 failure']
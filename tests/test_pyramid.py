@@ -0,0 +1,28 @@
+from hdlcomposer.signals        import (WaveformPyramid, FourState)
+
+
+
+def test_star_import_only_exports_public_names():
+    namespace = {}
+    exec('from hdlcomposer.signals import *', namespace)
+    exported = set(namespace) - {'__builtins__'}
+    assert {'Signal', 'Group', 'FourState', 'four_state_columns',
+            'WaveformPyramid', 'load_pyramid'} <= exported
+    assert not exported & {'dump', 'load', 'join', 'repeat', 'gzip_open', 'bisect_right',
+                           'bit_toggles', 'min_known', 'max_known', 'tv_files', 'hash_files'}
+
+
+
+def test_pyramid_queries():
+    waveform = [[time * 10, time % 7] for time in range(100)]
+    waveform[50][1] = FourState.from_str('1x')
+    pyramid = WaveformPyramid(waveform, branching=4)
+
+    assert pyramid.minmax(0, 990) == (0, 6)
+    assert pyramid.minmax(500, 505) == (None, None)
+    assert pyramid.minmax(495, 515) == (0, 2)
+    assert pyramid.transitions(0, 30) == 3
+    # 0 -> 1 -> 2 -> 3 toggles 1 + 2 + 1 bits
+    assert pyramid.toggle_count(0, 30) == 4
+    assert pyramid.activity(0, 40, 2) == [3, 4]
+    assert pyramid.activity(0, 40, 2, toggles=False) == [2, 2]
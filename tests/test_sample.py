@@ -0,0 +1,52 @@
+from pytest                     import (raises)
+
+from hdlcomposer.signals        import (FourState, Signal, Group)
+
+
+
+def clock_signal(values):
+    clock = Signal(values[0])
+    clock.waveform = [[tick, value] for tick, value in enumerate(values)]
+    return clock
+
+
+
+def test_edges():
+    clock = clock_signal(['x', '1', '0', '1', '1', '0'])
+    # The initial value is not an edge, X to 1 is a rising edge
+    assert clock.edges() == [1, 3]
+    assert clock.edges('falling') == [2, 5]
+    assert clock.edges('both') == [1, 2, 3, 5]
+
+    four_state = Signal(FourState.from_str('x'))
+    four_state.waveform += [[4, FourState.from_str('1')], [6, FourState.from_str('0')],
+                            [8, FourState.from_str('z')], [10, FourState.from_str('1')]]
+    assert four_state.edges() == [4, 10]
+
+    with raises(ValueError):
+        clock.edges('high')
+
+
+
+def test_sample_matches_get_value():
+    data = Signal(5)
+    data.waveform = [[0, 5], [3, 6], [7, 8]]
+    ticks = [0, 1, 3, 4, 7, 20]
+    assert data.sample(ticks) == [data.get_value(tick) for tick in ticks] == [5, 5, 6, 6, 8, 8]
+
+
+
+def test_sample_on():
+    clock = clock_signal(['x', '1', '0', '1', '0', '1'])
+    data = Signal(0)
+    # Changes exactly on the edges at ticks 3 and 5, and between edges at tick 2
+    data.waveform = [[0, 0], [2, 10], [3, 11], [5, 12]]
+    valid = Signal(False)
+    valid.waveform = [[0, False], [4, True]]
+    group = Group({'clk': clock, 'data': data, 'valid': valid})
+
+    table = group.sample_on('clk')
+    assert table == {'tick': [1, 3, 5], 'clk': ['1', '1', '1'], 'data': [0, 11, 12],
+                     'valid': [False, False, True]}
+    assert group.sample_on(clock, 'falling') == {'tick': [2, 4], 'clk': ['0', '0'],
+                                                 'data': [10, 11], 'valid': [False, True]}
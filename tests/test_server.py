@@ -0,0 +1,65 @@
+from os                             import (mkdir, stat, chmod, symlink)
+from os.path                        import (join)
+from stat                           import (S_IMODE)
+from sys                            import (executable)
+from threading                      import (Thread)
+from time                          import (sleep)
+
+from pytest                         import (raises, mark)
+
+from hdlcomposer.utils              import (run_command)
+from hdlcomposer.sim.ghdl.client    import (AF_UNIX, default_address, private_directory,
+                                            is_loopback, request, ping)
+from hdlcomposer.sim.ghdl.server    import (GHDLServer, captured_output)
+
+
+
+def test_default_address_is_private(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    assert default_address() == join(str(tmp_path), 'hdlcomposer-ghdl.sock')
+
+    directory_path = private_directory(join(str(tmp_path), 'sockets'))
+    assert S_IMODE(stat(directory_path).st_mode) == 0o700
+    assert private_directory(directory_path) == directory_path
+
+    shared_path = join(str(tmp_path), 'shared')
+    mkdir(shared_path)
+    chmod(shared_path, 0o755)
+    with raises(ValueError):
+        private_directory(shared_path)
+    symlink(directory_path, join(str(tmp_path), 'link'))
+    with raises(ValueError):
+        private_directory(join(str(tmp_path), 'link'))
+
+
+
+def test_tcp_only_on_loopback():
+    assert is_loopback('127.0.0.1') and is_loopback('localhost')
+    assert not is_loopback('10.1.2.3')
+    with raises(ValueError):
+        GHDLServer('10.1.2.3:7474').serve_forever()
+
+
+
+def test_command_errors_are_returned():
+    with captured_output() as output:
+        error, _ = run_command([executable, '-c', 'import sys; sys.stderr.write("bad design\\n"); exit(1)'])
+    assert error == 1
+    assert output.getvalue() == 'bad design\n'
+
+
+
+@mark.skipif(AF_UNIX is None, reason='Unix sockets not available')
+def test_unix_socket_is_only_for_the_owner(tmp_path):
+    address = join(str(tmp_path), 'ghdl.sock')
+    server = GHDLServer(address)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if ping(address):
+            break
+        sleep(0.05)
+    assert S_IMODE(stat(address).st_mode) == 0o600
+    assert request('shutdown', address, timeout=5)['error'] == 0
+    thread.join(5)
+    assert not thread.is_alive()
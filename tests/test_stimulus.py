@@ -0,0 +1,47 @@
+from os                         import (utime)
+from os.path                    import (getmtime)
+
+from hdlcomposer.vhdl.utils     import (generate_stimulus)
+
+
+
+def pkg_cfg(length):
+    return {
+        'valid': {'data': [1, 0] * length, 'type': 'std_logic'},
+        'data': {'data': list(range(length)), 'type': 'unsigned', 'width': 8},
+    }
+
+
+
+def age(file_paths):
+    for file_path in file_paths:
+        utime(file_path, (1000, 1000))
+    return {file_path: getmtime(file_path) for file_path in file_paths}
+
+
+
+def test_unchanged_stimulus_is_not_rewritten(tmp_path):
+    output_directory = str(tmp_path)
+    file_paths = generate_stimulus(pkg_cfg(4), 'stim_pkg', output_directory)
+    valid_path, data_path, package_path, reader_path = file_paths
+    with open(data_path) as f:
+        assert f.read().split() == ['00000000', '00000001', '00000010', '00000011']
+    mtimes = age(file_paths)
+
+    assert generate_stimulus(pkg_cfg(4), 'stim_pkg', output_directory) == file_paths
+    assert {file_path: getmtime(file_path) for file_path in file_paths} == mtimes
+
+    # Only the constant that changed and the package with its length are written
+    cfg = pkg_cfg(4)
+    cfg['data']['data'] = list(range(6))
+    generate_stimulus(cfg, 'stim_pkg', output_directory)
+    assert getmtime(valid_path) == mtimes[valid_path]
+    assert getmtime(reader_path) == mtimes[reader_path]
+    assert getmtime(data_path) != mtimes[data_path]
+    assert getmtime(package_path) != mtimes[package_path]
+    with open(package_path) as f:
+        assert 'DATA_LEN : natural := 6;' in f.read()
+
+    mtimes = age(file_paths)
+    generate_stimulus(cfg, 'stim_pkg', output_directory, force=True)
+    assert all(getmtime(file_path) != mtimes[file_path] for file_path in file_paths)
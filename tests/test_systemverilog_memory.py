@@ -0,0 +1,54 @@
+from os.path                        import (join, exists)
+
+from pytest                         import (raises)
+
+from hdlcomposer.systemverilog.utils import (generate_memory_package)
+
+
+
+PKG_CFG = {
+    'valid': {'data': [1, '0', True, 'false'], 'type': 'logic'},
+    'count': {'data': [0, 255, -1], 'type': 'integer'},
+    'sample': {'data': [244, -1, '11100'], 'type': 'signed', 'width': 9},
+    'address': {'data': ['1001', 32], 'type': 'unsigned', 'width': 6},
+    'start': {'data': 5, 'type': 'std_logic_vector', 'width': 4},
+}
+
+
+
+def read_lines(file_path):
+    with open(file_path) as f:
+        return f.read().splitlines()
+
+
+
+def test_memory_files(tmp_path):
+    output_directory = str(tmp_path)
+    file_paths = generate_memory_package(PKG_CFG, 'mem_pkg', output_directory)
+    memory_path = lambda name: join(output_directory, 'mem_pkg_' + name + '.mem')
+    assert file_paths == [memory_path('valid'), memory_path('count'), memory_path('sample'),
+                          memory_path('address'), join(output_directory, 'mem_pkg.sv')]
+
+    assert read_lines(memory_path('valid')) == ['1', '0', '1', '0']
+    assert read_lines(memory_path('count')) == ['00000000', '000000ff', 'ffffffff']
+    assert read_lines(memory_path('sample')) == ['0f4', '1ff', '1fc']
+    assert read_lines(memory_path('address')) == ['09', '20']
+
+    package = read_lines(file_paths[-1])
+    assert '  localparam sample_l = 3;' in package
+    assert '  logic signed [sample_w-1:0] sample [0:sample_l-1];' in package
+    assert "  localparam logic [start_w-1:0] start = 4'h5;" in package
+    assert '    $readmemh(count_file, count);' in package
+    assert not exists(memory_path('start'))
+
+    generate_memory_package(PKG_CFG, 'mem_pkg', output_directory, radix='b')
+    assert read_lines(memory_path('sample')) == ['011110100', '111111111', '111111100']
+    assert '    $readmemb(address_file, address);' in read_lines(file_paths[-1])
+
+
+
+def test_empty_array_is_rejected(tmp_path):
+    pkg_cfg = dict(PKG_CFG, empty={'data': [], 'type': 'unsigned', 'width': 8})
+    with raises(ValueError, match='empty'):
+        generate_memory_package(pkg_cfg, 'mem_pkg', str(tmp_path))
+    assert not exists(join(str(tmp_path), 'mem_pkg.sv'))
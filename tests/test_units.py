@@ -0,0 +1,33 @@
+from hdlcomposer.vhdl.units     import (Top, Entity, Instance, Port, Signal, NO_CHILDREN,
+                                        CHILD_MAP_THRESHOLD, hierarchy_to_records,
+                                        hierarchy_from_records)
+
+
+
+def test_child_lists_are_created_on_the_first_child():
+    top = Top(name='top')
+    tb = Entity(name='tb', parent=top, indentation=2)
+    other = Entity(name='other', parent=Top(name='top'), indentation=2)
+    assert tb.ports is NO_CHILDREN and tb.instances is NO_CHILDREN
+
+    Signal(name='clk', parent=tb, indentation=4)
+    assert tb.signals == [tb.clk] and tb.ports is NO_CHILDREN
+    assert other.signals == ()
+    assert tb.children == []
+
+
+
+def test_children_by_name():
+    top = Top(name='top')
+    tb = Entity(name='tb', parent=top, indentation=2)
+    for i in range(CHILD_MAP_THRESHOLD * 2):
+        instance = Instance(name='u_' + str(i), parent=tb, indentation=4)
+        Entity(name='core', parent=instance, indentation=6)
+        Port(name='name', parent=instance.entity, indentation=8, direction='in')
+    assert tb.named_children is not None
+    assert tb.u_0.core.child('name').direction == 'in'
+    assert tb.children == tb.instances and len(tb.instances) == CHILD_MAP_THRESHOLD * 2
+
+    rebuilt = hierarchy_from_records(hierarchy_to_records(top))
+    assert hierarchy_to_records(rebuilt) == hierarchy_to_records(top)
+    assert rebuilt.entity.u_15.core.signals is NO_CHILDREN
@@ -0,0 +1,32 @@
+from hdlcomposer.signals        import (FourState)
+from hdlcomposer.vcd            import utils as vcd_utils
+
+
+
+class FakeVCD():
+    def get_signals(self):
+        return ['tb.data[3:0]', 'tb.level', 'tb.done']
+
+    def get_data(self):
+        return {
+            '!': {'references': ['tb.data[3:0]'], 'size': '4', 'var_type': 'wire',
+                  'tv': [(0, 'xxxx'), (10, '1010'), (20, 'z')]},
+            '"': {'references': ['tb.level'], 'size': '64', 'var_type': 'real',
+                  'tv': [(0, '0'), (10, '1.5'), (20, '-2.25e3')]},
+            '#': {'references': ['tb.done'], 'size': '1', 'var_type': 'event',
+                  'tv': [(30, '1')]},
+        }
+
+
+
+def test_four_state_only_for_bit_signals(monkeypatch):
+    monkeypatch.setattr(vcd_utils, 'load_vcd', lambda vcd_path: FakeVCD())
+    signals = vcd_utils.vcd_to_signals('fake.vcd', four_state=True)
+
+    data = signals['data'].waveform
+    assert [time for time, value in data] == [0, 10, 20]
+    assert all(isinstance(value, FourState) for time, value in data)
+    assert str(data[0][1]) == 'xxxx' and data[1][1] == 10 and str(data[2][1]) == 'zzzz'
+
+    assert signals['level'].waveform == [[0, '0'], [10, '1.5'], [20, '-2.25e3']]
+    assert signals['done'].waveform == [[30, '1']]
@@ -0,0 +1,66 @@
+from os.path                    import (join)
+
+from hdlcomposer.utils.general  import (gtkw_signals)
+from hdlcomposer.vcd.subset     import (vcd_subset)
+
+
+
+VCD = '''$timescale 1 ns $end
+$scope module tb $end
+$var wire 1 ! clk $end
+$var wire 8 " data [7:0] $end
+$var wire 1 # other $end
+$upscope $end
+$enddefinitions $end
+#0
+$dumpvars
+0!
+b0 "
+0#
+$end
+#10
+1!
+#20
+0!
+b101 "
+#25
+1#
+#30
+1!
+'''
+
+
+
+def subset_times(tmp_path, **window):
+    vcd_path = join(str(tmp_path), 'full.vcd')
+    output_path = join(str(tmp_path), 'subset.vcd')
+    with open(vcd_path, 'w') as vcd_file:
+        vcd_file.write(VCD)
+    assert vcd_subset(vcd_path, output_path, ['tb/clk', 'tb/data'], **window) == 2
+    with open(output_path) as output_file:
+        return [line.strip() for line in output_file if line.startswith('#')]
+
+
+
+def test_end_time_is_not_repeated(tmp_path):
+    assert subset_times(tmp_path, end='20ns') == ['#0', '#10', '#20']
+
+
+
+def test_end_time_closes_the_window(tmp_path):
+    assert subset_times(tmp_path, start='5ns', end='25ns') == ['#5', '#10', '#20', '#25']
+    assert subset_times(tmp_path, start='10ns', end='10ns') == ['#10']
+
+
+
+def test_gtkw_top_scope(tmp_path):
+    gtkw_path = join(str(tmp_path), 'wave.gtkw')
+    with open(gtkw_path, 'w') as gtkw_file:
+        gtkw_file.write('[*] comment\n@28\ntop.tb.u_core.data[7:0]\ntop.tb.clk\n')
+    assert gtkw_signals(gtkw_path, 'tb') == ['tb/u_core/data', 'tb/clk']
+    assert gtkw_signals(gtkw_path) == ['tb/u_core/data', 'tb/clk']
+
+    # The testbench itself is called top
+    with open(gtkw_path, 'w') as gtkw_file:
+        gtkw_file.write('top.top.u_core.data\ntop.clk\n')
+    assert gtkw_signals(gtkw_path, 'top') == ['top/u_core/data', 'top/clk']
@@ -0,0 +1,81 @@
+from os                         import (makedirs)
+from os.path                    import (join, islink)
+
+import pytest
+
+from hdlcomposer.utils          import general
+from hdlcomposer.sim.ghdl       import ghdl as ghdl_module
+from hdlcomposer.sim.ghdl.ghdl  import (GHDL)
+
+
+
+def make_library(directory):
+    makedirs(directory)
+    with open(join(directory, 'unisim-obj93.cf'), 'w') as library_file:
+        library_file.write('v 4\n')
+
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    cache_path = join(str(tmp_path), 'cache', 'xilinx-vivado-vhdl93-0123')
+
+    def fake_cached_compile_vendor(vendor_name, *args):
+        make_library(join(cache_path, 'unisim', 'v93'))
+        return 0, '', cache_path
+    monkeypatch.setattr(ghdl_module, 'cached_compile_vendor', fake_cached_compile_vendor)
+    monkeypatch.setattr(ghdl_module, 'compile_vendor', lambda *args: (2, 'xilinx-vivado libraries found'))
+    return str(tmp_path), cache_path
+
+
+
+def new_ghdl(root):
+    return GHDL(install_path=root, work_dir_path=join(root, 'work'),
+                compiled_libs_paths=[join(root, 'compiled')])
+
+
+
+def test_existing_output_directory_is_reused(project):
+    root, cache_path = project
+    output_path = join(root, 'compiled', 'vendor', 'xilinx-vivado')
+    make_library(join(output_path, 'unisim', 'v93'))
+    ghdl = new_ghdl(root)
+
+    assert ghdl.compile_vendor('xilinx-vivado', root)[0] == 2
+    assert not islink(output_path)
+    assert sorted(ghdl.compiled_libs_paths) == [join(output_path, 'unisim', 'v93')]
+
+
+
+def test_cache_is_linked_and_registered_once(project):
+    root, cache_path = project
+    output_path = join(root, 'compiled', 'vendor', 'xilinx-vivado')
+    makedirs(join(root, 'compiled'))
+    ghdl = new_ghdl(root)
+
+    assert ghdl.compile_vendor('xilinx-vivado', root)[0] == 0
+    assert islink(output_path)
+    assert sorted(ghdl.compiled_libs_paths) == [join(output_path, 'unisim', 'v93')]
+    # A new project instance finds the libraries through the link
+    assert sorted(new_ghdl(root).compiled_libs_paths) == [join(output_path, 'unisim', 'v93')]
+
+
+
+def test_linked_libraries_are_found_from_the_cache(project, monkeypatch):
+    root, cache_path = project
+    output_path = join(root, 'compiled', 'vendor', 'xilinx-vivado')
+    makedirs(join(root, 'compiled'))
+    ghdl = new_ghdl(root)
+    ghdl.compile_vendor('xilinx-vivado', root)
+
+    ghdl.add_compiled_libs(join(root, 'compiled'))
+
+    # Repeat runs only stat the directories, also the ones behind the link
+    listed = []
+    scandir = general.scandir
+    monkeypatch.setattr(general, 'scandir', lambda path: listed.append(path) or scandir(path))
+    ghdl.compiled_libs_paths.clear()
+    ghdl.add_compiled_libs(join(root, 'compiled'))
+    assert sorted(ghdl.compiled_libs_paths) == [join(output_path, 'unisim', 'v93')]
+    assert listed == []
@@ -0,0 +1,27 @@
+from os.path                    import (join)
+
+from hdlcomposer.signals        import (Signal)
+from hdlcomposer.vhdl.utils     import (data_to_package, vhdl_literals)
+
+
+
+def test_float_columns_are_written_as_integers(tmp_path):
+    data = Signal(signal_type='unsigned', signal_width=4)
+    # Columns of a float NumPy array after tolist()
+    data.waveform = ([0.0, 10.0, 25.0], [1.0, 15.0, 2.0])
+    data_to_package({'data': data}, 'float_pkg', str(tmp_path))
+
+    with open(join(str(tmp_path), 'float_pkg.vhd')) as f:
+        package = f.read()
+    assert '0,\n    10,\n    25\n' in package
+    assert '"0001",\n    "1111",\n    "0010"\n' in package
+    assert '.0' not in package
+
+
+
+def test_literals():
+    assert vhdl_literals([], 'integer', None) == ''
+    assert vhdl_literals([3, -2, True, '12'], 'integer', None) == '3, -2, 1, 12'
+    assert vhdl_literals([1, 0, '0', True], 'std_logic', None) == "'1', '0', '1', '1'"
+    assert vhdl_literals([-1, 5], 'signed', 4) == '"1111", "0101"'
+    assert vhdl_literals([5, '101', 2.0], 'signed', 4) == '"0101", "1101", "0010"'
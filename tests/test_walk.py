@@ -0,0 +1,59 @@
+from os                         import (makedirs, symlink, walk)
+from os.path                    import (join)
+
+from hdlcomposer.utils          import general
+from hdlcomposer.utils.general  import (walk_files, walk_directories, get_filepaths_recursive,
+                                        DirectoryCache)
+
+
+
+def make_tree(root):
+    makedirs(join(root, 'rtl', 'core'))
+    for path in (join(root, 'top.vhd'), join(root, 'rtl', 'core', 'core.vhd')):
+        with open(path, 'w') as source_file:
+            source_file.write('-- source\n')
+
+
+
+def walked_paths(root, cache=None):
+    return sorted(join(directory, file) for directory, files in walk_files(root, cache=cache)
+                  for file in files)
+
+
+
+def test_walk_does_not_follow_a_symlink_loop(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    symlink('..', join(root, 'rtl', 'core', 'up'))
+
+    expected = [join(root, 'rtl', 'core', 'core.vhd'), join(root, 'top.vhd')]
+    assert walked_paths(root) == expected
+    assert walked_paths(root, DirectoryCache()) == expected
+
+
+
+def test_walk_matches_os_walk_with_symlinked_trees(tmp_path):
+    root = join(str(tmp_path), 'project')
+    make_tree(root)
+    symlink(join(root, 'rtl'), join(root, 'rtl_link'))
+    symlink(join(root, 'top.vhd'), join(root, 'top_link.vhd'))
+
+    expected = sorted(join(directory, file) for directory, _, files in walk(root) for file in files)
+    assert walked_paths(root) == expected
+    assert sorted(get_filepaths_recursive(root, ['.vhd'])) == expected
+
+
+
+def test_cached_walk_lists_links_without_scanning_again(tmp_path, monkeypatch):
+    root = join(str(tmp_path), 'project')
+    make_tree(root)
+    symlink(join(root, 'rtl'), join(root, 'rtl', 'core', 'vendor'))
+    cache = DirectoryCache()
+    expected = [(root, []), (join(root, 'rtl'), []), (join(root, 'rtl', 'core'), ['vendor'])]
+    assert [(directory, links) for directory, _, links in walk_directories(root, cache=cache)] == expected
+
+    listed = []
+    scandir = general.scandir
+    monkeypatch.setattr(general, 'scandir', lambda path: listed.append(path) or scandir(path))
+    assert [(directory, links) for directory, _, links in walk_directories(root, cache=cache)] == expected
+    assert listed == []
@@ -0,0 +1,82 @@
+from os                         import (makedirs, rename)
+from os.path                    import (join)
+from shutil                     import (rmtree)
+from threading                  import (Thread, Event)
+from time                       import (sleep, monotonic)
+
+import pytest
+
+from hdlcomposer.utils.watch    import (InotifyWatcher, PollingWatcher, load_inotify)
+
+
+
+def make_tree(root):
+    paths = []
+    for directory in ('rtl', join('rtl', 'core')):
+        makedirs(join(root, directory), exist_ok=True)
+        path = join(root, directory, 'unit.vhd')
+        with open(path, 'w') as source_file:
+            source_file.write('-- unit\n')
+        paths.append(path)
+    return set(paths)
+
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def watcher_class(request):
+    if request.param == 'inotify':
+        if load_inotify() is None:
+            pytest.skip('inotify is not available')
+        return InotifyWatcher
+    return lambda directories: PollingWatcher(directories, interval=0.05)
+
+
+
+def test_deleted_directory_reports_its_files(tmp_path, watcher_class):
+    root = str(tmp_path)
+    paths = make_tree(root)
+    watcher = watcher_class([root])
+    try:
+        rmtree(join(root, 'rtl'))
+        assert watcher.wait(2) == paths
+    finally:
+        watcher.close()
+
+
+
+def test_moved_directory_reports_its_files(tmp_path, watcher_class):
+    root = join(str(tmp_path), 'sources')
+    paths = make_tree(root)
+    watcher = watcher_class([root])
+    try:
+        rename(join(root, 'rtl'), join(str(tmp_path), 'rtl'))
+        assert watcher.wait(2) == paths
+    finally:
+        watcher.close()
+
+
+
+def test_ignored_events_do_not_extend_the_timeout(tmp_path):
+    if load_inotify() is None:
+        pytest.skip('inotify is not available')
+    root = str(tmp_path)
+    make_tree(root)
+    watcher = InotifyWatcher([root], ignore=['*.tmp'])
+    writing = Event()
+
+    def write_ignored_files():
+        while not writing.is_set():
+            with open(join(root, 'rtl', 'build.tmp'), 'w') as temp_file:
+                temp_file.write('x')
+            sleep(0.01)
+
+    thread = Thread(target=write_ignored_files)
+    thread.start()
+    try:
+        start = monotonic()
+        assert watcher.wait(0.3) == set()
+        assert monotonic() - start < 1
+    finally:
+        writing.set()
+        thread.join()
+        watcher.close()
@@ -0,0 +1,54 @@
+from os                         import (makedirs)
+from os.path                    import (join)
+
+from hdlcomposer.sim.ghdl       import ghdl as ghdl_module
+from hdlcomposer.sim.ghdl.ghdl  import (GHDL)
+
+
+
+DISP_TREE = ['top [entity]', '  behav [arch]', '    clk [signal]', '    done [signal]',
+             '    inst [instance]', '      core [entity]', '        rtl [arch]',
+             '          data [port in]', '          count [signal]', '          sub [instance]',
+             '            leaf [entity]', '              rtl [arch]', '                q [signal]',
+             '', '']
+
+
+
+def ghdl_with_hierarchy(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    monkeypatch.chdir(root)
+    makedirs(join(root, 'work'))
+    with open(join(root, 'work', 'work-obj93.cf'), 'w') as library_file:
+        library_file.write('v 4\n')
+
+    def fake_run_tb(entity, *args, stdout_handler=None, **kwargs):
+        for line in DISP_TREE:
+            stdout_handler(line)
+    monkeypatch.setattr(ghdl_module, 'run_tb', fake_run_tb)
+    return GHDL(install_path=root, work_dir_path=join(root, 'work'),
+                compiled_libs_paths=[join(root, 'compiled')])
+
+
+
+def test_wave_selection(tmp_path, monkeypatch):
+    ghdl = ghdl_with_hierarchy(tmp_path, monkeypatch)
+    assert ghdl.wave_selection('top', 'top/clk') == ['top/clk']
+    # Relative to the testbench, and globs
+    assert ghdl.wave_selection('top', ['inst/data', 'top/*/count']) == ['top/inst/data',
+                                                                        'top/inst/count']
+    assert ghdl.wave_selection('top', 'top/**/q') == ['top/inst/sub/q']
+    # An instance selects each level inside that declares signals
+    assert ghdl.wave_selection('top', 'inst') == ['top/inst/*', 'top/inst/sub/*']
+    assert ghdl.wave_selection('top', 'inst/sub') == ['top/inst/sub/*']
+    assert ghdl.wave_selection('top', 'missing') == []
+
+
+
+def test_write_wave_options(tmp_path, monkeypatch):
+    ghdl = ghdl_with_hierarchy(tmp_path, monkeypatch)
+    options_path = ghdl.write_wave_options('top', ['clk', 'top/inst/sub'])
+    assert options_path == join(str(tmp_path), 'work', 'top.opt')
+    with open(options_path) as options_file:
+        assert options_file.read() == '$ version 1.1\n/top/clk\n/top/inst/sub/*\n'
+
+    assert ghdl.write_wave_options('top', 'missing') is None
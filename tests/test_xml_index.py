@@ -0,0 +1,92 @@
+from os.path                    import (join)
+
+from hdlcomposer.sim.ghdl.parse import (index_xml_dump)
+
+
+
+# Reduced ghdl --file-to-xml output of:
+#   entity counter is
+#     generic (WIDTH : natural := 8);
+#     port (clk, rst : in std_logic; count : out unsigned(7 downto 0));
+#   end entity;
+#   architecture rtl of counter is
+#     type state_t is (idle, run);
+#     signal state : state_t;
+#   begin
+#     process (clk) begin end process;
+#   end architecture;
+XML_DUMP = '''<?xml version="1.0" encoding="UTF-8"?>
+<root version="0.5.0">
+  <el kind="design_file" file="counter.vhd">
+    <design_unit_chain>
+      <el kind="design_unit" line="1">
+        <library_unit kind="entity_declaration" line="1" identifier="counter">
+          <generic_chain>
+            <el kind="interface_constant_declaration" line="2" identifier="width">
+              <subtype_indication kind="simple_name" identifier="natural"></subtype_indication>
+              <default_value kind="integer_literal" value="8"></default_value>
+            </el>
+          </generic_chain>
+          <port_chain>
+            <el kind="interface_signal_declaration" line="3" identifier="clk" mode="in_mode">
+              <subtype_indication kind="simple_name" identifier="std_logic"></subtype_indication>
+            </el>
+            <el kind="interface_signal_declaration" line="3" identifier="rst" mode="in_mode"></el>
+            <el kind="interface_signal_declaration" line="3" identifier="count" mode="out_mode">
+              <subtype_indication kind="array_subtype_definition">
+                <subtype_type_mark kind="simple_name" identifier="unsigned"></subtype_type_mark>
+                <index_constraint_list>
+                  <el kind="range_expression" direction="downto"></el>
+                </index_constraint_list>
+              </subtype_indication>
+            </el>
+          </port_chain>
+        </library_unit>
+      </el>
+      <el kind="design_unit" line="5">
+        <library_unit kind="architecture_body" line="5" identifier="rtl">
+          <entity_name kind="simple_name" identifier="counter"></entity_name>
+          <declaration_chain>
+            <el kind="type_declaration" line="6" identifier="state_t">
+              <type_definition kind="enumeration_type_definition"></type_definition>
+            </el>
+            <el kind="signal_declaration" line="7" identifier="state">
+              <subtype_indication kind="simple_name" identifier="state_t"></subtype_indication>
+            </el>
+          </declaration_chain>
+          <concurrent_statement_chain>
+            <el kind="sensitized_process_statement" line="9" label="p0"></el>
+          </concurrent_statement_chain>
+        </library_unit>
+      </el>
+    </design_unit_chain>
+  </el>
+</root>
+'''
+
+
+
+def test_index_xml_dump(tmp_path):
+    xml_path = join(str(tmp_path), 'counter.xml')
+    with open(xml_path, 'w') as xml_file:
+        xml_file.write(XML_DUMP)
+
+    index = index_xml_dump(xml_path)
+    assert index['entities'] == {'counter': {
+        'generics': [('width', 'natural')],
+        # rst is declared together with clk, so it shares its type
+        'ports': [('clk', 'in', 'std_logic'), ('rst', 'in', 'std_logic'),
+                  ('count', 'out', 'unsigned')],
+    }}
+    assert index['types'] == {'state_t': ('type_declaration', 'rtl')}
+    assert index['declarations'] == [
+        ('entity_declaration', 'counter', '', 1),
+        ('interface_constant_declaration', 'width', 'counter', 2),
+        ('interface_signal_declaration', 'clk', 'counter', 3),
+        ('interface_signal_declaration', 'rst', 'counter', 3),
+        ('interface_signal_declaration', 'count', 'counter', 3),
+        ('architecture_body', 'rtl', '', 5),
+        ('type_declaration', 'state_t', 'rtl', 6),
+        ('signal_declaration', 'state', 'rtl', 7),
+        ('sensitized_process_statement', 'p0', 'rtl', 9),
+    ]